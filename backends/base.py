@@ -0,0 +1,102 @@
+# backends/base.py
+"""Storage バックエンドの共通インターフェース。
+
+永続化の単位はギルドごとのドキュメント {section: value}（section は
+Storage.data のキー）。メソッドはブロッキングI/Oを行ってよい
+（Storage 側が asyncio.to_thread で呼び出す）。
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+Json = Dict[str, Any]
+
+# 差分保存するバックエンド（sqlite / upstash）が個別に持つセクション
+GAME_SECTIONS = ("game", "voting_open", "spirit_reverse_used")
+MESSAGE_SECTIONS = ("gm_vote_message_id", "dashboard_message_id")
+NORMALIZED = {"participants", "night_actions", "votes", *GAME_SECTIONS, *MESSAGE_SECTIONS}
+
+
+def flatten_actions(na: Optional[Json]) -> Dict[Tuple[str, str], Optional[str]]:
+    """night_actions {role: {voter: target}} → {(role, voter): target}"""
+    out: Dict[Tuple[str, str], Optional[str]] = {}
+    for role, per_voter in (na or {}).items():
+        for voter, target in (per_voter or {}).items():
+            out[(str(role), str(voter))] = target
+    return out
+
+
+def diff(old: Dict[Any, Any], new: Dict[Any, Any]) -> Tuple[Dict[Any, Any], List[Any]]:
+    """(追加/変更された項目, 削除されたキー)"""
+    changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+    removed = [k for k in old if k not in new]
+    return changed, removed
+
+
+def participant_seqs(old_seq: Dict[int, int], participants: List[Json]) -> Tuple[Dict[int, int], bool]:
+    """参加者の並び順（seq）を決める。追加・削除だけなら既存の seq は変えない。
+
+    返り値は ({user_id: seq}, 全員を振り直したか)
+    """
+    kept = [old_seq[int(p["id"])] for p in participants if int(p["id"]) in old_seq]
+    renumber = kept != sorted(kept)
+    next_seq = (max(old_seq.values()) + 1) if old_seq else 0
+    new_seq: Dict[int, int] = {}
+    for i, p in enumerate(participants):
+        uid = int(p["id"])
+        if renumber:
+            new_seq[uid] = i
+        elif uid in old_seq:
+            new_seq[uid] = old_seq[uid]
+        else:
+            new_seq[uid], next_seq = next_seq, next_seq + 1
+    return new_seq, renumber
+
+
+class Backend:
+    name = "base"
+
+    def load_index(self) -> List[str]:
+        """保存済みのギルドID一覧"""
+        raise NotImplementedError
+
+    def load_guild(self, gid: str) -> Optional[Json]:
+        raise NotImplementedError
+
+    def load_guilds(self, gids: Iterable[str]) -> Dict[str, Json]:
+        out: Dict[str, Json] = {}
+        for gid in gids:
+            doc = self.load_guild(gid)
+            if doc:
+                out[gid] = doc
+        return out
+
+    def save_guilds(self, docs: Dict[str, Json]) -> None:
+        """変更のあったギルドのドキュメントを書き込む"""
+        raise NotImplementedError
+
+    def delete_guild(self, gid: str) -> None:
+        raise NotImplementedError
+
+    # ---------- game log (append-only) ----------
+    def append_log(self, key: str, lines: List[str]) -> None:
+        """ゲームログ（1 行 1 イベント）の末尾に追記"""
+        raise NotImplementedError
+
+    def iter_log(self, key: str, chunk: int = 500) -> Iterator[List[str]]:
+        """ゲームログを先頭から chunk 行ずつ返す（全体をメモリに載せない）"""
+        raise NotImplementedError
+
+    # ---------- cross-process invalidation ----------
+    def publish_invalidation(self, gids: Iterable[str]) -> None:
+        """他プロセスへ「このギルドを読み直して」と通知（単一プロセス用は何もしない）"""
+        return None
+
+    async def listen_invalidations(self) -> AsyncIterator[str]:
+        """他プロセスからの無効化通知（ギルドID）を流す。対応しないバックエンドは何も流さない"""
+        await asyncio.Event().wait()
+        yield ""  # pragma: no cover
+
+    def close(self) -> None:
+        return None
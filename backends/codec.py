@@ -0,0 +1,122 @@
+# backends/codec.py
+"""保存データのエンコード方式。
+
+保存値の先頭にヘッダ行 "ww<version>:<codec>[+zlib]\\n" を付け、読み込み時に
+方式を判別する。ヘッダのない値は旧形式（素の JSON）として読み、次回保存時に
+設定中の方式で書き直される（透過的な移行）。
+
+- json    : 区切りの空白を省いた JSON（既定）
+- msgpack : バイナリ（msgpack パッケージが必要。未導入で指定すると起動時にエラー）
+- +zlib   : 上記を zlib 圧縮
+"""
+from __future__ import annotations
+
+import base64
+import json
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # optional
+    msgpack = None
+
+FORMAT_VERSION = 1
+MAGIC = b"ww"
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(raw: bytes) -> Any:
+    return json.loads(raw.decode("utf-8"))
+
+
+def _msgpack_dumps(obj: Any) -> bytes:
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def _msgpack_loads(raw: bytes) -> Any:
+    # ギルドIDなどのキーは文字列のまま保持される（strict_map_key=False で数値キーも許容）
+    return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+_CODECS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "json": (_json_dumps, _json_loads),
+}
+if msgpack is not None:
+    _CODECS["msgpack"] = (_msgpack_dumps, _msgpack_loads)
+
+
+def available_codecs() -> Tuple[str, ...]:
+    return tuple(_CODECS)
+
+
+class Codec:
+    def __init__(self, name: str = "json", compress: bool = False, level: int = 6):
+        if name not in _CODECS:
+            # 黙って json に切り替えると、設定と実際に書かれる形式が食い違うので起動を止める
+            raise ValueError(f"storage codec '{name}' is not available (available: {', '.join(_CODECS)})")
+        self.name = name
+        self.compress = compress
+        self.level = level
+
+    @classmethod
+    def from_env(cls, name: Optional[str], compress: Optional[str]) -> "Codec":
+        return cls((name or "json").lower(), (compress or "").lower() in ("zlib", "1", "true"))
+
+    @property
+    def label(self) -> str:
+        return self.name + ("+zlib" if self.compress else "")
+
+    @property
+    def is_text(self) -> bool:
+        return self.name == "json" and not self.compress
+
+    def _header(self) -> bytes:
+        return MAGIC + f"{FORMAT_VERSION}:{self.label}\n".encode("ascii")
+
+    # ---------- bytes (file) ----------
+    def encode(self, obj: Any) -> bytes:
+        payload = _CODECS[self.name][0](obj)
+        if self.compress:
+            payload = zlib.compress(payload, self.level)
+        return self._header() + payload
+
+    @staticmethod
+    def decode(raw: bytes) -> Any:
+        if not raw.startswith(MAGIC):
+            return _json_loads(raw)  # 旧形式
+        header, _, payload = raw.partition(b"\n")
+        version, _, label = header[len(MAGIC):].decode("ascii").partition(":")
+        if int(version) > FORMAT_VERSION:
+            raise ValueError(f"unsupported storage format version {version}")
+        name, _, comp = label.partition("+")
+        if comp == "zlib":
+            payload = zlib.decompress(payload)
+        if name not in _CODECS:
+            raise ValueError(f"codec '{name}' is required to read this data")
+        return _CODECS[name][1](payload)
+
+    # ---------- text (Redis REST など文字列しか扱えない経路) ----------
+    def encode_text(self, obj: Any) -> str:
+        if self.is_text:
+            return self._header().decode("ascii") + _json_dumps(obj).decode("utf-8")
+        raw = self.encode(obj)
+        header, _, payload = raw.partition(b"\n")
+        return header.decode("ascii") + "\n" + base64.b64encode(payload).decode("ascii")
+
+    @staticmethod
+    def decode_text(raw: Union[str, bytes]) -> Any:
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        if not raw.startswith(MAGIC.decode("ascii")):
+            return json.loads(raw)  # 旧形式
+        header, _, payload = raw.partition("\n")
+        label = header.partition(":")[2]
+        if label == "json":
+            body = payload.encode("utf-8")
+        else:
+            body = base64.b64decode(payload)
+        return Codec.decode(header.encode("ascii") + b"\n" + body)
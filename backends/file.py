@@ -0,0 +1,91 @@
+# backends/file.py
+"""ローカルファイル（単一プロセス用）。
+
+ファイルの内容は従来通り {section: {guild_id: value}}（エンコードは backends.codec）。
+読み込み時にギルド単位に分解して保持し、保存時は全体を書き直す。
+ゲームログは <path>.logs/<key>.jsonl に追記する。
+"""
+from __future__ import annotations
+
+import os
+from typing import Dict, Iterator, List, Optional
+
+from backends.base import Backend, Json
+from backends.codec import Codec
+
+
+class FileBackend(Backend):
+    name = "file"
+
+    def __init__(self, path: str, codec: Optional[Codec] = None):
+        self.path = path
+        self.codec = codec or Codec()
+        self._docs: Optional[Dict[str, Json]] = None
+
+    def _read(self) -> Dict[str, Json]:
+        if self._docs is not None:
+            return self._docs
+        docs: Dict[str, Json] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                raw = Codec.decode(f.read())
+            for section, per_guild in raw.items():
+                if not isinstance(per_guild, dict):
+                    continue
+                for gid, value in per_guild.items():
+                    docs.setdefault(str(gid), {})[section] = value
+        self._docs = docs
+        return docs
+
+    def load_index(self) -> List[str]:
+        return list(self._read().keys())
+
+    def load_guild(self, gid: str) -> Optional[Json]:
+        return self._read().get(gid)
+
+    def save_guilds(self, docs: Dict[str, Json]) -> None:
+        current = self._read()
+        current.update(docs)
+        self._write(current)
+
+    def delete_guild(self, gid: str) -> None:
+        current = self._read()
+        if current.pop(gid, None) is not None:
+            self._write(current)
+
+    def _log_path(self, key: str) -> str:
+        # キーはそのままファイル名になるので、ログのディレクトリの外を指すものは拒否する
+        if key in ("", ".", "..") or any(sep and sep in key for sep in ("/", os.sep, os.altsep)):
+            raise ValueError(f"invalid log key: {key!r}")
+        return os.path.join(self.path + ".logs", f"{key}.jsonl")
+
+    def append_log(self, key: str, lines: List[str]) -> None:
+        path = self._log_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(line + "\n" for line in lines))
+
+    def iter_log(self, key: str, chunk: int = 500) -> Iterator[List[str]]:
+        try:
+            f = open(self._log_path(key), "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            batch: List[str] = []
+            for line in f:
+                batch.append(line.rstrip("\n"))
+                if len(batch) >= chunk:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def _write(self, docs: Dict[str, Json]) -> None:
+        raw: Dict[str, Dict[str, object]] = {}
+        for gid, doc in docs.items():
+            for section, value in doc.items():
+                raw.setdefault(section, {})[gid] = value
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.codec.encode(raw))
+        os.replace(tmp, self.path)
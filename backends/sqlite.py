@@ -0,0 +1,350 @@
+# backends/sqlite.py
+"""SQLite バックエンド（STORAGE_BACKEND=sqlite）。
+
+ギルドのドキュメントを正規化したテーブルに保存する。保存時は前回保存した
+内容との差分を取り、変更のあった行だけを UPSERT / DELETE する（1 回の操作で
+通常は 1 行）。外部サービス不要で、WAL により複数プロセスから同じファイルを
+読み書きできる。プロセス間の無効化通知は invalidations テーブルのポーリングで行う。
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import sqlite3
+import threading
+import uuid
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+from backends.base import (
+    GAME_SECTIONS,
+    MESSAGE_SECTIONS,
+    NORMALIZED,
+    Backend,
+    Json,
+    diff,
+    flatten_actions,
+    participant_seqs,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS games (
+    guild_id TEXT PRIMARY KEY,
+    day INTEGER,
+    phase TEXT,
+    voting_open INTEGER,
+    spirit_reverse_used INTEGER
+);
+-- 主キー (guild_id, user_id) がそのまま (guild_id, user_id) の索引を兼ねる
+CREATE TABLE IF NOT EXISTS participants (
+    guild_id TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    ho TEXT,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_participants_guild_ho ON participants (guild_id, ho);
+CREATE TABLE IF NOT EXISTS night_actions (
+    guild_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    voter_ho TEXT NOT NULL,
+    target_ho TEXT,
+    PRIMARY KEY (guild_id, role, voter_ho)
+);
+CREATE TABLE IF NOT EXISTS votes (
+    guild_id TEXT NOT NULL,
+    voter_ho TEXT NOT NULL,
+    target_ho TEXT,
+    PRIMARY KEY (guild_id, voter_ho)
+);
+CREATE TABLE IF NOT EXISTS message_ids (
+    guild_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, kind)
+);
+-- 正規化していないセクション（将来追加分）は JSON で保持
+CREATE TABLE IF NOT EXISTS extras (
+    guild_id TEXT NOT NULL,
+    section TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (guild_id, section)
+);
+CREATE TABLE IF NOT EXISTS invalidations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    guild_id TEXT NOT NULL
+);
+-- ゲームログ（追記のみ）。ギルド削除（リセット）では消さない
+CREATE TABLE IF NOT EXISTS game_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    log_key TEXT NOT NULL,
+    line TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_game_log_key ON game_log (log_key, id);
+"""
+
+# 文は固定文字列にしてパラメータで渡す（sqlite3 の文キャッシュで再コンパイルされない）
+SQL_UPSERT_GUILD = "INSERT OR IGNORE INTO guilds (guild_id) VALUES (?)"
+SQL_UPSERT_GAME = (
+    "INSERT INTO games (guild_id, day, phase, voting_open, spirit_reverse_used) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (guild_id) DO UPDATE SET day = excluded.day, phase = excluded.phase, "
+    "voting_open = excluded.voting_open, spirit_reverse_used = excluded.spirit_reverse_used"
+)
+SQL_UPSERT_PARTICIPANT = (
+    "INSERT INTO participants (guild_id, user_id, seq, name, ho) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (guild_id, user_id) DO UPDATE SET seq = excluded.seq, name = excluded.name, ho = excluded.ho"
+)
+SQL_DELETE_PARTICIPANT = "DELETE FROM participants WHERE guild_id = ? AND user_id = ?"
+SQL_UPSERT_NIGHT_ACTION = (
+    "INSERT INTO night_actions (guild_id, role, voter_ho, target_ho) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (guild_id, role, voter_ho) DO UPDATE SET target_ho = excluded.target_ho"
+)
+SQL_DELETE_NIGHT_ACTION = "DELETE FROM night_actions WHERE guild_id = ? AND role = ? AND voter_ho = ?"
+SQL_UPSERT_VOTE = (
+    "INSERT INTO votes (guild_id, voter_ho, target_ho) VALUES (?, ?, ?) "
+    "ON CONFLICT (guild_id, voter_ho) DO UPDATE SET target_ho = excluded.target_ho"
+)
+SQL_DELETE_VOTE = "DELETE FROM votes WHERE guild_id = ? AND voter_ho = ?"
+SQL_UPSERT_MESSAGE = (
+    "INSERT INTO message_ids (guild_id, kind, message_id) VALUES (?, ?, ?) "
+    "ON CONFLICT (guild_id, kind) DO UPDATE SET message_id = excluded.message_id"
+)
+SQL_DELETE_MESSAGE = "DELETE FROM message_ids WHERE guild_id = ? AND kind = ?"
+SQL_UPSERT_EXTRA = (
+    "INSERT INTO extras (guild_id, section, value) VALUES (?, ?, ?) "
+    "ON CONFLICT (guild_id, section) DO UPDATE SET value = excluded.value"
+)
+SQL_DELETE_EXTRA = "DELETE FROM extras WHERE guild_id = ? AND section = ?"
+
+TABLES = ("guilds", "games", "participants", "night_actions", "votes", "message_ids", "extras")
+
+
+class SqliteBackend(Backend):
+    name = "sqlite"
+
+    def __init__(self, path: str, poll_interval: float = 1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.origin = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=256)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+        # 前回保存した（または読み込んだ）内容。差分計算に使う。
+        # save_guilds / _poll はワーカースレッドで動くので、_saved / _seqs は必ず _lock の中で触る
+        self._saved: Dict[str, Json] = {}
+        self._seqs: Dict[str, Dict[int, int]] = {}
+        self._last_invalidation = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM invalidations").fetchone()[0]
+
+    # ---------- load ----------
+    def load_index(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT guild_id FROM guilds")]
+
+    def load_guild(self, gid: str) -> Optional[Json]:
+        with self._lock:
+            doc = self._read_guild(gid)
+            self._saved[gid] = copy.deepcopy(doc)
+        return doc or None
+
+    def _read_guild(self, gid: str) -> Json:
+        c = self._conn
+        doc: Json = {}
+        row = c.execute(
+            "SELECT day, phase, voting_open, spirit_reverse_used FROM games WHERE guild_id = ?", (gid,)
+        ).fetchone()
+        if row:
+            day, phase, voting_open, reverse_used = row
+            if day is not None:
+                doc["game"] = {"day": day, "phase": phase}
+            if voting_open is not None:
+                doc["voting_open"] = bool(voting_open)
+            if reverse_used is not None:
+                doc["spirit_reverse_used"] = bool(reverse_used)
+        parts = c.execute(
+            "SELECT user_id, seq, name, ho FROM participants WHERE guild_id = ? ORDER BY seq", (gid,)
+        ).fetchall()
+        self._seqs[gid] = {uid: seq for uid, seq, _, _ in parts}
+        if parts:
+            doc["participants"] = [{"id": uid, "name": name, "ho": ho} for uid, _, name, ho in parts]
+        for role, voter, target in c.execute(
+            "SELECT role, voter_ho, target_ho FROM night_actions WHERE guild_id = ?", (gid,)
+        ):
+            doc.setdefault("night_actions", {}).setdefault(role, {})[voter] = target
+        for voter, target in c.execute("SELECT voter_ho, target_ho FROM votes WHERE guild_id = ?", (gid,)):
+            doc.setdefault("votes", {})[voter] = target
+        for kind, message_id in c.execute("SELECT kind, message_id FROM message_ids WHERE guild_id = ?", (gid,)):
+            doc[kind] = message_id
+        for section, value in c.execute("SELECT section, value FROM extras WHERE guild_id = ?", (gid,)):
+            doc[section] = json.loads(value)
+        return doc
+
+    # ---------- save ----------
+    def save_guilds(self, docs: Dict[str, Json]) -> None:
+        with self._lock:
+            c = self._conn
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                for gid, doc in docs.items():
+                    old = self._saved.get(gid)
+                    if old is None:
+                        # 差分の基準がない場合は一度だけ全行を書き直す
+                        self._delete_rows(gid)
+                        self._seqs[gid] = {}
+                        c.execute(SQL_UPSERT_GUILD, (gid,))
+                        old = {}
+                    self._write_diff(gid, old, doc)
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                # _write_diff が途中まで進めた _seqs は DB と食い違うので、次回は全行を書き直す
+                for gid in docs:
+                    self._saved.pop(gid, None)
+                    self._seqs.pop(gid, None)
+                raise
+            for gid, doc in docs.items():
+                self._saved[gid] = copy.deepcopy(doc)
+
+    def _write_diff(self, gid: str, old: Json, new: Json) -> None:
+        c = self._conn
+
+        # games（1 行にまとめる）
+        if any(old.get(s) != new.get(s) for s in GAME_SECTIONS):
+            game = new.get("game") or {}
+            voting_open = new.get("voting_open")
+            reverse_used = new.get("spirit_reverse_used")
+            c.execute(SQL_UPSERT_GAME, (
+                gid,
+                game.get("day") if "game" in new else None,
+                game.get("phase") if "game" in new else None,
+                None if voting_open is None else int(bool(voting_open)),
+                None if reverse_used is None else int(bool(reverse_used)),
+            ))
+
+        # participants: 並び順は seq で保持（追加・削除だけなら既存行の seq は変えない）
+        old_parts = {int(p["id"]): p for p in old.get("participants") or []}
+        new_list = list(new.get("participants") or [])
+        new_seq, renumber = participant_seqs(self._seqs.get(gid, {}), new_list)
+        for p in new_list:
+            uid = int(p["id"])
+            prev = old_parts.get(uid)
+            if renumber or prev is None or prev.get("name") != p.get("name") or prev.get("ho") != p.get("ho"):
+                c.execute(SQL_UPSERT_PARTICIPANT, (gid, uid, new_seq[uid], str(p.get("name", "")), p.get("ho")))
+        new_ids = {int(p["id"]) for p in new_list}
+        c.executemany(SQL_DELETE_PARTICIPANT, [(gid, uid) for uid in old_parts if uid not in new_ids])
+        self._seqs[gid] = new_seq
+
+        # night_actions / votes: 1 選択 = 1 行
+        changed, removed = diff(flatten_actions(old.get("night_actions")), flatten_actions(new.get("night_actions")))
+        c.executemany(SQL_UPSERT_NIGHT_ACTION, [(gid, role, voter, target) for (role, voter), target in changed.items()])
+        c.executemany(SQL_DELETE_NIGHT_ACTION, [(gid, role, voter) for role, voter in removed])
+        changed, removed = diff(old.get("votes") or {}, new.get("votes") or {})
+        c.executemany(SQL_UPSERT_VOTE, [(gid, voter, target) for voter, target in changed.items()])
+        c.executemany(SQL_DELETE_VOTE, [(gid, voter) for voter in removed])
+
+        # message ids
+        for kind in MESSAGE_SECTIONS:
+            if old.get(kind) != new.get(kind):
+                if new.get(kind) is None:
+                    c.execute(SQL_DELETE_MESSAGE, (gid, kind))
+                else:
+                    c.execute(SQL_UPSERT_MESSAGE, (gid, kind, int(new[kind])))
+
+        # その他のセクション
+        for section in set(old) | set(new):
+            if section in NORMALIZED or old.get(section) == new.get(section):
+                continue
+            if section in new:
+                c.execute(SQL_UPSERT_EXTRA, (gid, section, json.dumps(new[section], ensure_ascii=False)))
+            else:
+                c.execute(SQL_DELETE_EXTRA, (gid, section))
+
+    def _delete_rows(self, gid: str) -> None:
+        for table in TABLES:
+            self._conn.execute(f"DELETE FROM {table} WHERE guild_id = ?", (gid,))
+
+    def delete_guild(self, gid: str) -> None:
+        with self._lock:
+            c = self._conn
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_rows(gid)
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+            self._saved.pop(gid, None)
+            self._seqs.pop(gid, None)
+
+    # ---------- game log ----------
+    def append_log(self, key: str, lines: List[str]) -> None:
+        with self._lock:
+            c = self._conn
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                c.executemany("INSERT INTO game_log (log_key, line) VALUES (?, ?)", [(key, line) for line in lines])
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+
+    def iter_log(self, key: str, chunk: int = 500) -> Iterator[List[str]]:
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, line FROM game_log WHERE log_key = ? AND id > ? ORDER BY id LIMIT ?", (key, last, chunk)
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [line for _, line in rows]
+
+    # ---------- cross-process invalidation ----------
+    def publish_invalidation(self, gids: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO invalidations (origin, guild_id) VALUES (?, ?)", [(self.origin, g) for g in gids]
+            )
+            # 古い通知は間引く
+            self._conn.execute("DELETE FROM invalidations WHERE id < (SELECT MAX(id) FROM invalidations) - 1000")
+
+    def _poll(self) -> List[str]:
+        """新しい通知を読み、他プロセスが書いたギルドの差分の基準を捨てて返す。
+
+        ワーカースレッドで save_guilds と同じロックの中で行うので、保存の途中で基準が消えることはない。
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, origin, guild_id FROM invalidations WHERE id > ? ORDER BY id", (self._last_invalidation,)
+            ).fetchall()
+            gids: List[str] = []
+            for row_id, origin, gid in rows:
+                self._last_invalidation = row_id
+                if origin != self.origin:
+                    self._saved.pop(gid, None)
+                    self._seqs.pop(gid, None)
+                    gids.append(gid)
+            return gids
+
+    async def listen_invalidations(self) -> AsyncIterator[str]:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                gids = await asyncio.to_thread(self._poll)
+            except Exception as e:
+                print(f"[Storage] invalidation poll failed: {e}")
+                continue
+            for gid in gids:
+                yield gid
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,410 @@
+# backends/upstash.py
+"""Upstash Redis (REST) バックエンド。
+
+ギルドの状態を Redis のハッシュに分けて保存する（prefix = {key}:guild:{gid}）。
+- {prefix}:game          day / phase / voting_open / spirit_reverse_used
+- {prefix}:participants  user_id → {"seq", "name", "ho"}（JSON。seq は並び順）
+- {prefix}:ho            HO → user_id（参加者から作る索引）
+- {prefix}:night         夜アクションのある役職の集合、{prefix}:night:{役職} は voter_ho → target_ho
+- {prefix}:votes         voter_ho → target_ho（未選択は空文字）
+- {prefix}:messages      gm_vote_message_id / dashboard_message_id
+- {prefix}:extras        それ以外のセクション → 値（エンコードは backends.codec）
+保存時は SqliteBackend と同じく前回の内容との差分を取り、変わったフィールドだけを HSET / HDEL する。
+1 回の保存のコマンドは MULTI/EXEC（/multi-exec）でまとめて 1 往復で送る。既知ギルドは集合
+{key}:guilds で管理する。書き込み後は {key}:invalidate チャンネルへ PUBLISH し、
+他プロセスは SSE の /subscribe で受け取ってキャッシュを読み直す。
+
+旧形式は読み込み時に移行する（python -m tools.migrate_upstash で一括移行も可能）。
+- {key} に全体を 1 つの値で保存: 初回の load_index でギルドごとに分割し、同じ MULTI/EXEC で {key} を消す
+- {prefix} にギルド全体を 1 つの値で保存: ハッシュが無ければそれを読み、次回保存時にハッシュへ書き直して削除
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import aiohttp
+import requests
+
+from backends.base import (
+    MESSAGE_SECTIONS,
+    NORMALIZED,
+    Backend,
+    Json,
+    diff,
+    flatten_actions,
+    participant_seqs,
+)
+from backends.codec import Codec
+
+# ギルドごとのハッシュ（{prefix}:{part}）。夜アクションの役職ごとのハッシュは別
+PARTS = ("game", "participants", "ho", "night", "votes", "messages", "extras")
+# 読み込むもの（ho は参加者から作る索引なので読まない）
+READ_PARTS = tuple(p for p in PARTS if p != "ho")
+# 1 往復で読み込むギルド数
+READ_BATCH = 50
+
+
+def _pairs(flat: Any) -> Dict[str, str]:
+    """HGETALL の応答（REST は [field, value, ...] の平らな配列）→ dict"""
+    if isinstance(flat, dict):
+        return flat
+    flat = flat or []
+    return dict(zip(flat[0::2], flat[1::2]))
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _hash_cmds(key: str, old: Dict[str, str], new: Dict[str, str]) -> List[List[Any]]:
+    """old → new にするための HSET / HDEL（変化が無ければ空）"""
+    changed, removed = diff(old, new)
+    cmds: List[List[Any]] = []
+    if changed:
+        cmds.append(["HSET", key, *[x for item in changed.items() for x in item]])
+    if removed:
+        cmds.append(["HDEL", key, *removed])
+    return cmds
+
+
+def _game_fields(doc: Json) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    if "game" in doc:
+        game = doc["game"] or {}
+        out["day"] = str(int(game.get("day") or 0))
+        out["phase"] = str(game.get("phase") or "day")
+    for section in ("voting_open", "spirit_reverse_used"):
+        if doc.get(section) is not None:
+            out[section] = "1" if doc[section] else "0"
+    return out
+
+
+def _targets(choices: Optional[Dict[str, Optional[str]]]) -> Dict[str, str]:
+    # 未選択（None）は空文字で保存する
+    return {str(k): v or "" for k, v in (choices or {}).items()}
+
+
+class UpstashBackend(Backend):
+    name = "upstash"
+
+    def __init__(self, url: str, token: str, key: str, codec: Optional[Codec] = None):
+        self.url = url.rstrip("/")
+        self.codec = codec or Codec()
+        self.token = token
+        self.key = key
+        # 自分が出した無効化通知を受信側で無視するための識別子
+        self.origin = uuid.uuid4().hex[:12]
+        self._migrated = False
+        # 前回保存した（または読み込んだ）内容と参加者の seq。差分計算に使う
+        self._saved: Dict[str, Json] = {}
+        self._seqs: Dict[str, Dict[int, int]] = {}
+
+    # ---------- REST ----------
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def command(self, *args: Any) -> Any:
+        resp = requests.post(self.url, headers=self._headers, json=[str(a) for a in args], timeout=10)
+        if resp.status_code >= 300:
+            raise RuntimeError(f"kv {args[0]} failed: {resp.status_code} {resp.text}")
+        return resp.json().get("result")
+
+    def pipeline(self, commands: List[List[Any]], atomic: bool = False) -> List[Any]:
+        if not commands:
+            return []
+        path = "/multi-exec" if atomic else "/pipeline"
+        body = [[str(a) for a in cmd] for cmd in commands]
+        resp = requests.post(self.url + path, headers=self._headers, json=body, timeout=10)
+        if resp.status_code >= 300:
+            raise RuntimeError(f"kv pipeline failed: {resp.status_code} {resp.text}")
+        items = resp.json()
+        errors = [item["error"] for item in items if item.get("error")]
+        if errors:
+            raise RuntimeError(f"kv pipeline failed: {errors[0]}")
+        return [item.get("result") for item in items]
+
+    def _guild_key(self, gid: str) -> str:
+        # ハッシュの prefix（旧形式ではギルド全体の値のキー）
+        return f"{self.key}:guild:{gid}"
+
+    def _part(self, gid: str, part: str) -> str:
+        return f"{self._guild_key(gid)}:{part}"
+
+    def _role_key(self, gid: str, role: str) -> str:
+        return f"{self._guild_key(gid)}:night:{role}"
+
+    def _keys(self, gid: str, roles: Iterable[str]) -> List[str]:
+        """ギルドの全キー（旧形式の値を含む）"""
+        return [self._guild_key(gid), *(self._part(gid, p) for p in PARTS), *(self._role_key(gid, r) for r in roles)]
+
+    @property
+    def _index_key(self) -> str:
+        return f"{self.key}:guilds"
+
+    def _log_key(self, key: str) -> str:
+        return f"{self.key}:log:{key}"
+
+    @property
+    def _channel(self) -> str:
+        return f"{self.key}:invalidate"
+
+    # ---------- Backend ----------
+    def load_index(self) -> List[str]:
+        self._migrate_legacy_blob()
+        return [str(g) for g in (self.command("SMEMBERS", self._index_key) or [])]
+
+    def load_guild(self, gid: str) -> Optional[Json]:
+        return self.load_guilds([gid]).get(gid)
+
+    def load_guilds(self, gids: Iterable[str]) -> Dict[str, Json]:
+        gids = list(gids)
+        out: Dict[str, Json] = {}
+        for i in range(0, len(gids), READ_BATCH):
+            chunk = gids[i:i + READ_BATCH]
+            # 1 往復目: 各ハッシュと夜アクションの役職、旧形式の値
+            cmds: List[List[Any]] = []
+            for gid in chunk:
+                cmds += [["SMEMBERS" if p == "night" else "HGETALL", self._part(gid, p)] for p in READ_PARTS]
+                cmds.append(["GET", self._guild_key(gid)])
+            width = len(READ_PARTS) + 1
+            results = self.pipeline(cmds)
+            rows = {gid: dict(zip((*READ_PARTS, "blob"), results[j * width:(j + 1) * width])) for j, gid in enumerate(chunk)}
+            # 2 往復目: 役職ごとの夜アクション
+            roles = [(gid, str(role)) for gid in chunk for role in sorted(rows[gid]["night"] or [])]
+            for (gid, role), flat in zip(roles, self.pipeline([["HGETALL", self._role_key(g, r)] for g, r in roles])):
+                rows[gid].setdefault("actions", {})[role] = _pairs(flat)
+            for gid in chunk:
+                doc = self._read_guild(gid, rows[gid])
+                if doc:
+                    out[gid] = doc
+        return out
+
+    def _read_guild(self, gid: str, row: Dict[str, Any]) -> Json:
+        doc: Json = {}
+        game = _pairs(row["game"])
+        if "day" in game:
+            doc["game"] = {"day": int(game["day"]), "phase": game.get("phase") or "day"}
+        for section in ("voting_open", "spirit_reverse_used"):
+            if section in game:
+                doc[section] = game[section] == "1"
+        parts = sorted(
+            ((int(uid), json.loads(raw)) for uid, raw in _pairs(row["participants"]).items()),
+            key=lambda item: item[1].get("seq", 0),
+        )
+        seqs = {uid: int(p.pop("seq", 0)) for uid, p in parts}
+        if parts:
+            doc["participants"] = [{"id": uid, **p} for uid, p in parts]
+        for role, per_voter in (row.get("actions") or {}).items():
+            if per_voter:
+                doc.setdefault("night_actions", {})[role] = {v: t or None for v, t in per_voter.items()}
+        votes = _pairs(row["votes"])
+        if votes:
+            doc["votes"] = {v: t or None for v, t in votes.items()}
+        for kind, message_id in _pairs(row["messages"]).items():
+            doc[kind] = int(message_id)
+        for section, raw in _pairs(row["extras"]).items():
+            doc[section] = Codec.decode_text(raw)
+
+        if not doc and row.get("blob"):
+            # 旧形式（ギルド全体を 1 つの値）。差分の基準を持たず、次回保存時にハッシュへ書き直す
+            self._saved.pop(gid, None)
+            self._seqs.pop(gid, None)
+            return Codec.decode_text(row["blob"])
+        self._saved[gid] = copy.deepcopy(doc)
+        self._seqs[gid] = seqs
+        return doc
+
+    def _night_roles(self, gids: Sequence[str]) -> Dict[str, List[str]]:
+        results = self.pipeline([["SMEMBERS", self._part(gid, "night")] for gid in gids])
+        return {gid: [str(r) for r in (roles or [])] for gid, roles in zip(gids, results)}
+
+    def save_guilds(self, docs: Dict[str, Json]) -> None:
+        self._save(docs)
+
+    def _save(self, docs: Dict[str, Json], extra: Sequence[List[Any]] = ()) -> None:
+        """docs を差分で書く。extra のコマンドも同じ MULTI/EXEC で実行する"""
+        if not docs and not extra:
+            return
+        # 差分の基準がないギルドは一度だけ全キーを消して書き直す（消すために役職の一覧が要る）
+        fresh = self._night_roles([gid for gid in docs if gid not in self._saved])
+        cmds: List[List[Any]] = []
+        for gid, doc in docs.items():
+            old = self._saved.get(gid)
+            if old is None:
+                cmds.append(["DEL", *self._keys(gid, fresh[gid])])
+                self._seqs[gid] = {}
+                old = {}
+            cmds += self._write_diff(gid, old, doc)
+        if docs:
+            cmds.append(["SADD", self._index_key, *docs.keys()])
+        cmds += extra
+        try:
+            self.pipeline(cmds, atomic=True)
+        except Exception:
+            # 書けたか分からないので基準を捨て、次回は全体を書き直す
+            for gid in docs:
+                self._saved.pop(gid, None)
+                self._seqs.pop(gid, None)
+            raise
+        for gid, doc in docs.items():
+            self._saved[gid] = copy.deepcopy(doc)
+
+    def _write_diff(self, gid: str, old: Json, new: Json) -> List[List[Any]]:
+        cmds = _hash_cmds(self._part(gid, "game"), _game_fields(old), _game_fields(new))
+
+        # participants: 値は seq（並び順）込みの JSON。追加・削除だけなら他の参加者は書き直さない
+        old_seq = self._seqs.get(gid, {})
+        new_list = list(new.get("participants") or [])
+        new_seq, _ = participant_seqs(old_seq, new_list)
+
+        def encode(participants: List[Json], seqs: Dict[int, int]) -> Dict[str, str]:
+            return {
+                str(p["id"]): _dumps({"seq": seqs.get(int(p["id"]), 0), **{k: v for k, v in p.items() if k != "id"}})
+                for p in participants
+            }
+
+        def ho_index(participants: List[Json]) -> Dict[str, str]:
+            return {str(p["ho"]): str(p["id"]) for p in participants if p.get("ho")}
+
+        old_list = list(old.get("participants") or [])
+        cmds += _hash_cmds(self._part(gid, "participants"), encode(old_list, old_seq), encode(new_list, new_seq))
+        cmds += _hash_cmds(self._part(gid, "ho"), ho_index(old_list), ho_index(new_list))
+        self._seqs[gid] = new_seq
+
+        # night_actions: 役職ごとのハッシュ。役職の集合も合わせる
+        changed, removed = diff(flatten_actions(old.get("night_actions")), flatten_actions(new.get("night_actions")))
+        per_role: Dict[str, List[Any]] = {}
+        for (role, voter), target in changed.items():
+            per_role.setdefault(role, []).extend([voter, target or ""])
+        cmds += [["HSET", self._role_key(gid, role), *fields] for role, fields in per_role.items()]
+        gone: Dict[str, List[str]] = {}
+        for role, voter in removed:
+            gone.setdefault(role, []).append(voter)
+        cmds += [["HDEL", self._role_key(gid, role), *voters] for role, voters in gone.items()]
+        old_roles = {r for r, v in (old.get("night_actions") or {}).items() if v}
+        new_roles = {r for r, v in (new.get("night_actions") or {}).items() if v}
+        if new_roles - old_roles:
+            cmds.append(["SADD", self._part(gid, "night"), *sorted(new_roles - old_roles)])
+        if old_roles - new_roles:
+            cmds.append(["SREM", self._part(gid, "night"), *sorted(old_roles - new_roles)])
+
+        cmds += _hash_cmds(self._part(gid, "votes"), _targets(old.get("votes")), _targets(new.get("votes")))
+
+        def messages(doc: Json) -> Dict[str, str]:
+            return {kind: str(int(doc[kind])) for kind in MESSAGE_SECTIONS if doc.get(kind) is not None}
+
+        cmds += _hash_cmds(self._part(gid, "messages"), messages(old), messages(new))
+
+        # その他のセクション（変わったものだけエンコードする）
+        extras = self._part(gid, "extras")
+        for section in set(old) | set(new):
+            if section in NORMALIZED or old.get(section) == new.get(section):
+                continue
+            if section in new:
+                cmds.append(["HSET", extras, section, self.codec.encode_text(new[section])])
+            else:
+                cmds.append(["HDEL", extras, section])
+        return cmds
+
+    def delete_guild(self, gid: str) -> None:
+        roles = self._night_roles([gid])[gid]
+        self.pipeline([["DEL", *self._keys(gid, roles)], ["SREM", self._index_key, gid]], atomic=True)
+        self._saved.pop(gid, None)
+        self._seqs.pop(gid, None)
+
+    def append_log(self, key: str, lines: List[str]) -> None:
+        if lines:
+            self.command("RPUSH", self._log_key(key), *lines)
+
+    def iter_log(self, key: str, chunk: int = 500) -> Iterator[List[str]]:
+        start = 0
+        while True:
+            batch = self.command("LRANGE", self._log_key(key), start, start + chunk - 1) or []
+            if not batch:
+                return
+            yield [str(line) for line in batch]
+            start += len(batch)
+
+    def publish_invalidation(self, gids: Iterable[str]) -> None:
+        cmds = [["PUBLISH", self._channel, f"{self.origin}:{gid}"] for gid in gids]
+        try:
+            self.pipeline(cmds)
+        except Exception as e:
+            print(f"[Storage] publish invalidation failed: {e}")
+
+    async def listen_invalidations(self) -> AsyncIterator[str]:
+        url = f"{self.url}/subscribe/{self._channel}"
+        headers = dict(self._headers, Accept="text/event-stream")
+        backoff = 1.0
+        while True:
+            try:
+                timeout = aiohttp.ClientTimeout(total=None, sock_read=None)
+                async with aiohttp.ClientSession(timeout=timeout) as session:
+                    async with session.get(url, headers=headers) as resp:
+                        backoff = 1.0
+                        async for raw_line in resp.content:
+                            line = raw_line.decode("utf-8", "replace").strip()
+                            # data: message,<channel>,<origin>:<gid>
+                            if not line.startswith("data:"):
+                                continue
+                            payload = line[5:].strip().rsplit(",", 1)[-1]
+                            origin, _, gid = payload.partition(":")
+                            if gid and origin != self.origin:
+                                # 他プロセスの書き込みなので差分の基準も捨てる
+                                self._saved.pop(gid, None)
+                                self._seqs.pop(gid, None)
+                                yield gid
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[Storage] invalidation stream error: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+    # ---------- migration ----------
+    def _migrate_legacy_blob(self) -> None:
+        """旧形式の単一の値をギルド単位のハッシュへ分割し、同じ MULTI/EXEC で旧値を消す（一度だけ）"""
+        if self._migrated:
+            return
+        self._migrated = True
+        raw = self.command("GET", self.key)
+        if not raw:
+            return
+        if self.command("SCARD", self._index_key):
+            # 旧値を消さずに移行した版の残り。索引が空になったときに古い状態が戻らないよう消す
+            self.command("DEL", self.key)
+            return
+        try:
+            data = Codec.decode_text(raw)
+        except Exception as e:
+            print(f"[Storage] legacy blob is unreadable, left as is: {e}")
+            return
+        docs: Dict[str, Json] = {}
+        for section, per_guild in data.items():
+            if isinstance(per_guild, dict):
+                for gid, value in per_guild.items():
+                    docs.setdefault(str(gid), {})[section] = value
+        self._save(docs, extra=[["DEL", self.key]])
+        print(f"[Storage] migrated legacy blob to {len(docs)} guilds")
+
+    def legacy_guilds(self, gids: Sequence[str]) -> List[str]:
+        """ギルド全体を 1 つの値で保存した旧形式のキーが残っているギルド"""
+        results = self.pipeline([["EXISTS", self._guild_key(gid)] for gid in gids])
+        return [gid for gid, n in zip(gids, results) if int(n or 0)]
+
+    def migrate_guild(self, gid: str) -> bool:
+        """旧形式の値をハッシュへ書き直して削除する（ハッシュが既にあれば旧値を消すだけ）。書き直したら True"""
+        doc = self.load_guild(gid)
+        if gid in self._saved:
+            self.command("DEL", self._guild_key(gid))
+            return False
+        if doc:
+            self.save_guilds({gid: doc})
+        else:
+            self.delete_guild(gid)
+        return True
@@ -1,21 +1,123 @@
 # cogs/entry_manager.py
 import discord
-import asyncio
+import time
 from discord import app_commands
 from discord.ext import commands
-from typing import List
-
-from config import ENTRY_TITLE, ENTRY_DESCRIPTION, PRIVATE_CATEGORY_NAME, GM_ROLE_NAME
-from storage import Storage
-from utils.helpers import ensure_gm_environment, ensure_player_role, is_member_spirit, has_gm_or_manage_guild
+from typing import List, Mapping
+
+from config import ENTRY_TITLE, ENTRY_DESCRIPTION
+from storage import ParticipantChange, Storage
+from utils.events import (
+    bus,
+    guild_ids,
+    NightActionRecorded,
+    ParticipantsChanged,
+    PhaseChanged,
+    RoleUiPosted,
+    VoteRecorded,
+    VotingClosed,
+)
+from utils.channels import ChannelPlan, private_overwrites
+from utils.provision import provision
+from utils.guild_config import guild_config
+from utils.helpers import GameView, ensure_gm_environment, ensure_player_role, ensure_spirit_channel, ensure_spirit_role, is_member_spirit, has_gm_or_manage_guild
+from utils.locks import guild_locks, reply_busy
+from utils.scenario import scenarios
+from utils.broadcast import broadcast, channel_index, format_report
+from utils.night import format_result, night_result
+from utils import rotation
+from utils.game_log import game_log
+from utils.interactions import edit_response, ensure_deferred, respond
+from utils.lifecycle import lifecycle
+from utils.members import cache_all, get_member, get_members, role_holders
+from utils.tables import tables
+
+
+# 参加者一覧から作る描画部品のキャッシュ（Storage の変更通知で必要な分だけ破棄）
+_embed_cache: dict[int, tuple[int, discord.Embed]] = {}
+_ho_label_cache: dict[int, tuple[object, list[tuple[str, str]]]] = {}
+
+# 役職行動フェーズの掲示（卓, メッセージ）→ 掲示した時点の日数。進行済みなら「翌日に進む」は重複クリック
+_action_panel_days: dict[tuple[object, int], int] = {}
+
+
+def _on_participants_changed(change: ParticipantChange) -> None:
+    _embed_cache.pop(change.guild_id, None)
+    # 追加直後は HO 未割当なので HO 選択肢は変わらない
+    if change.kind != "add":
+        _ho_label_cache.pop(change.guild_id, None)
+
+
+Storage.on_participants_changed(_on_participants_changed)
 
 
 def build_participants_embed(guild_id: int) -> discord.Embed:
+    version = Storage.participants_version(guild_id)
+    cached = _embed_cache.get(guild_id)
+    if cached and cached[0] == version:
+        return cached[1].copy()
     names = Storage.get_participant_names(guild_id)
     value = "\n".join(names) if names else "（まだ参加者はいません）"
     embed = discord.Embed(title=ENTRY_TITLE, description=ENTRY_DESCRIPTION, color=discord.Color.blurple())
     embed.add_field(name="メンバー", value=value, inline=False)
-    return embed
+    _embed_cache[guild_id] = (version, embed)
+    return embed.copy()
+
+
+def _ho_select_options(guild_id: int) -> List[discord.SelectOption]:
+    """HO割当済み参加者の選択肢（人狼タグ付き）。ラベル計算はキャッシュする"""
+    scenario = scenarios.for_guild(guild_id)
+    cached = _ho_label_cache.get(guild_id)
+    # シナリオの切替/再読込でも作り直す
+    labels = cached[1] if cached is not None and cached[0] is scenario else None
+    if labels is None:
+        wolf_hos = scenario.wolf_hos
+        labels = []
+        for p in Storage.get_participants(guild_id):
+            if not p.get("ho"):
+                continue
+            ho = str(p.get("ho"))
+            name = str(p.get("name", ""))
+            wolf_tag = "（人狼）" if ho in wolf_hos else ""
+            labels.append((f"{ho} {name}{wolf_tag}".strip(), ho))
+        _ho_label_cache[guild_id] = (scenario, labels)
+    if not labels:
+        return [discord.SelectOption(label="対象なし", value="none")]
+    return [discord.SelectOption(label=label, value=value) for label, value in labels]
+
+
+def _preselect_option(select: discord.ui.Select, value: str | None) -> None:
+    """回転の配置から求めた既定値を選択肢に反映"""
+    for opt in select.options:
+        opt.default = value is not None and opt.value == value
+
+
+def _selected_options(message: discord.Message | None) -> dict[str, str]:
+    """掲示中のメッセージに残っている選択（既定値）を custom_id ごとに読む"""
+    selected: dict[str, str] = {}
+    for row in getattr(message, "components", None) or []:
+        for component in getattr(row, "children", ()):
+            for opt in getattr(component, "options", None) or ():
+                if opt.default and component.custom_id:
+                    selected[component.custom_id] = opt.value
+    return selected
+
+
+# 役職行動フェーズの連絡 → 送り先になる回転役職
+_ACTION_ROLE_HOLDER = {"占い結果": "占い", "霊能": "霊能", "狂人": "狂人"}
+
+
+def _rotation_note(guild_id: int) -> str:
+    """回転の配置が未設定なら、送信先の自動選択が効かないことを案内する"""
+    if rotation.assignment(guild_id) is not None:
+        return ""
+    return "\n- 回転の配置が未設定のため送信先は自動選択されません（`/rotation HO2=占い HO3=狩人 ...` で設定）"
+
+
+def _remember_action_panel(guild_id: int, message: discord.Message | None) -> None:
+    """役職行動フェーズを掲示した日を覚える（「翌日に進む」の重複クリック判定に使う）"""
+    if message is not None:
+        _action_panel_days[(guild_id, int(message.id))] = Storage.get_game(guild_id)["day"]
 
 
 async def _upsert_dashboard_panel(guild: discord.Guild) -> None:
@@ -42,8 +144,15 @@ async def _gm_log(guild: discord.Guild, content: str) -> None:
 
 
 async def _gm_log_interaction(interaction: discord.Interaction, content: str) -> None:
-    user = interaction.user
-    await _gm_log(interaction.guild, f"[GM Action] {user.mention} {content}")
+    await _gm_log_actor(tables.of(interaction), interaction.user, content)
+
+
+async def _gm_log_actor(guild: discord.Guild, actor: discord.abc.User | None, content: str) -> None:
+    """操作者（タイマー実行時は None）付きで gm-log に記録"""
+    if actor is None:
+        await _gm_log(guild, f"[Timer] ⏰ {content}")
+    else:
+        await _gm_log(guild, f"[GM Action] {actor.mention} {content}")
 
 
 class AddPlayerSelect(discord.ui.Select):
@@ -60,47 +169,47 @@ class AddPlayerSelect(discord.ui.Select):
 
     async def callback(self, interaction: discord.Interaction):
         if not interaction.guild:
-            if not interaction.response.is_done():
-                try:
-                    await interaction.response.defer(ephemeral=True, thinking=False)
-                except Exception:
-                    pass
+            await ensure_deferred(interaction)
             return
-        gid = interaction.guild.id
         val = self.values[0]
         if val == "none":
-            if not interaction.response.is_done():
-                try:
-                    await interaction.response.defer(ephemeral=True, thinking=False)
-                except Exception:
-                    pass
+            await ensure_deferred(interaction)
             await _gm_log_interaction(interaction, "追加候補がありませんでした")
             return
-        member = interaction.guild.get_member(int(val))
+        member = await get_member(interaction.guild, int(val))
         if member is None:
-            if not interaction.response.is_done():
-                try:
-                    await interaction.response.defer(ephemeral=True, thinking=False)
-                except Exception:
-                    pass
+            await ensure_deferred(interaction)
             await _gm_log_interaction(interaction, f"メンバーが見つかりません: {val}")
             return
-        Storage.add_participant(gid, member)
-        # 参加者ロール付与
-        try:
-            player_role = await ensure_player_role(interaction.guild)
-            if player_role and player_role not in member.roles:
-                await member.add_roles(player_role, reason="Add as werewolf participant")
-        except discord.Forbidden:
-            pass
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
-        await _gm_log_interaction(interaction, f"参加者追加: {member.display_name} ({member.id})")
-        # Repost panel
-        await _upsert_dashboard_panel(interaction.guild)
+        await _add_participant(interaction, member)
+
+
+class AddPlayerUserSelect(discord.ui.UserSelect):
+    """MEMBER_CACHE=players 用（キャッシュに無いメンバーも Discord 側の検索で選べる）"""
+
+    def __init__(self):
+        super().__init__(placeholder="追加するメンバーを選択", min_values=1, max_values=1)
+
+    async def callback(self, interaction: discord.Interaction):
+        member = self.values[0]
+        if not interaction.guild or not isinstance(member, discord.Member) or member.bot:
+            await ensure_deferred(interaction)
+            return
+        await _add_participant(interaction, member)
+
+
+async def _add_participant(interaction: discord.Interaction, member: discord.Member) -> None:
+    table = tables.of(interaction)
+    Storage.add_participant(table.id, member)
+    # 参加者ロール付与
+    try:
+        player_role = await ensure_player_role(table)
+        if player_role and player_role not in member.roles:
+            await member.add_roles(player_role, reason="Add as werewolf participant")
+    except discord.Forbidden:
+        pass
+    await ensure_deferred(interaction)
+    await _gm_log_interaction(interaction, f"参加者追加: {member.display_name} ({member.id})")
 
 
 class RemovePlayerSelect(discord.ui.Select):
@@ -116,49 +225,38 @@ class RemovePlayerSelect(discord.ui.Select):
         gid = self._guild_id
         val = self.values[0]
         if val == "none":
-            if not interaction.response.is_done():
-                try:
-                    await interaction.response.defer(ephemeral=True, thinking=False)
-                except Exception:
-                    pass
+            await ensure_deferred(interaction)
             await _gm_log_interaction(interaction, "削除候補がありませんでした")
             return
         Storage.remove_participant(gid, int(val))
         # 参加者ロール剥奪
+        member = None
         if interaction.guild:
-            member = interaction.guild.get_member(int(val))
+            member = await get_member(interaction.guild, int(val))
             if member is not None:
                 try:
-                    player_role = await ensure_player_role(interaction.guild)
+                    player_role = await ensure_player_role(tables.of(interaction))
                     if player_role in member.roles:
                         await member.remove_roles(player_role, reason="Remove from werewolf participants")
                 except discord.Forbidden:
                     pass
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
+        await ensure_deferred(interaction)
         if interaction.guild and member is not None:
             await _gm_log_interaction(interaction, f"参加者削除: {member.display_name} ({member.id})")
-        if interaction.guild:
-            await _upsert_dashboard_panel(interaction.guild)
 
 
 def _has_ho_assigned(guild_id: int) -> bool:
-    for p in Storage.get_participants(guild_id):
-        if p.get("ho"):
-            return True
-    return False
+    return any(p.get("ho") for p in Storage.get_participants(guild_id))
 
 
-def _build_tally_text(guild_id: int) -> str:
+def _build_tally_text(guild_id: int, closed: bool = False) -> str:
     parts = Storage.get_participants(guild_id)
     name_by_ho = {str(p.get("ho")): p.get("name") for p in parts if p.get("ho")}
-    lines = ["🌓 夜の行動状況"]
-    # 占い/狩人の夜アクション状況
+    lines = ["🗳️ 夜の投票は締め切られました。集計結果:"] if closed else []
+    lines.append("🌓 夜の行動状況")
+    # 占い/狩人/襲撃の夜アクション状況
     na = Storage.get_night_actions(guild_id)
-    for role in ("占い", "狩人"):
+    for role in ("占い", "狩人", "襲撃"):
         role_map = na.get(role, {})
         for voter_ho, target in sorted(role_map.items()):
             if not voter_ho:
@@ -168,24 +266,40 @@ def _build_tally_text(guild_id: int) -> str:
                 lines.append(f"{role}: {voter_ho} → {target} ({tname})")
             else:
                 lines.append(f"{role}: {voter_ho} → 未選択")
+    # 占い結果・護衛・狂人ルール・回転の判定（夜アクションが変わるまでキャッシュ）
+    judged = format_result(night_result(guild_id), name_by_ho)
+    if judged:
+        lines.append("⚖️ 判定")
+        lines.extend(judged)
+    # 旧来の夜投票（記録がある場合のみ）
+    votes = Storage.get_votes(guild_id)
+    if votes:
+        for ho in sorted(name_by_ho.keys()):
+            target = votes.get(ho)
+            if target:
+                lines.append(f"投票: {ho} → {target} ({name_by_ho.get(target, target)})")
+            elif closed:
+                lines.append(f"投票: {ho} → 未投票")
     return "\n".join(lines)
 
 
-async def _upsert_vote_tally(guild: discord.Guild) -> None:
-    """Edit existing vote_night tally message or create it if missing."""
+async def _upsert_vote_tally(guild: discord.Guild, fresh: bool = False, closed: bool = False) -> None:
+    """Edit existing vote_night tally message or create it if missing.
+    fresh=True posts a new tally message (start of a night)."""
     _, gm_dash, _ = await ensure_gm_environment(guild)
     gm_category = gm_dash.category
     # 既存が別カテゴリにある場合は移動、なければ作成
-    vote_channel = discord.utils.get(guild.text_channels, name="vote_night")
+    vote_channel = guild_config.channel(guild, "vote")
     if vote_channel is None:
-        vote_channel = await guild.create_text_channel("vote_night", category=gm_category)
+        vote_channel = await guild.create_text_channel(guild_config.name(guild.id, "vote"), category=gm_category)
+        guild_config.remember(guild.id, "vote", vote_channel)
     elif gm_category and vote_channel.category_id != gm_category.id:
         try:
             await vote_channel.edit(category=gm_category)
         except discord.Forbidden:
             pass
-    text = _build_tally_text(guild.id)
-    msg_id = Storage.get_gm_vote_message(guild.id)
+    text = _build_tally_text(guild.id, closed=closed)
+    msg_id = None if fresh else Storage.get_gm_vote_message(guild.id)
     try:
         if msg_id:
             msg = await vote_channel.fetch_message(msg_id)
@@ -210,9 +324,9 @@ class GMFlowButton(discord.ui.Button):
         if not _has_ho_assigned(gid):
             return "参加者を締め切る"
         # 2) フェーズで分岐
-        Storage.ensure_game(gid)
-        phase = Storage.data["game"][str(gid)]["phase"]
-        day = Storage.data["game"][str(gid)]["day"]
+        game = Storage.get_game(gid)
+        phase = game["phase"]
+        day = game["day"]
         if phase == "night":
             return "翌日に進む"
         # phase == day
@@ -223,34 +337,36 @@ class GMFlowButton(discord.ui.Button):
     async def callback(self, interaction: discord.Interaction):
         if not interaction.guild:
             return
-        gid = interaction.guild.id
-        # 長処理や内部での返信の有無に関わらず、早期にdeferしておく
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True)
-            except Exception:
-                pass
-        label = self._compute_label()
-        if label == "参加者を締め切る":
-            await _do_close_entry(interaction)
-        elif label == "翌日に進む":
-            await _do_next_day(interaction)
-        elif label == "夜に移行する":
-            await _do_night_phase(interaction)
-        # 再掲（既存メッセージを編集 or 新規）
-        await _upsert_dashboard_panel(interaction.guild)
+        guild = tables.of(interaction)
+        async with guild_locks.try_hold(guild.id) as acquired:
+            if not acquired:
+                await reply_busy(interaction)
+                return
+            # 表示中のラベルと現在の状態が食い違う＝既に別のクリックで進行済み
+            label = self._compute_label()
+            if label != self.label:
+                await reply_busy(interaction, "⚠️ この操作は既に実行済みです（パネルは最新状態に更新されます）")
+                return
+            # 長処理や内部での返信の有無に関わらず、早期にdeferしておく
+            await ensure_deferred(interaction)
+            if label == "参加者を締め切る":
+                await _do_close_entry(interaction)
+            elif label == "翌日に進む":
+                await _do_next_day(guild, interaction.user)
+            elif label == "夜に移行する":
+                await _do_night_phase(guild, interaction.user)
+        # パネルの再描画は ParticipantsChanged / PhaseChanged の購読者が行う
         try:
-            await interaction.followup.send("✅ 実行しました", ephemeral=True)
+            await respond(interaction, "✅ 実行しました")
         except Exception:
-            if not interaction.response.is_done():
-                await interaction.response.send_message("✅ 実行しました", ephemeral=True)
+            pass
 
 
-class EntryManageView(discord.ui.View):
+class EntryManageView(GameView):
     def __init__(self, guild: discord.Guild):
         super().__init__(timeout=None)
         frozen = _has_ho_assigned(guild.id)
-        add_select = AddPlayerSelect(guild)
+        add_select = AddPlayerSelect(guild) if cache_all() else AddPlayerUserSelect()
         rem_select = RemovePlayerSelect(guild.id)
         if frozen:
             add_select.disabled = True
@@ -265,90 +381,157 @@ class EntryManageView(discord.ui.View):
 class EntryManagerCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        lifecycle.expect_recovery("panels")
+        # 状態変更イベントでダッシュボード/集計/役職UIを更新（短時間の連続変更は1回にまとめる）
+        bus.subscribe("panel", self._refresh_panels, (ParticipantsChanged, PhaseChanged), batch_window=1.0)
+        bus.subscribe("tally", self._refresh_tallies, (NightActionRecorded, VoteRecorded, PhaseChanged, VotingClosed), batch_window=1.0)
+        bus.subscribe("role_ui", self._retire_role_uis, (RoleUiPosted,), batch_window=0.5)
+
+    async def cog_unload(self):
+        for name in ("panel", "tally", "role_ui"):
+            bus.unsubscribe(name)
+
+    async def _refresh_panels(self, events: list) -> None:
+        for gid in guild_ids(events):
+            guild = await tables.fetch(self.bot, gid)
+            # 掲示済みのパネルだけを更新（リセット直後などに新規掲示しない）
+            if guild is None or not Storage.get_dashboard_message(gid):
+                continue
+            try:
+                await _upsert_dashboard_panel(guild)
+            except Exception as e:
+                print(f"[panel] refresh failed for {gid}: {e}")
+
+    async def _refresh_tallies(self, events: list) -> None:
+        for gid in guild_ids(events):
+            relevant = [
+                e for e in events
+                if e.guild_id == gid and not (isinstance(e, PhaseChanged) and e.phase != "night")
+            ]
+            guild = await tables.fetch(self.bot, gid)
+            if guild is None or not relevant:
+                continue
+            fresh = any(isinstance(e, PhaseChanged) for e in relevant)
+            closed = isinstance(relevant[-1], VotingClosed)
+            try:
+                await _upsert_vote_tally(guild, fresh=fresh, closed=closed)
+            except Exception as e:
+                print(f"[tally] refresh failed for {gid}: {e}")
+
+    async def _retire_role_uis(self, events: list) -> None:
+        latest = {e.guild_id: int(e.message_id) for e in events}
+        for gid, keep_id in latest.items():
+            guild = await tables.fetch(self.bot, gid)
+            if guild is None:
+                continue
+            try:
+                await _disable_old_role_message_ui(guild, keep_id=keep_id)
+            except Exception:
+                pass
 
     @app_commands.command(name="entry", description="GM用: 参加者管理パネルをgm-dashboardに表示")
     async def entry(self, interaction: discord.Interaction):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
         if not has_gm_or_manage_guild(interaction):
-            await interaction.response.send_message("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
         await Storage.ensure_loaded()
-        guild = interaction.guild
+        guild = tables.of(interaction)
         # 参加者ロールも用意
         # 長処理になる可能性があるため、先にdeferして Unknown interaction を回避
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
+        await ensure_deferred(interaction)
         await ensure_player_role(guild)
         await _upsert_dashboard_panel(guild)
         try:
-            await interaction.followup.send("✅ 参加者管理パネルを配置しました。", ephemeral=True)
+            await respond(interaction, "✅ 参加者管理パネルを配置しました。")
         except Exception:
-            # 応答が未送信であれば直接送信を試行
-            if not interaction.response.is_done():
-                try:
-                    await interaction.response.send_message("✅ 参加者管理パネルを配置しました。", ephemeral=True)
-                except Exception:
-                    pass
+            pass
         await _gm_log_interaction(interaction, "参加者管理パネルを設置/更新")
 
     @app_commands.command(name="close_entry", description="参加者募集を締め切り、HO個別ロールとチャンネルを作成")
     async def close_entry(self, interaction: discord.Interaction):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
         if not has_gm_or_manage_guild(interaction):
-            await interaction.response.send_message("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
         await Storage.ensure_loaded()
-        await _do_close_entry(interaction)
+        async with guild_locks.try_hold(tables.of(interaction).id) as acquired:
+            if not acquired:
+                await reply_busy(interaction)
+                return
+            await _do_close_entry(interaction)
+
+    # チャンネル名キャッシュ（一斉送信の宛先解決用）の破棄
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        channel_index.invalidate(channel.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        channel_index.invalidate(channel.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        if before.name != after.name:
+            channel_index.invalidate(after.guild.id)
 
     @commands.Cog.listener()
     async def on_ready(self):
-        # 再起動時に保存済みパネルを復旧（編集）
-        await Storage.ensure_loaded()
-        for guild in self.bot.guilds:
-            msg_id = Storage.get_dashboard_message(guild.id)
-            if msg_id:
-                try:
-                    await _upsert_dashboard_panel(guild)
-                except Exception:
-                    pass
-            # vote_night 集計メッセージも復旧（存在する場合）
-            try:
-                # 夜投票は行わないため、night_actions または既存メッセージIDがあれば復旧
-                has_msg = bool(Storage.get_gm_vote_message(guild.id))
-                has_actions = bool(Storage.get_night_actions(guild.id))
-                if has_msg or has_actions:
-                    await _upsert_vote_tally(guild)
-            except Exception:
-                pass
-            # 永続コンポーネントのViewを再登録
+        try:
+            # 再起動時に保存済みパネルを復旧（編集）
+            await Storage.ensure_loaded()
+            # 保存データのあるギルドの全卓だけを（並行して）メモリへ読み込む
+            known = await tables.load_known(self.bot)
+            # 永続コンポーネントのViewを再登録（役職連絡は custom_id ごとに 1 つで全卓の受け口になる）
             try:
-                self.bot.add_view(_build_role_send_phase_view(guild.id))
-                self.bot.add_view(_build_role_action_phase_view(guild.id))
-                self.bot.add_view(_build_hint_buttons_view(guild.id))
+                self.bot.add_view(_build_role_send_phase_view(None))
+                self.bot.add_view(_build_role_action_phase_view(None))
             except Exception:
                 pass
+            for guild in self.bot.guilds:
+                try:
+                    self.bot.add_view(_build_hint_buttons_view(guild.id))
+                except Exception:
+                    pass
+            for guild in known:
+                msg_id = Storage.get_dashboard_message(guild.id)
+                if msg_id:
+                    try:
+                        await _upsert_dashboard_panel(guild)
+                    except Exception:
+                        pass
+                # vote_night 集計メッセージも復旧（存在する場合）
+                try:
+                    # 夜投票は行わないため、night_actions または既存メッセージIDがあれば復旧
+                    has_msg = bool(Storage.get_gm_vote_message(guild.id))
+                    has_actions = bool(Storage.get_night_actions(guild.id))
+                    if has_msg or has_actions:
+                        await _upsert_vote_tally(guild)
+                except Exception:
+                    pass
+        finally:
+            lifecycle.recovered("panels")
 
     @app_commands.command(name="sync_players", description="playerロール保持者から参加者リストを再構築")
     async def sync_players(self, interaction: discord.Interaction):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
         if not has_gm_or_manage_guild(interaction):
-            await interaction.response.send_message("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
         await Storage.ensure_loaded()
-        guild = interaction.guild
+        guild = tables.of(interaction)
         role = await ensure_player_role(guild)
         # 既存のHOを維持するため、id→ho を控える
         existing = {int(p.get("id")): p.get("ho") for p in Storage.get_participants(guild.id)}
-        members = [m for m in guild.members if role in m.roles and not m.bot]
+        # 応答期限までに終わらないことがある（MEMBER_CACHE=players ではメンバーを取り寄せる）
+        await ensure_deferred(interaction)
+        members = await role_holders(guild, [role])
         participants = []
         for m in members:
             participants.append({
@@ -360,7 +543,7 @@ class EntryManagerCog(commands.Cog):
         # パネル再掲
         _, dash, _ = await ensure_gm_environment(guild)
         await dash.send("🧩 参加者管理パネル", embed=build_participants_embed(guild.id), view=EntryManageView(guild))
-        await interaction.response.send_message(f"🔄 playerロールから参加者を同期しました（{len(participants)}名）", ephemeral=True)
+        await respond(interaction, f"🔄 playerロールから参加者を同期しました（{len(participants)}名）")
 
     @app_commands.command(name="repost_role_ui", description="役職UIを再掲（フェーズ変更なし・復旧用）")
     @app_commands.describe(phase="再掲するUIを選択: send=役職送信フェーズ / action=役職行動フェーズ")
@@ -372,26 +555,19 @@ class EntryManagerCog(commands.Cog):
     )
     async def repost_role_ui(self, interaction: discord.Interaction, phase: app_commands.Choice[str]):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
         await Storage.ensure_loaded()
-        guild = interaction.guild
+        guild = tables.of(interaction)
         # 先に静かにdefer
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
+        await ensure_deferred(interaction)
         # 権限チェック: GMロール or Manage Guild
-        gm_role = discord.utils.get(guild.roles, name=GM_ROLE_NAME)
+        gm_role = guild_config.role(guild, "gm_role")
         perms_ok = interaction.user.guild_permissions.manage_guild
         if gm_role and gm_role in getattr(interaction.user, 'roles', []):
             perms_ok = True
         if not perms_ok:
-            try:
-                await interaction.followup.send("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
-            except Exception:
-                pass
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
         # ダッシュボードに再掲
         _, dash, _ = await ensure_gm_environment(guild)
@@ -409,403 +585,194 @@ class EntryManagerCog(commands.Cog):
                     "- 送信ボタンと翌日に進むボタンが利用可能です\n"
                     "- この投稿は復旧のために再掲されています"
                 )
-            await dash.send(content, view=view)
-            try:
-                await interaction.followup.send("🔁 役職UIを再掲しました", ephemeral=True)
-            except Exception:
-                pass
+            msg = await dash.send(content, view=view)
+            if phase.value != "send":
+                _remember_action_panel(guild.id, msg)
+            await respond(interaction, "🔁 役職UIを再掲しました")
             await _gm_log_interaction(interaction, f"役職UI再掲 ({phase.value})")
         except Exception:
-            try:
-                await interaction.followup.send("❌ 再掲に失敗しました", ephemeral=True)
-            except Exception:
-                pass
+            await respond(interaction, "❌ 再掲に失敗しました")
 
     @app_commands.command(name="rebuild_participants", description="player/HOロールから参加者一覧を復元（HO割当も反映）")
     async def rebuild_participants(self, interaction: discord.Interaction):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
         if not has_gm_or_manage_guild(interaction):
-            await interaction.response.send_message("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
         await Storage.ensure_loaded()
-        guild = interaction.guild
+        guild = tables.of(interaction)
         # 先にdefer
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
+        await ensure_deferred(interaction)
         player_role = await ensure_player_role(guild)
-        # HOロールの収集
-        ho_roles = [r for r in guild.roles if str(r.name).upper().startswith("HO")]
+        # この卓の HO ロールの収集（卓 n は "HO1-n"）
+        ho_roles = [r for r in guild.roles if guild_config.ho_of_role(guild.id, r.name)]
+        # 参加対象のメンバー: playerロール or HOロール保持者（MEMBER_CACHE=players では保持者だけを取り寄せる）
+        holders = await role_holders(guild, [player_role, *ho_roles])
         # id -> ho 候補（複数持っている場合は番号が小さいものを優先）
         ho_by_user: dict[int, str] = {}
-        for r in ho_roles:
-            try:
-                members = [m for m in r.members if not m.bot]
-            except Exception:
-                members = []
-            for m in members:
-                try:
-                    n = int(str(r.name).upper().replace("HO", ""))
-                except Exception:
-                    n = 9999
+        for m in holders:
+            for r in m.roles:
+                if r not in ho_roles:
+                    continue
+                ho = guild_config.ho_of_role(guild.id, r.name)
+                n = int(ho.replace("HO", ""))
                 prev = ho_by_user.get(int(m.id))
-                if not prev:
-                    ho_by_user[int(m.id)] = str(r.name).upper()
-                else:
-                    try:
-                        prev_n = int(prev.replace("HO", ""))
-                    except Exception:
-                        prev_n = 9999
-                    if n < prev_n:
-                        ho_by_user[int(m.id)] = str(r.name).upper()
-        # 参加対象のメンバー集合: playerロール or HOロール保持者
-        members_set = set()
-        for m in guild.members:
-            if m.bot:
-                continue
-            if (player_role and player_role in m.roles) or (int(m.id) in ho_by_user):
-                members_set.add(int(m.id))
+                if not prev or n < int(prev.replace("HO", "")):
+                    ho_by_user[int(m.id)] = ho
         # participants を構築
         participants = []
-        for uid in sorted(members_set):
-            m = guild.get_member(uid)
-            if not m:
-                continue
+        for m in sorted(holders, key=lambda m: int(m.id)):
             participants.append({
                 "id": int(m.id),
                 "name": str(m.display_name),
                 "ho": ho_by_user.get(int(m.id)),
             })
+        # パネルは ParticipantsChanged で更新される
         Storage.set_participants(guild.id, participants)
-        # パネル再掲
-        await _upsert_dashboard_panel(guild)
-        try:
-            await interaction.followup.send(f"🛠️ 参加者を復元しました（{len(participants)}名）。HO割当はロールから復元。", ephemeral=True)
-        except Exception:
-            pass
+        await respond(interaction, f"🛠️ 参加者を復元しました（{len(participants)}名）。HO割当はロールから復元。")
         await _gm_log_interaction(interaction, f"参加者復元（player/HOロールから再構築、{len(participants)}名）")
 
     @app_commands.command(name="post_hint_buttons", description="ダッシュボードにヒントボタンを表示（ヒント1→ヒント/ 2-4→霊界）")
     async def post_hint_buttons(self, interaction: discord.Interaction):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
         if not has_gm_or_manage_guild(interaction):
-            await interaction.response.send_message("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
-        guild = interaction.guild
+        await ensure_deferred(interaction)
+        guild = tables.of(interaction)
         await Storage.ensure_loaded()
         # ダッシュボードへ投稿
         _, dash, _ = await ensure_gm_environment(guild)
         try:
             await dash.send("🔎 ヒントボタン", view=_build_hint_buttons_view(guild.id))
-            try:
-                await interaction.followup.send("🧩 ヒントボタンを表示しました", ephemeral=True)
-            except Exception:
-                pass
+            await respond(interaction, "🧩 ヒントボタンを表示しました")
             await _gm_log_interaction(interaction, "ヒントボタンをダッシュボードに掲示")
         except Exception:
-            try:
-                await interaction.followup.send("❌ ヒントボタンの表示に失敗しました", ephemeral=True)
-            except Exception:
-                pass
+            await respond(interaction, "❌ ヒントボタンの表示に失敗しました")
 
     @app_commands.command(name="send_intro_messages", description="HO個別チャンネルに役職説明を送信。任意で特定HOに上書き送信可")
     @app_commands.describe(target_ho="特定のHOにのみ送る（例: HO3）", text="そのHOに送るカスタム文面（未指定ならデフォルト文）")
     async def send_intro_messages(self, interaction: discord.Interaction, target_ho: str | None = None, text: str | None = None):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
         if not has_gm_or_manage_guild(interaction):
-            await interaction.response.send_message("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
-        guild = interaction.guild
+        guild = tables.of(interaction)
+        # 送信件数が多いと 3 秒を超えるため先に応答を確保する
+        await ensure_deferred(interaction, thinking=True)
         await Storage.ensure_loaded()
-        parts = Storage.get_participants(guild.id)
-        wolf_hos = {"HO1", "HO4", "HO10"}
-        wolf_text = (
-            "---------------------------------以下HOです---------------------------------\n"
-            "あなたは【寿司狼】です。\n"
-            "この回転寿司屋の安っぽいレーンで流されている寿司たちに、かつては海を自由に泳いでいた魚としての誇りを思い出させるため、あなたは襲撃を行います。\n"
-            "能力:毎晩一人を指名し、襲撃を行う\n"
-            "寿司たち(村人達)は記憶を失っており、自分たちが寿司であることすら忘れています。\n"
-        )
-        sharer_hos5 = {"HO5"}
-        sharer_text5 = (
-            "---------------------------------以下HOです---------------------------------\n"
-            "あなたは【親子】です。\n"
-            "8番とは親子関係だったことを記憶しており、お互いに村人陣営の味方であることを知っています。"
-        )
-        sharer_hos8 = {"HO8"}
-        sharer_text8 = (
-            "---------------------------------以下HOです---------------------------------\n"
-            "あなたは【親子】です。\n"
-            "5番とは親子関係だったことを記憶しており、お互いに村人陣営の味方であることを知っています。"
-        )
-
-        other_text = (
-            "---------------------------------以下HOです---------------------------------\n"
-            "あなたは何も思い出せない。\n"
-        )
+        scenario = scenarios.for_guild(guild.id)
 
         # 対象HOの決定
-        targets = []
         if target_ho:
-            th = target_ho.upper()
-            for p in parts:
-                if str(p.get("ho") or "").upper() == th:
-                    targets.append(p)
-                    break
+            p = Storage.get_participant_by_ho(guild.id, target_ho)
+            targets = [p] if p is not None else []
         else:
-            targets = [p for p in parts if p.get("ho")]
+            targets = [p for p in Storage.get_participants(guild.id) if p.get("ho")]
 
-        sent = []
+        messages = []
+        members = await get_members(guild, [int(p.get("id", 0)) for p in targets])
         for p in targets:
             ho = str(p.get("ho") or "").upper()
             if not ho:
                 continue
-            member = guild.get_member(int(p.get("id", 0)))
+            member = members.get(int(p.get("id", 0)))
             # 霊界は対象外
-            if member and is_member_spirit(member):
+            if member and is_member_spirit(guild, member):
+                messages.append((ho, None))
                 continue
-            channel = discord.utils.get(guild.text_channels, name=ho.lower())
-            if channel is None:
-                continue
-            if text and target_ho:
-                body = text
-            else:
-                if ho in wolf_hos:
-                    body = wolf_text
-                elif ho in sharer_hos5:
-                    body = sharer_text5
-                elif ho in sharer_hos8:
-                    body = sharer_text8
-                else:
-                    body = other_text
-            try:
-                await channel.send(body)
-                sent.append(ho)
-            except discord.Forbidden:
-                pass
-        if not interaction.response.is_done():
-            await interaction.response.send_message(f"📨 送信済み: {', '.join(sorted(sent)) if sent else '(なし)'}", ephemeral=True)
-        await _gm_log_interaction(interaction, f"役職説明を送信（対象: {', '.join(sorted(sent)) if sent else '(なし)'}）")
+            body = text if (text and target_ho) else scenario.intro(ho, p.get("name"))
+            messages.append((ho, body))
+
+        started = time.perf_counter()
+        deliveries = await broadcast(guild, messages)
+        report = format_report(deliveries, (time.perf_counter() - started) * 1000)
+        await respond(interaction, report[:2000])
+        sent = sorted(d.ho for d in deliveries if d.ok)
+        failed = sorted(d.ho for d in deliveries if d.status in ("forbidden", "error", "no_channel"))
+        summary = f"役職説明を送信（対象: {', '.join(sent) if sent else '(なし)'}）"
+        if failed:
+            summary += f" 失敗: {', '.join(failed)}"
+        await _gm_log_interaction(interaction, summary)
 
 
 # ===== 内部アクション =====
 async def _do_close_entry(interaction: discord.Interaction):
-    guild = interaction.guild
+    guild = tables.of(interaction)
+    # 長処理に入るため、未応答なら先にdefer（表示は出さない）
+    await ensure_deferred(interaction)
     gm_role, dash, _ = await ensure_gm_environment(guild)
     # まず参加者割当を行い、0件なら即時返信
     participants = Storage.assign_ho_sequential(guild.id)
     if not participants:
-        if not interaction.response.is_done():
-            await interaction.response.send_message("参加者がいません。", ephemeral=True)
-        else:
-            await interaction.followup.send("参加者がいません。", ephemeral=True)
+        await respond(interaction, "参加者がいません。")
         return
 
-    # 長処理に入るため、未応答なら先にdefer（表示は出さない）
-    if not interaction.response.is_done():
-        try:
-            await interaction.response.defer(ephemeral=True, thinking=False)
-        except Exception:
-            pass
-
-    # 個別チャンネル用の専用カテゴリを使用/作成
-    category = discord.utils.get(guild.categories, name=PRIVATE_CATEGORY_NAME)
-    if category is None:
-        category = await guild.create_category(PRIVATE_CATEGORY_NAME, reason="Create private HO category")
-
-    created_channels = []
-    for p in participants:
-        uid = int(p["id"])
-        ho = str(p.get("ho") or "").upper()
-        if not ho:
-            continue
-        member = guild.get_member(uid)
-        if member is None:
-            continue
-        # HOロール
-        ho_role = discord.utils.get(guild.roles, name=ho)
-        if ho_role is None:
-            try:
-                ho_role = await guild.create_role(name=ho, reason="HO private role")
-            except discord.Forbidden:
-                continue
-        try:
-            await member.add_roles(ho_role, reason="Assign HO private role")
-        except discord.Forbidden:
-            pass
-        # チャンネル
-        ch_name = ho.lower()
-        # 既存が別カテゴリにある場合は移動、なければ作成
-        channel = discord.utils.get(guild.text_channels, name=ch_name)
-        if channel is None:
-            overwrites = {
-                guild.default_role: discord.PermissionOverwrite(view_channel=False),
-                gm_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True),
-                ho_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True),
-            }
-            me = getattr(guild, "me", None)
-            if me is not None:
-                overwrites[me] = discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True)
-            try:
-                channel = await guild.create_text_channel(ch_name, category=category, overwrites=overwrites, reason="Create HO private channel")
-            except discord.Forbidden:
-                continue
-        elif channel.category_id != (category.id if category else None):
-            try:
-                await channel.edit(category=category)
-            except discord.Forbidden:
-                pass
-        created_channels.append(channel.mention if channel else ho)
-
-    summary = "、".join(created_channels) if created_channels else "(なし)"
-    if not interaction.response.is_done():
-        try:
-            await interaction.response.defer(ephemeral=True, thinking=False)
-        except Exception:
-            pass
-    # ゲーム進行カテゴリと player 可視の2チャンネル（連絡/ヒント）を用意
+    # HO ロール作成/付与と個別チャンネル・連絡/ヒントの用意（完了済みの手順は飛ばして続きから）
     try:
         player_role = await ensure_player_role(guild)
     except Exception:
         player_role = None
-    progress_cat = discord.utils.get(guild.categories, name="ゲーム進行")
-    if progress_cat is None:
-        try:
-            progress_cat = await guild.create_category("ゲーム進行")
-        except discord.Forbidden:
-            progress_cat = None
-    def _ensure_text_channel(name: str) -> None:
-        ch = discord.utils.get(guild.text_channels, name=name)
-        if ch is None and progress_cat is not None and player_role is not None:
-            overwrites = {
-                guild.default_role: discord.PermissionOverwrite(view_channel=False),
-                gm_role or guild.default_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True),
-                player_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True),
-            }
-            try:
-                return asyncio.create_task(guild.create_text_channel(name, category=progress_cat, overwrites=overwrites))
-            except Exception:
-                return None
-        elif ch is not None and progress_cat is not None and ch.category_id != progress_cat.id:
-            try:
-                return asyncio.create_task(ch.edit(category=progress_cat))
-            except Exception:
-                return None
-        return None
-    _ensure_text_channel("連絡")
-    _ensure_text_channel("ヒント")
-    await _gm_log_interaction(interaction, f"参加者募集を締め切り。作成/準備したチャンネル: {summary}")
-
-
-async def _do_next_day(interaction: discord.Interaction):
-    Storage.ensure_game(interaction.guild.id)
-    Storage.data["game"][str(interaction.guild.id)]["day"] += 1
-    Storage.data["game"][str(interaction.guild.id)]["phase"] = "day"
-    Storage.save()
-    day = Storage.data["game"][str(interaction.guild.id)]["day"]
-    await _gm_log_interaction(interaction, f"翌日に進行。現在 {day} 日目")
+    report = await provision(guild, participants, gm_role, player_role)
+
+    created_channels = [report.channels[ho].mention for ho in sorted(report.channels, key=rotation.ho_order)]
+    summary = "、".join(created_channels) if created_channels else "(なし)"
+    await _gm_log_interaction(interaction, f"参加者募集を締め切り。作成/準備したチャンネル: {summary}（{report.summary()}）")
+    if not report.complete:
+        await respond(interaction, f"⚠️ 一部の準備に失敗しました。もう一度締め切ると残りだけを実行します。\n{report.summary()}"[:2000])
+
+
+# フェーズ進行はボタン/コマンド（actor=操作者）とタイマー（actor=None）の両方から呼ばれる
+async def _do_next_day(guild: discord.Guild, actor: discord.abc.User | None):
+    day = Storage.advance_day(guild.id)
+    await _gm_log_actor(guild, actor, f"翌日に進行。現在 {day} 日目")
     # 翌日に進んだら、GMダッシュボードに役職送信フェーズUIを掲示（朝に配布する連絡を選べる）
-    _, gm_dash, _ = await ensure_gm_environment(interaction.guild)
+    _, gm_dash, _ = await ensure_gm_environment(guild)
     new_msg = await gm_dash.send(
         "役職送信フェーズ: 役職/対象/送る内容を選んで送信してください",
-        view=_build_role_send_phase_view(interaction.guild.id),
+        view=_build_role_send_phase_view(guild.id),
     )
-    try:
-        await _disable_old_role_message_ui(interaction.guild, keep_id=new_msg.id)
-    except Exception:
-        pass
+    bus.publish(RoleUiPosted(guild.id, new_msg.id))
 
 
-async def _do_night_phase(interaction: discord.Interaction):
-    guild = interaction.guild
-    Storage.ensure_game(guild.id)
-    Storage.data["game"][str(guild.id)]["phase"] = "night"
+async def _do_night_phase(guild: discord.Guild, actor: discord.abc.User | None):
     # 旧夜UIは廃止。占い/狩人のアクション入力に切替
-    # 既存の投票データは初期化し、night_actions もクリア
-    parts = Storage.get_participants(guild.id)
-    ho_list = [p.get("ho") for p in parts if p.get("ho")]
-    # 夜投票は完全停止
-    # Storage.init_votes(guild.id, ho_list)
-    # Storage.set_voting_open(guild.id, True)
+    # 夜投票は完全停止（init_votes / set_voting_open(True) は行わない）
     Storage.clear_night_actions(guild.id)
-    Storage.save()
-    await _gm_log_interaction(interaction, "夜フェーズに移行（夜投票は行わない）")
-    # GM tally message
-    _, gm_dash, _ = await ensure_gm_environment(guild)
-    gm_category = gm_dash.category
-    # 既存が別カテゴリにある場合は移動、なければ作成
-    vote_channel = discord.utils.get(guild.text_channels, name="vote_night")
-    if vote_channel is None:
-        vote_channel = await guild.create_text_channel("vote_night", category=gm_category)
-    elif gm_category and vote_channel.category_id != gm_category.id:
-        try:
-            await vote_channel.edit(category=gm_category)
-        except discord.Forbidden:
-            pass
-    # 夜アクション/投票の初期集計を掲示（以後はHO側UIの送信により更新）
-    text = _build_tally_text(guild.id)
-    msg = await vote_channel.send(text)
-    Storage.set_gm_vote_message(guild.id, msg.id)
+    # PhaseChanged(night) を受けて集計サービスが新しい集計メッセージを掲示する
+    Storage.set_phase(guild.id, "night")
+    await _gm_log_actor(guild, actor, "夜フェーズに移行（夜投票は行わない）")
     # 夜開始時に役職送信フェーズUIをダッシュボードに掲示（過去UIは無効化）
+    _, gm_dash, _ = await ensure_gm_environment(guild)
     new_msg = await gm_dash.send("役職送信フェーズ: 役職/対象/送る内容を選んで送信してください", view=_build_role_send_phase_view(guild.id))
-    try:
-        await _disable_old_role_message_ui(guild, keep_id=new_msg.id)
-    except Exception:
-        pass
+    bus.publish(RoleUiPosted(guild.id, new_msg.id))
 
 
-async def _do_close_vote(interaction: discord.Interaction):
-    guild = interaction.guild
+async def _do_close_vote(guild: discord.Guild, actor: discord.abc.User | None):
+    # VotingClosed を受けて集計サービスが締切表示に更新する
     Storage.set_voting_open(guild.id, False)
-    # update GM tally with closed header
     _, gm_dash, _ = await ensure_gm_environment(guild)
-    gm_category = gm_dash.category
-    vote_channel = None
-    if gm_category:
-        vote_channel = discord.utils.get(gm_category.text_channels, name="vote_night")
-    text = "🗳️ 夜の投票は締め切られました。集計結果:\n" + _build_tally_text(guild.id)
-    if vote_channel is not None:
-        msg_id = Storage.get_gm_vote_message(guild.id)
-        try:
-            if msg_id:
-                msg = await vote_channel.fetch_message(msg_id)
-                await msg.edit(content=text)
-            else:
-                msg = await vote_channel.send(text)
-                Storage.set_gm_vote_message(guild.id, msg.id)
-        except discord.NotFound:
-            msg = await vote_channel.send(text)
-            Storage.set_gm_vote_message(guild.id, msg.id)
     # 役職連絡用のUIは gm-dashboard に掲載（新規を最新とし、過去UIは一括無効化）
     # 夜投票は使わないため、役職行動フェーズUIを提示
     new_msg = await gm_dash.send("役職行動フェーズ: 役職/対象/送る内容を選んで送信してください\n- 送信ボタンと翌日に進むボタンが利用可能です", view=_build_role_action_phase_view(guild.id))
-    try:
-        await _disable_old_role_message_ui(guild, keep_id=new_msg.id)
-    except Exception:
-        pass
-    await _gm_log_interaction(interaction, "夜の投票を締め切り。集計確定＆役職連絡UIを表示")
+    _remember_action_panel(guild.id, new_msg)
+    bus.publish(RoleUiPosted(guild.id, new_msg.id))
+    await _gm_log_actor(guild, actor, "夜の投票を締め切り。集計確定＆役職連絡UIを表示")
 
 
 def _build_vote_view(guild: discord.Guild, voter_ho: str) -> discord.ui.View:
     # 夜投票は行わないため未使用
-    return discord.ui.View(timeout=None)
+    return GameView(timeout=None)
 
 
 def _build_hint_buttons_view(guild_id: int) -> discord.ui.View:
-    class HintButtonsView(discord.ui.View):
+    class HintButtonsView(GameView):
         def __init__(self):
             super().__init__(timeout=None)
             self.add_item(self.Hint1())
@@ -814,79 +781,28 @@ def _build_hint_buttons_view(guild_id: int) -> discord.ui.View:
             self.add_item(self.Hint4())
 
         async def _ensure_progress_channels(self, guild: discord.Guild) -> tuple[discord.TextChannel | None, discord.TextChannel | None]:
-            from utils.helpers import ensure_player_role
             # カテゴリと「連絡」「ヒント」
-            progress_cat = discord.utils.get(guild.categories, name="ゲーム進行")
-            if progress_cat is None:
-                try:
-                    progress_cat = await guild.create_category("ゲーム進行")
-                except discord.Forbidden:
-                    progress_cat = None
             try:
                 player_role = await ensure_player_role(guild)
             except Exception:
                 player_role = None
-            def _perm_overwrites():
-                return {
-                    guild.default_role: discord.PermissionOverwrite(view_channel=False),
-                    discord.utils.get(guild.roles, name=GM_ROLE_NAME) or guild.default_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True),
-                    player_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True) if player_role else None,
-                }
-            def _cleanup_overwrites(ow: dict):
-                return {k: v for k, v in ow.items() if k is not None}
-            contact = discord.utils.get(guild.text_channels, name="連絡")
-            hint = discord.utils.get(guild.text_channels, name="ヒント")
-            if hint is None and progress_cat is not None:
-                try:
-                    hint = await guild.create_text_channel("ヒント", category=progress_cat, overwrites=_cleanup_overwrites(_perm_overwrites()))
-                except Exception:
-                    hint = None
-            if contact is None and progress_cat is not None:
-                try:
-                    contact = await guild.create_text_channel("連絡", category=progress_cat, overwrites=_cleanup_overwrites(_perm_overwrites()))
-                except Exception:
-                    contact = None
-            # カテゴリ不一致なら移動
-            if progress_cat is not None:
-                for ch in (hint, contact):
-                    if ch is not None and ch.category_id != progress_cat.id:
-                        try:
-                            await ch.edit(category=progress_cat)
-                        except Exception:
-                            pass
-            return contact, hint
+            gm_role = guild_config.role(guild, "gm_role")
+            overwrites = private_overwrites(guild, gm_role, player_role)
+            plan = ChannelPlan(guild)
+            hint = guild_config.declare(plan, "hint", category="progress_category", overwrites=overwrites)
+            contact = guild_config.declare(plan, "contact", category="progress_category", overwrites=overwrites)
+            result = await plan.apply()
+            guild_config.record(guild.id, result, "hint", "contact", "progress_category")
+            return result.channels.get(contact), result.channels.get(hint)
 
         async def _ensure_spirit_channel(self, guild: discord.Guild) -> discord.TextChannel | None:
             # 霊界チャンネル（個別カテゴリ配下）。霊界ロールに可視。
-            category = discord.utils.get(guild.categories, name=PRIVATE_CATEGORY_NAME)
-            if category is None:
-                try:
-                    category = await guild.create_category(PRIVATE_CATEGORY_NAME, reason="Create private HO category")
-                except discord.Forbidden:
-                    category = None
-            spirit_role = discord.utils.get(guild.roles, name="霊界")
-            if spirit_role is None:
-                try:
-                    spirit_role = await guild.create_role(name="霊界", reason="Spirit role for afterlife chat")
-                except discord.Forbidden:
-                    spirit_role = None
-            channel = discord.utils.get(guild.text_channels, name="霊界")
-            if channel is None and category is not None and spirit_role is not None:
-                overwrites = {
-                    guild.default_role: discord.PermissionOverwrite(view_channel=False),
-                    discord.utils.get(guild.roles, name=GM_ROLE_NAME) or guild.default_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True),
-                    spirit_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True),
-                }
-                try:
-                    channel = await guild.create_text_channel("霊界", category=category, overwrites=overwrites, reason="Create shared spirit channel")
-                except discord.Forbidden:
-                    channel = None
-            return channel
+            return await ensure_spirit_channel(guild, await ensure_spirit_role(guild))
 
         async def _send_hint(self, interaction: discord.Interaction, idx: int):
             if not interaction.guild:
                 return
-            guild = interaction.guild
+            guild = tables.of(interaction)
             # 1はヒントへ、2-4は霊界へ
             target_channel: discord.TextChannel | None = None
             if idx == 1:
@@ -896,26 +812,13 @@ def _build_hint_buttons_view(guild_id: int) -> discord.ui.View:
                 target_channel = await self._ensure_spirit_channel(guild)
             if target_channel is not None:
                 try:
-                    texts = {
-                        1: "①あなたたちは何も思い出せない\n どうやら、狼三匹と特殊な狂人いるようだ\n*特殊な狂人:この狂人がなんらかの(村側の)能力の対象となった場合、その能力者は翌朝死亡します。",
-                        2: "②この村には親子が一組いるようだ\n毎朝見える景色が変わっている気がする",
-                        3: "③あなたたちは魚だ。\nそしてこの村の狼は寿司狼である\n勝利条件\n村：寿司狼の全滅\n狼：寿司狼の人数が人間と同数以下になる",
-                        4: "④ここは回転寿司屋のようだ。\n役職が回っている、但し寿司狼、親子は回らない",
-                    }
-                    body = texts.get(idx, f"[仮] ヒント{idx}の本文")
-                    await target_channel.send(body)
+                    await target_channel.send(scenarios.for_guild(guild.id).hint(idx))
                 except Exception:
                     pass
             # エフェメラル応答
-            if not interaction.response.is_done():
-                try:
-                    await interaction.response.defer(ephemeral=True)
-                except Exception:
-                    pass
-            try:
-                await interaction.followup.send(f"✅ ヒント{idx}を送信しました", ephemeral=True)
-            except Exception:
-                pass
+            await ensure_deferred(interaction)
+            game_log.record(guild.id, "hint", idx=idx)
+            await respond(interaction, f"✅ ヒント{idx}を送信しました")
             try:
                 await _gm_log_interaction(interaction, f"ヒント{idx}を送信")
             except Exception:
@@ -951,25 +854,23 @@ def _build_hint_buttons_view(guild_id: int) -> discord.ui.View:
 
     return HintButtonsView()
 
-def _build_role_send_phase_view(guild_id: int) -> discord.ui.View:
-    roles = ["占い", "狩人"]
-    parts = Storage.get_participants(guild_id)
-    wolf_hos = {"HO1", "HO4", "HO10"}
-    ho_options = []
-    for p in parts:
-        if not p.get("ho"):
-            continue
-        ho = str(p.get("ho"))
-        name = str(p.get("name", ""))
-        wolf_tag = "（人狼）" if ho in wolf_hos else ""
-        label = f"{ho} {name}{wolf_tag}".strip()
-        ho_options.append(discord.SelectOption(label=label, value=ho))
-    if not ho_options:
-        ho_options = [discord.SelectOption(label="対象なし", value="none")]
-
-    class RoleSendPhaseView(discord.ui.View):
+
+def _role_message(guild_id: int, role: str, variant: str, ho: str | None) -> str:
+    """シナリオパックの役職連絡の文面（{disp} は対象 HO と参加者名）"""
+    ho = ho if ho and ho != "none" else ""
+    p = Storage.get_participant_by_ho(guild_id, ho) if ho else None
+    return scenarios.for_guild(guild_id).role_message(role, variant, ho, p.get("name") if p else None)
+
+
+def _build_role_send_phase_view(guild_id: int | None) -> discord.ui.View:
+    """役職送信フェーズの View。guild_id が None なら再起動後に登録する全卓共通の受け口"""
+    roles = ["占い", "狩人", "襲撃"]
+    ho_options = _ho_select_options(guild_id) if guild_id is not None else [discord.SelectOption(label="対象なし", value="none")]
+
+    class RoleSendPhaseView(GameView):
         def __init__(self):
             super().__init__(timeout=None)
+            self.guild_id = guild_id
             self.selected_dest_ho: str | None = None
             self.selected_role: str | None = None
             self.selected_target_ho: str | None = None
@@ -982,15 +883,30 @@ def _build_role_send_phase_view(guild_id: int) -> discord.ui.View:
             self.add_item(self.send_button)
             self.add_item(self.to_action_button)
 
+        @staticmethod
+        def for_interaction(interaction: discord.Interaction) -> 'RoleSendPhaseView':
+            """押された卓で作り直し、メッセージに残る選択を引き継ぐ（永続 View は全卓で共有されるため）"""
+            pv = _build_role_send_phase_view(tables.of(interaction).id)
+            selected = _selected_options(interaction.message)
+            if selected.get("rolemsg_role") in roles:
+                pv.select_role(selected["rolemsg_role"])
+            if selected.get("rolemsg_dest"):
+                pv.select_dest(selected["rolemsg_dest"])
+            return pv
+
+        def select_role(self, role: str) -> None:
+            self.selected_role = role
+            _preselect_option(self.role_select, role)
+
+        def select_dest(self, ho: str) -> None:
+            self.selected_dest_ho = ho
+            _preselect_option(self.dest_select, ho)
+
         def _compute_text(self) -> str | None:
             role = self.selected_role
             if not role:
                 return None
-            if role == "占い":
-                return "貴方は占い師です。\n今晩占いたい相手を一人指名してください。"
-            if role == "狩人":
-                return "貴方は狩人です。\n護衛したい人を一人指名してください。"
-            return None
+            return _role_message(self.guild_id, role, "A", self.selected_target_ho)
 
         def _summary_text(self) -> str:
             dest = self.selected_dest_ho or "未選択"
@@ -1001,13 +917,14 @@ def _build_role_send_phase_view(guild_id: int) -> discord.ui.View:
             if text:
                 preview = text
             dest_display = dest
-            if isinstance(dest, str) and dest in {"HO1", "HO4", "HO10"}:
+            if isinstance(dest, str) and dest in scenarios.for_guild(self.guild_id).wolf_hos:
                 dest_display = f"{dest}（人狼）"
             return (
                 "役職送信フェーズ: 役職/対象を選んで送信してください\n"
                 f"- 送信先HO: {dest_display}\n"
                 f"- 役職: {role}\n"
-                f"- 対象HO: {target}\n"
+                f"- 対象HO: {target}"
+                f"{_rotation_note(self.guild_id)}\n"
                 f"- プレビュー:\n{preview}"
             )
 
@@ -1018,9 +935,13 @@ def _build_role_send_phase_view(guild_id: int) -> discord.ui.View:
                                  custom_id="rolemsg_role")
 
             async def callback(self, interaction: discord.Interaction):
-                pv: 'RoleSendPhaseView' = self.view
-                pv.selected_role = self.values[0]
-                await interaction.response.edit_message(content=pv._summary_text(), view=pv)
+                pv = RoleSendPhaseView.for_interaction(interaction)
+                pv.select_role(self.values[0])
+                # 今日その役職を持つ HO を送信先に自動選択
+                holder = rotation.holder(pv.guild_id, pv.selected_role)
+                if holder:
+                    pv.select_dest(holder)
+                await edit_response(interaction, content=pv._summary_text(), view=pv)
 
         class DestinationSelect(discord.ui.Select):
             def __init__(self, parent: 'RoleSendPhaseView'):
@@ -1028,33 +949,32 @@ def _build_role_send_phase_view(guild_id: int) -> discord.ui.View:
                                  custom_id="rolemsg_dest")
 
             async def callback(self, interaction: discord.Interaction):
-                pv: 'RoleSendPhaseView' = self.view
-                pv.selected_dest_ho = self.values[0]
-                await interaction.response.edit_message(content=pv._summary_text(), view=pv)
+                pv = RoleSendPhaseView.for_interaction(interaction)
+                pv.select_dest(self.values[0])
+                await edit_response(interaction, content=pv._summary_text(), view=pv)
 
         class SendButton(discord.ui.Button):
             def __init__(self, parent: 'RoleSendPhaseView'):
                 super().__init__(label="送信", style=discord.ButtonStyle.success, custom_id="rolemsg_send")
 
             async def callback(self, interaction: discord.Interaction):
-                pv: 'RoleSendPhaseView' = self.view
+                pv = RoleSendPhaseView.for_interaction(interaction)
                 role = pv.selected_role
                 dest = pv.selected_dest_ho
                 if not role or not dest or dest == "none":
-                    if not interaction.response.is_done():
-                        await interaction.response.edit_message(content=pv._summary_text(), view=pv)
+                    await edit_response(interaction, content=pv._summary_text(), view=pv)
                     return
                 text = pv._compute_text()
                 if not text:
-                    if not interaction.response.is_done():
-                        await interaction.response.edit_message(content=pv._summary_text(), view=pv)
+                    await edit_response(interaction, content=pv._summary_text(), view=pv)
                     return
-                channel = discord.utils.get(interaction.guild.text_channels, name=str(dest).lower())
+                table = tables.of(interaction)
+                channel = channel_index.ho(table, str(dest))
                 if channel is None:
-                    if not interaction.response.is_done():
-                        await interaction.response.edit_message(content=pv._summary_text(), view=pv)
+                    await edit_response(interaction, content=pv._summary_text(), view=pv)
                     return
-                view = _build_action_view(interaction.guild, role, str(dest))
+                members = await get_members(table, [int(p.get("id", 0)) for p in Storage.get_participants(table.id)])
+                view = _build_action_view(table, role, str(dest), members)
                 try:
                     await channel.send(text, view=view)
                 except discord.Forbidden:
@@ -1066,26 +986,10 @@ def _build_role_send_phase_view(guild_id: int) -> discord.ui.View:
                         else:
                             raise
                     except discord.Forbidden:
-                        if not interaction.response.is_done():
-                            try:
-                                await interaction.response.defer(ephemeral=True)
-                            except Exception:
-                                pass
-                        try:
-                            await interaction.followup.send("❌ 送信先チャンネルにアクセスできません。Botの権限を確認してください。", ephemeral=True)
-                        except Exception:
-                            pass
+                        await respond(interaction, "❌ 送信先チャンネルにアクセスできません。Botの権限を確認してください。")
                         await _gm_log_interaction(interaction, f"[WARN] 役職連絡送信失敗（権限不足）: {role} → {dest}")
                         return
-                if not interaction.response.is_done():
-                    try:
-                        await interaction.response.defer(ephemeral=True)
-                    except Exception:
-                        pass
-                try:
-                    await interaction.followup.send("✅ 送信しました", ephemeral=True)
-                except Exception:
-                    pass
+                await respond(interaction, "✅ 送信しました")
                 await _gm_log_interaction(interaction, f"役職連絡送信: {role} → {dest}")
 
         class ToActionButton(discord.ui.Button):
@@ -1093,51 +997,35 @@ def _build_role_send_phase_view(guild_id: int) -> discord.ui.View:
                 super().__init__(label="役職行動", style=discord.ButtonStyle.primary, custom_id="rolemsg_to_action")
 
             async def callback(self, interaction: discord.Interaction):
-                v = _build_role_action_phase_view(guild_id)
+                table = tables.of(interaction)
+                v = _build_role_action_phase_view(table.id)
                 try:
                     await interaction.message.edit(content="役職行動フェーズ: 役職/対象を選んで送信してください\n- 送信ボタンと翌日に進むボタンが利用可能です", view=v)
+                    _remember_action_panel(table.id, interaction.message)
                 except Exception:
                     pass
-                if not interaction.response.is_done():
-                    try:
-                        await interaction.response.defer(ephemeral=True)
-                    except Exception:
-                        pass
-                try:
-                    await interaction.followup.send("🔁 役職行動フェーズに切り替えました", ephemeral=True)
-                except Exception:
-                    pass
+                await respond(interaction, "🔁 役職行動フェーズに切り替えました")
                 await _gm_log_interaction(interaction, "役職行動フェーズへ切替")
 
     return RoleSendPhaseView()
 
 
-def _build_role_action_phase_view(guild_id: int) -> discord.ui.View:
+def _build_role_action_phase_view(guild_id: int | None) -> discord.ui.View:
+    """役職行動フェーズの View。guild_id が None なら再起動後に登録する全卓共通の受け口"""
     roles = [
         "占い結果",
         "霊能",
         "狂人",
     ]
-    parts = Storage.get_participants(guild_id)
-    wolf_hos = {"HO1", "HO4", "HO10"}
-    ho_options = []
-    for p in parts:
-        if not p.get("ho"):
-            continue
-        ho = str(p.get("ho"))
-        name = str(p.get("name", ""))
-        wolf_tag = "（人狼）" if ho in wolf_hos else ""
-        label = f"{ho} {name}{wolf_tag}".strip()
-        ho_options.append(discord.SelectOption(label=label, value=ho))
-    if not ho_options:
-        ho_options = [discord.SelectOption(label="対象なし", value="none")]
-
-    class RoleActionPhaseView(discord.ui.View):
+    ho_options = _ho_select_options(guild_id) if guild_id is not None else [discord.SelectOption(label="対象なし", value="none")]
+
+    class RoleActionPhaseView(GameView):
         def __init__(self):
             super().__init__(timeout=None)
+            self.guild_id = guild_id
             self.selected_dest_ho: str | None = None
             self.selected_role: str | None = None
-            self.selected_target_ho: str | None = None
+            self.selected_template: str | None = None
             self.role_select = self.RoleSelect(self)
             self.dest_select = self.DestinationSelect(self)
             self.template_select = self.TemplateSelect(self)
@@ -1149,30 +1037,50 @@ def _build_role_action_phase_view(guild_id: int) -> discord.ui.View:
             self.add_item(self.send_button)
             self.add_item(self.nextday_button)
 
+        @staticmethod
+        def for_interaction(interaction: discord.Interaction) -> 'RoleActionPhaseView':
+            """押された卓で作り直し、メッセージに残る選択を引き継ぐ（永続 View は全卓で共有されるため）"""
+            pv = _build_role_action_phase_view(tables.of(interaction).id)
+            selected = _selected_options(interaction.message)
+            if selected.get("rolemsg_role") in roles:
+                pv.select_role(selected["rolemsg_role"])
+            if selected.get("rolemsg_dest"):
+                pv.select_dest(selected["rolemsg_dest"])
+            if selected.get("rolemsg_tmpl"):
+                pv.select_template(selected["rolemsg_tmpl"])
+            return pv
+
+        @property
+        def selected_target_ho(self) -> str | None:
+            # 占い結果の対象は送信先 HO の今夜の占い先
+            dest = self.selected_dest_ho
+            if self.selected_role != "占い結果" or not dest or dest == "none":
+                return None
+            return Storage.get_night_actions(self.guild_id).get("占い", {}).get(dest)
+
+        def select_role(self, role: str) -> None:
+            self.selected_role = role
+            self.selected_template = None
+            _preselect_option(self.role_select, role)
+            self._refresh_template_options()
+
+        def select_dest(self, ho: str) -> None:
+            self.selected_dest_ho = ho
+            _preselect_option(self.dest_select, ho)
+            self._refresh_template_options()
+
+        def select_template(self, choice: str) -> None:
+            self.selected_template = choice if choice in ("A", "B") and self.selected_role else None
+            _preselect_option(self.template_select, self.selected_template)
+
         def _compute_texts(self) -> tuple[str, str] | None:
             role = self.selected_role
-            ho = self.selected_target_ho
             if not role:
                 return None
-            name = None
-            if ho and ho != "none":
-                for p in Storage.get_participants(guild_id):
-                    if p.get("ho") == ho:
-                        name = p.get("name")
-                        break
-            disp = f"{ho}（{name}）" if (ho and name) else (ho or "")
-            if role == "占い結果":
-                return (f"指名した相手は狼です。", f"指名した相手は狼ではないようだ。")
-            if role == "霊能":
-                return (f"貴方は霊能者です。吊られた人は狼です。", f"貴方は霊能者です。吊られた人は狼ではないようだ。")
-            if role == "狂人":
-                return (
-                    f"あなたの思考は何者かに乗っ取られてしまいました。あなたは今日、なんだか無性に寿司狼の味方をしなければならない気がしている。\nあなたは狼陣営です。\n今夜あなたがなんらかの能力の対象となった場合、その能力者は翌朝死亡します。",
-                    f"あなたは正気を取り戻しました。\n以降あなたは村人陣営の味方であり、なんらかの能力の対象となっても、その能力者は死亡しません。",
-                )
-            return (f"{disp} へ連絡", f"{disp} へ連絡（別案）")
+            ho = self.selected_target_ho
+            return _role_message(self.guild_id, role, "A", ho), _role_message(self.guild_id, role, "B", ho)
 
-        async def _refresh_template_options(self, interaction: discord.Interaction):
+        def _refresh_template_options(self) -> None:
             texts = self._compute_texts()
             if not texts:
                 self.template_select.options = [
@@ -1190,33 +1098,34 @@ def _build_role_action_phase_view(guild_id: int) -> discord.ui.View:
                     discord.SelectOption(label=_shorten(a), value="A"),
                     discord.SelectOption(label=_shorten(b), value="B"),
                 ]
-            await interaction.response.edit_message(content=self._summary_text(), view=self)
+            _preselect_option(self.template_select, self.selected_template)
+
+        def _template_label(self) -> str | None:
+            for opt in self.template_select.options:
+                if opt.value == self.selected_template:
+                    return opt.label or self.selected_template
+            return self.selected_template
 
         def _summary_text(self) -> str:
             dest = self.selected_dest_ho or "未選択"
             role = self.selected_role or "未選択"
             target = self.selected_target_ho or "未選択"
-            choice_value = self.template_select.values[0] if self.template_select.values else None
-            choice = "未選択"
-            if choice_value:
-                for opt in self.template_select.options:
-                    if opt.value == choice_value:
-                        choice = opt.label or choice_value
-                        break
+            choice = self._template_label() or "未選択"
             preview = "(役職/対象未選択)"
             texts = self._compute_texts()
             if texts:
                 a, b = texts
                 preview = f"{a}\n---\n{b}"
             dest_display = dest
-            if isinstance(dest, str) and dest in {"HO1", "HO4", "HO10"}:
+            if isinstance(dest, str) and dest in scenarios.for_guild(self.guild_id).wolf_hos:
                 dest_display = f"{dest}（人狼）"
             return (
                 "役職行動フェーズ: 役職/対象/送る内容を選んで送信してください\n"
                 f"- 送信先HO: {dest_display}\n"
                 f"- 役職: {role}\n"
                 f"- 対象HO: {target}\n"
-                f"- 選択: {choice}\n"
+                f"- 選択: {choice}"
+                f"{_rotation_note(self.guild_id)}\n"
                 f"- プレビュー:\n{preview}"
             )
 
@@ -1227,9 +1136,13 @@ def _build_role_action_phase_view(guild_id: int) -> discord.ui.View:
                                  custom_id="rolemsg_role")
 
             async def callback(self, interaction: discord.Interaction):
-                pv: 'RoleActionPhaseView' = self.view
-                pv.selected_role = self.values[0]
-                await pv._refresh_template_options(interaction)
+                pv = RoleActionPhaseView.for_interaction(interaction)
+                pv.select_role(self.values[0])
+                # 今日その役職を持つ HO を送信先に自動選択（占い結果の対象はその HO の今夜の占い先）
+                holder = rotation.holder(pv.guild_id, _ACTION_ROLE_HOLDER.get(pv.selected_role, pv.selected_role))
+                if holder:
+                    pv.select_dest(holder)
+                await edit_response(interaction, content=pv._summary_text(), view=pv)
 
         class DestinationSelect(discord.ui.Select):
             def __init__(self, parent: 'RoleActionPhaseView'):
@@ -1237,9 +1150,9 @@ def _build_role_action_phase_view(guild_id: int) -> discord.ui.View:
                                  custom_id="rolemsg_dest")
 
             async def callback(self, interaction: discord.Interaction):
-                pv: 'RoleActionPhaseView' = self.view
-                pv.selected_dest_ho = self.values[0]
-                await interaction.response.edit_message(content=pv._summary_text(), view=pv)
+                pv = RoleActionPhaseView.for_interaction(interaction)
+                pv.select_dest(self.values[0])
+                await edit_response(interaction, content=pv._summary_text(), view=pv)
 
         class TemplateSelect(discord.ui.Select):
             def __init__(self, parent: 'RoleActionPhaseView'):
@@ -1248,48 +1161,40 @@ def _build_role_action_phase_view(guild_id: int) -> discord.ui.View:
                                  custom_id="rolemsg_tmpl")
 
             async def callback(self, interaction: discord.Interaction):
-                pv: 'RoleActionPhaseView' = self.view
-                await interaction.response.edit_message(content=pv._summary_text(), view=pv)
+                pv = RoleActionPhaseView.for_interaction(interaction)
+                pv.select_template(self.values[0])
+                await edit_response(interaction, content=pv._summary_text(), view=pv)
 
         class SendButton(discord.ui.Button):
             def __init__(self, parent: 'RoleActionPhaseView'):
                 super().__init__(label="送信", style=discord.ButtonStyle.success, custom_id="rolemsg_send")
 
             async def callback(self, interaction: discord.Interaction):
-                pv: 'RoleActionPhaseView' = self.view
+                pv = RoleActionPhaseView.for_interaction(interaction)
                 role = pv.selected_role
                 dest = pv.selected_dest_ho
-                if not role or not dest or dest == "none" or not pv.template_select.values:
-                    if not interaction.response.is_done():
-                        await interaction.response.edit_message(content=pv._summary_text(), view=pv)
+                choice_value = pv.selected_template
+                if not role or not dest or dest == "none" or not choice_value:
+                    await edit_response(interaction, content=pv._summary_text(), view=pv)
                     return
-                choice_value = pv.template_select.values[0]
                 texts = pv._compute_texts()
                 if not texts:
-                    if not interaction.response.is_done():
-                        await interaction.response.edit_message(content=pv._summary_text(), view=pv)
+                    await edit_response(interaction, content=pv._summary_text(), view=pv)
                     return
                 text = texts[0] if choice_value == "A" else texts[1]
-                channel = discord.utils.get(interaction.guild.text_channels, name=str(dest).lower())
+                channel = channel_index.ho(tables.of(interaction), str(dest))
                 if channel is None:
-                    if not interaction.response.is_done():
-                        await interaction.response.edit_message(content=pv._summary_text(), view=pv)
+                    await edit_response(interaction, content=pv._summary_text(), view=pv)
                     return
                 await channel.send(text)
-                if not interaction.response.is_done():
-                    try:
-                        await interaction.response.defer(ephemeral=True)
-                    except Exception:
-                        pass
-                try:
-                    await interaction.followup.send("✅ 送信しました", ephemeral=True)
-                except Exception:
-                    pass
-                choice_label = choice_value
-                for opt in pv.template_select.options:
-                    if opt.value == choice_value:
-                        choice_label = opt.label or choice_value
-                        break
+                await respond(interaction, "✅ 送信しました")
+                choice_label = pv._template_label()
+                # 狂人連絡 A で狂人に、B で正気に戻す（夜の判定に使う）
+                if role == "狂人":
+                    if choice_value == "A":
+                        Storage.set_madman(pv.guild_id, dest)
+                    elif Storage.get_madman(pv.guild_id) == dest:
+                        Storage.set_madman(pv.guild_id, None)
                 await _gm_log_interaction(interaction, f"役職連絡送信: {role} → {dest} （選択: {choice_label}）")
 
         class NextDayButton(discord.ui.Button):
@@ -1297,17 +1202,19 @@ def _build_role_action_phase_view(guild_id: int) -> discord.ui.View:
                 super().__init__(label="翌日に進む", style=discord.ButtonStyle.primary, custom_id="rolemsg_next")
 
             async def callback(self, interaction: discord.Interaction):
-                await _do_next_day(interaction)
-                await _upsert_dashboard_panel(interaction.guild)
-                if not interaction.response.is_done():
-                    try:
-                        await interaction.response.defer(ephemeral=True)
-                    except Exception:
-                        pass
-                try:
-                    await interaction.followup.send("⏭️ 翌日に進みました", ephemeral=True)
-                except Exception:
-                    pass
+                table = tables.of(interaction)
+                async with guild_locks.try_hold(table.id) as acquired:
+                    if not acquired:
+                        await reply_busy(interaction)
+                        return
+                    day = Storage.get_game(table.id)["day"]
+                    # 再起動前の掲示は掲示日が分からないので、最初のクリックの日を掲示日とみなす
+                    posted = _action_panel_days.setdefault((table.id, int(interaction.message.id)), day) if interaction.message else day
+                    if posted != day:
+                        await reply_busy(interaction, "⚠️ 既に翌日に進んでいます")
+                        return
+                    await _do_next_day(table, interaction.user)
+                await respond(interaction, "⏭️ 翌日に進みました")
                 await _gm_log_interaction(interaction, "翌日に進む（役職行動フェーズ）")
 
     return RoleActionPhaseView()
@@ -1338,7 +1245,7 @@ async def _disable_old_role_message_ui(guild: discord.Guild, keep_id: int) -> No
                     pass
 
 
-def _build_action_view(guild: discord.Guild, role: str, voter_ho: str) -> discord.ui.View:
+def _build_action_view(guild: discord.Guild, role: str, voter_ho: str, members: Mapping[int, discord.Member]) -> discord.ui.View:
     guild_id = guild.id
     parts = Storage.get_participants(guild_id)
     options = []
@@ -1347,8 +1254,8 @@ def _build_action_view(guild: discord.Guild, role: str, voter_ho: str) -> discor
         if not ho or ho == voter_ho:
             continue
         # 霊界は対象外
-        member = guild.get_member(int(p.get("id", 0)))
-        if member and is_member_spirit(member):
+        member = members.get(int(p.get("id", 0)))
+        if member and is_member_spirit(guild, member):
             continue
         label = f"{ho} {p.get('name','')}"
         options.append(discord.SelectOption(label=label, value=str(ho)))
@@ -1367,10 +1274,10 @@ def _build_action_view(guild: discord.Guild, role: str, voter_ho: str) -> discor
             except Exception:
                 existing = None
             if existing:
-                await interaction.response.send_message("この役職の選択は既に確定しています", ephemeral=True)
+                await respond(interaction, "この役職の選択は既に確定しています")
                 return
             self._selected = self.values[0]
-            await interaction.response.send_message("✅ 選択を一時保存しました。送信で確定します。", ephemeral=True)
+            await respond(interaction, "✅ 選択を一時保存しました。送信で確定します。")
 
     class _Submit(discord.ui.Button):
         def __init__(self, select: _Select):
@@ -1378,13 +1285,14 @@ def _build_action_view(guild: discord.Guild, role: str, voter_ho: str) -> discor
             self._select = select
 
         async def callback(self, interaction: discord.Interaction):
-            # 二重送信防止（既に記録があればブロック）
-            try:
-                existing = Storage.get_night_actions(guild_id).get(role, {}).get(voter_ho)
-            except Exception:
-                existing = None
-            if existing:
-                await interaction.response.send_message("この役職の選択は既に確定しています", ephemeral=True)
+            target = self._select._selected
+            if not target or target == "none":
+                await respond(interaction, "対象を選択してください")
+                return
+            # 二重送信防止: 未確定のときだけ記録（確認と記録を同時に行う）
+            # GM集計は NightActionRecorded を受けて集計サービスが更新する
+            if not Storage.set_night_action_if_absent(guild_id, role, voter_ho, target):
+                await respond(interaction, "この役職の選択は既に確定しています")
                 # 可能ならビューを無効化
                 try:
                     v = self.view
@@ -1395,32 +1303,6 @@ def _build_action_view(guild: discord.Guild, role: str, voter_ho: str) -> discor
                 except Exception:
                     pass
                 return
-            target = self._select._selected
-            if not target or target == "none":
-                await interaction.response.send_message("対象を選択してください", ephemeral=True)
-                return
-            Storage.set_night_action(guild_id, role, voter_ho, target)
-            # Update GM tally (reuse existing channel/message if any)
-            from utils.helpers import ensure_gm_environment as _egm
-            gm_role, gm_dash, _ = await _egm(interaction.guild)
-            gm_category = gm_dash.category
-            vote_channel = None
-            if gm_category:
-                vote_channel = discord.utils.get(gm_category.text_channels, name="vote_night")
-            if vote_channel is None:
-                vote_channel = await interaction.guild.create_text_channel("vote_night", category=gm_category)
-            text = _build_tally_text(guild_id)
-            try:
-                msg_id = Storage.get_gm_vote_message(interaction.guild.id)
-                if msg_id:
-                    msg = await vote_channel.fetch_message(msg_id)
-                    await msg.edit(content=text)
-                else:
-                    msg = await vote_channel.send(text)
-                    Storage.set_gm_vote_message(interaction.guild.id, msg.id)
-            except discord.NotFound:
-                msg = await vote_channel.send(text)
-                Storage.set_gm_vote_message(interaction.guild.id, msg.id)
             # 送信後、このビューは無効化して再選択を防止
             try:
                 v = self.view
@@ -1430,122 +1312,14 @@ def _build_action_view(guild: discord.Guild, role: str, voter_ho: str) -> discor
                     await interaction.message.edit(view=v)
             except Exception:
                 pass
-            await interaction.response.send_message("📨 送信しました", ephemeral=True)
+            await respond(interaction, "📨 送信しました")
 
-    view = discord.ui.View(timeout=None)
+    view = GameView(timeout=None)
     select = _Select()
     view.add_item(select)
     view.add_item(_Submit(select))
     return view
 
-    class TargetSelect(discord.ui.Select):
-        def __init__(self):
-            super().__init__(placeholder="対象HOを選択", min_values=1, max_values=1, options=ho_options)
-            self._value = None
-
-        async def callback(self, interaction: discord.Interaction):
-            self._value = self.values[0]
-            await interaction.response.send_message("対象を選択しました", ephemeral=True)
-
-    class TemplateSelect(discord.ui.Select):
-        def __init__(self):
-            opts = [
-                discord.SelectOption(label="テンプレA", value="A"),
-                discord.SelectOption(label="テンプレB", value="B"),
-            ]
-            super().__init__(placeholder="テンプレを選択", min_values=1, max_values=1, options=opts)
-            self._value = None
-
-        async def callback(self, interaction: discord.Interaction):
-            self._value = self.values[0]
-            await interaction.response.send_message("テンプレを選択しました", ephemeral=True)
-
-    def render_message(role: str, ho: str) -> str:
-        # HO→名前辞書
-        name = None
-        for p in Storage.get_participants(guild_id):
-            if p.get("ho") == ho:
-                name = p.get("name")
-                break
-        disp = f"{ho}（{name}）" if name else ho
-        # 役職ごとの2択テンプレ（仮）
-        templates = {
-            "占い": {
-                "A": f"投票した人（{disp}）は「村人」です。",
-                "B": f"投票した人（{disp}）は「狼」です。",
-            },
-            "霊能": {
-                "A": f"{disp} の霊能結果は『白』でした。",
-                "B": f"{disp} の霊能結果は『黒』でした。",
-            },
-            "狩人": {
-                "A": f"今夜は {disp} を護衛します。",
-                "B": f"今夜は {disp} を護衛しません。",
-            },
-            "狂人": {
-                "A": f"{disp} へ作戦連絡: 村に溶け込め。",
-                "B": f"{disp} へ作戦連絡: 狼を支援せよ。",
-            },
-            "人狼": {
-                "A": f"{disp} へ連絡: 今夜は潜伏。",
-                "B": f"{disp} へ連絡: 今夜は積極的に動け。",
-            },
-        }
-        # デフォルト
-        return templates.get(role, {}).get("A", f"{disp} へ連絡")
-
-    class Submit(discord.ui.Button):
-        def __init__(self, role_select: RoleSelect, target_select: TargetSelect, tmpl_select: TemplateSelect):
-            super().__init__(label="送信", style=discord.ButtonStyle.success)
-            self._r = role_select
-            self._t = target_select
-            self._x = tmpl_select
-
-        async def callback(self, interaction: discord.Interaction):
-            role = getattr(self._r, "_value", None)
-            ho = getattr(self._t, "_value", None)
-            tmpl = getattr(self._x, "_value", None)
-            if not role or not ho or ho == "none" or not tmpl:
-                await interaction.response.send_message("役職/対象/テンプレを選択してください", ephemeral=True)
-                return
-            # メッセージ作成
-            textA = render_message(role, ho)
-            textB = textA  # 簡易: 上でA/B両方を用意済み
-            # 本当にA/B分ける
-            name = None
-            for p in Storage.get_participants(guild_id):
-                if p.get("ho") == ho:
-                    name = p.get("name")
-                    break
-            disp = f"{ho}（{name}）" if name else ho
-            if role == "占い":
-                textA = f"天啓：「村人」です。"
-                textB = f"天啓：「人狼」です。"
-            elif role == "霊能":
-                textA = f"天啓：「村人」です。"
-                textB = f"天啓：「人狼」です。"
-            elif role == "狂人":
-                textA = f"天啓：あなたは今日、なんだか無性に寿司狼の味方をしなければならない気がしている。\nあなたは狼陣営です。"
-                textB = f"天啓：あなたは正気を取り戻しました。\n以降あなたは村人陣営の味方です。"
-            final = textA if tmpl == "A" else textB
-            # 送信先は対象HOの個別チャンネル
-            channel = discord.utils.get(interaction.guild.text_channels, name=ho.lower())
-            if channel is None:
-                await interaction.response.send_message("対象チャンネルが見つかりません", ephemeral=True)
-                return
-            await channel.send(final)
-            await interaction.response.send_message("📩 送信しました", ephemeral=True)
-
-    view = discord.ui.View(timeout=None)
-    rs = RoleSelect()
-    ts = TargetSelect()
-    xs = TemplateSelect()
-    view.add_item(rs)
-    view.add_item(ts)
-    view.add_item(xs)
-    view.add_item(Submit(rs, ts, xs))
-    return view
-
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(EntryManagerCog(bot))
@@ -1,11 +1,80 @@
 # cogs/game.py
+import asyncio
+import re
 import discord
 from discord import app_commands
 from discord.ext import commands
 
 from storage import Storage
-from config import GM_ROLE_NAME, GM_CATEGORY_NAME, PRIVATE_CATEGORY_NAME, PLAYER_ROLE_NAME
-from utils.helpers import ensure_gm_environment, ensure_player_role, has_gm_or_manage_guild
+from utils.broadcast import channel_index
+from utils.channels import ChannelPlan, private_overwrites
+from utils.guild_config import RESOURCES, guild_config
+from utils.helpers import GameView, ensure_gm_environment, ensure_player_role, ensure_spirit_channel, ensure_spirit_role, has_gm_or_manage_guild
+from utils.scenario import scenarios
+from utils import rotation
+from utils.game_log import game_log
+from utils.interactions import ensure_deferred, respond
+from utils.tables import Table, tables
+from utils.timers import timer_wheel
+
+# ゲームログのキー（<ギルドID>[:<卓番号>]-<開始時刻>）。バックエンドのパスにもなるのでこれ以外は受け付けない
+_LOG_KEY = re.compile(r"\d+(:\d+)?-\d+")
+
+
+async def _cleanup_game_resources(guild: Table, *, close: bool = False) -> None:
+    """卓のゲーム用ロール/チャンネルを削除する（/reset_game と卓の終了。close=True ならカテゴリも消す）"""
+    # 1) 役職ロールの削除（GM除く、@everyone除く、Managed除く）
+    gm_role = guild_config.role(guild, "gm_role")
+    game_roles = {r for r in (guild_config.role(guild, "player_role"), guild_config.role(guild, "spirit_role")) if r is not None}
+    for role in list(guild.roles):
+        name = str(role.name)
+        if role == gm_role or role.is_default():
+            continue
+        # この卓の HO ロール or playerロールなどゲーム用ロールを対象にする
+        if guild_config.ho_of_role(guild.id, name) or role in game_roles:
+            if role.managed:
+                continue
+            try:
+                await role.delete(reason="reset_game: cleanup game roles")
+            except discord.Forbidden:
+                pass
+            except Exception:
+                pass
+
+    # 2) GM専用カテゴリ内のチャンネルを削除（リセットではカテゴリ自体は残す）
+    gm_category = guild_config.category(guild, "gm_category")
+    if gm_category is not None:
+        for ch in list(gm_category.text_channels):
+            try:
+                await ch.delete(reason="reset_game: cleanup GM専用 channels")
+            except discord.Forbidden:
+                pass
+            except Exception:
+                pass
+        if close:
+            try:
+                await gm_category.delete(reason="close table: cleanup GM専用 category")
+            except Exception:
+                pass
+
+    # 3) 個別チャンネルカテゴリを削除（配下のチャンネルも削除）。卓の終了では進行カテゴリも
+    for key in ("private_category", "progress_category") if close else ("private_category",):
+        category = guild_config.category(guild, key)
+        if category is None:
+            continue
+        for ch in list(category.text_channels):
+            try:
+                await ch.delete(reason="reset_game: cleanup 個別チャンネル")
+            except discord.Forbidden:
+                pass
+            except Exception:
+                pass
+        try:
+            await category.delete(reason="reset_game: cleanup 個別チャンネル category")
+        except discord.Forbidden:
+            pass
+        except Exception:
+            pass
 
 
 class GameCog(commands.Cog):
@@ -16,72 +85,23 @@ class GameCog(commands.Cog):
     @app_commands.default_permissions(manage_guild=True)
     async def reset_game(self, interaction: discord.Interaction):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
         if not has_gm_or_manage_guild(interaction):
-            await interaction.response.send_message("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
-        guild = interaction.guild
+        guild = tables.of(interaction)
         await Storage.ensure_loaded()
         # 先に静かにdefer（UIに通知を出さない）
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
+        await ensure_deferred(interaction)
 
-        # 1) 役職ロールの削除（GM除く、@everyone除く、Managed除く）
-        for role in list(guild.roles):
-            name = str(role.name)
-            if name == GM_ROLE_NAME or name == "@everyone":
-                continue
-            # HO系 or playerロールなどゲーム用ロールを対象にする
-            if name.startswith("HO") or name == PLAYER_ROLE_NAME or name == "霊界":
-                if role.managed:
-                    continue
-                try:
-                    await role.delete(reason="reset_game: cleanup game roles")
-                except discord.Forbidden:
-                    pass
-                except Exception:
-                    pass
-
-        # 2) GM専用カテゴリ内のチャンネルを削除（カテゴリ自体は残す）
-        gm_category = discord.utils.get(guild.categories, name=GM_CATEGORY_NAME)
-        if gm_category is not None:
-            for ch in list(gm_category.text_channels):
-                try:
-                    await ch.delete(reason="reset_game: cleanup GM専用 channels")
-                except discord.Forbidden:
-                    pass
-                except Exception:
-                    pass
-
-        # 3) 個別チャンネルカテゴリを削除（配下のチャンネルも削除）
-        private_category = discord.utils.get(guild.categories, name=PRIVATE_CATEGORY_NAME)
-        if private_category is not None:
-            for ch in list(private_category.text_channels):
-                try:
-                    await ch.delete(reason="reset_game: cleanup 個別チャンネル")
-                except discord.Forbidden:
-                    pass
-                except Exception:
-                    pass
-            try:
-                await private_category.delete(reason="reset_game: cleanup 個別チャンネル category")
-            except discord.Forbidden:
-                pass
-            except Exception:
-                pass
+        await _cleanup_game_resources(guild)
 
         # 4) ストレージを初期化
         Storage.reset_guild(guild.id)
 
         # 最後に必ずエフェメラルで完了通知
-        try:
-            await interaction.followup.send("ゲーム状態を初期化しました", ephemeral=True)
-        except Exception:
-            pass
+        await respond(interaction, "ゲーム状態を初期化しました")
 
     @app_commands.command(name="sync_commands", description="スラッシュコマンドを手動同期（既定: このギルドのみ/高速）")
     @app_commands.default_permissions(manage_guild=True)
@@ -89,29 +109,22 @@ class GameCog(commands.Cog):
     async def sync_commands(self, interaction: discord.Interaction, global_sync: bool = False):
         # ギルド外では権限確認が難しいためギルド必須
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
-        guild = interaction.guild
+        guild = interaction.guild   # コマンド同期はサーバー単位（卓に関係ない）
         # 事前権限チェック
         if not has_gm_or_manage_guild(interaction):
-            await interaction.response.send_message("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
         # 先に静かにdefer
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
+        await ensure_deferred(interaction)
         # 権限チェック: GMロール or Manage Guild
-        gm_role = discord.utils.get(guild.roles, name=GM_ROLE_NAME)
+        gm_role = guild_config.role(guild, "gm_role")
         perms_ok = interaction.user.guild_permissions.manage_guild
         if gm_role and gm_role in getattr(interaction.user, 'roles', []):
             perms_ok = True
         if not perms_ok:
-            try:
-                await interaction.followup.send("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
-            except Exception:
-                pass
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
         # 同期実行
         try:
@@ -122,30 +135,187 @@ class GameCog(commands.Cog):
                 guild_obj = discord.Object(id=int(guild.id))
                 synced = await self.bot.tree.sync(guild=guild_obj)
                 msg = f"🧪 ギルド同期完了: {len(synced)} 件（このサーバーに即時反映）"
-            await interaction.followup.send(msg, ephemeral=True)
+            await respond(interaction, msg)
         except Exception as e:
+            await respond(interaction, f"❌ 同期に失敗しました: {e}")
+
+    @app_commands.command(name="scenario", description="このサーバーのゲームで使うシナリオを選択（未指定なら一覧を表示）")
+    @app_commands.describe(scenario_id="シナリオID（scenarios/*.json の id）")
+    async def scenario(self, interaction: discord.Interaction, scenario_id: str | None = None):
+        if not interaction.guild:
+            await respond(interaction, "サーバー内で実行してください")
+            return
+        if not has_gm_or_manage_guild(interaction):
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
+            return
+        guild = tables.of(interaction)
+        if scenario_id is None:
+            current = scenarios.for_guild(guild.id)
+            lines = [f"{'▶' if sid == current.id else '・'} {sid}（{scenarios.get(sid).title}）" for sid in scenarios.ids()]
+            await respond(interaction, "📚 シナリオ一覧\n" + ("\n".join(lines) or "(なし)"))
+            return
+        try:
+            sc = scenarios.select(guild.id, scenario_id)
+        except KeyError:
+            await respond(interaction, f"シナリオ '{scenario_id}' が見つかりません")
+            return
+        await respond(interaction, f"📚 シナリオを「{sc.title}」({sc.id}) に設定しました")
+        try:
+            _, _, log = await ensure_gm_environment(guild)
+            await log.send(f"[GM Action] {interaction.user.mention} シナリオ設定: {sc.id}")
+        except Exception:
+            pass
+
+    @scenario.autocomplete("scenario_id")
+    async def _scenario_autocomplete(self, interaction: discord.Interaction, current: str):
+        return [
+            app_commands.Choice(name=f"{sid} {scenarios.get(sid).title}"[:100], value=sid)
+            for sid in scenarios.ids() if current.lower() in sid.lower()
+        ][:25]
+
+    @app_commands.command(name="config_names", description="このサーバーで使うロール/カテゴリ/チャンネル名を設定（未指定なら一覧を表示）")
+    @app_commands.describe(key="設定する項目", name="新しい名前（未指定なら既定に戻す）")
+    @app_commands.choices(key=[app_commands.Choice(name=label, value=k) for k, (_, _, label) in RESOURCES.items()])
+    @app_commands.default_permissions(manage_guild=True)
+    async def config_names(self, interaction: discord.Interaction, key: app_commands.Choice[str] | None = None, name: str | None = None):
+        if not interaction.guild:
+            await respond(interaction, "サーバー内で実行してください")
+            return
+        if not has_gm_or_manage_guild(interaction):
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
+            return
+        guild = tables.of(interaction)
+        if key is None:
+            names = guild_config.names(guild.id)
+            lines = [f"・{label}: {names[k]}" + ("" if guild_config.resolve(guild, k) else "（未作成）") for k, (_, _, label) in RESOURCES.items()]
+            await respond(interaction, "⚙️ 名前の設定\n" + "\n".join(lines))
+            return
+        name = (name or "").strip() or None
+        guild_config.rename(guild.id, key.value, name)
+        new_name = guild_config.name(guild.id, key.value)
+        # 既存のロール/チャンネルは改名しない（次回の作成/検索から新しい名前を使う）
+        await respond(interaction, f"⚙️ {key.name} を「{new_name}」に設定しました（既存のものは改名されません）")
+        try:
+            _, _, log = await ensure_gm_environment(guild)
+            await log.send(f"[GM Action] {interaction.user.mention} 名前設定: {key.value}={new_name}")
+        except Exception:
+            pass
+
+    @app_commands.command(name="table", description="卓（このサーバーで並行して進めるゲーム）の一覧/追加/終了")
+    @app_commands.describe(action="操作", number="終了する卓の番号（2 以上）")
+    @app_commands.choices(action=[
+        app_commands.Choice(name="一覧", value="list"),
+        app_commands.Choice(name="新しい卓", value="new"),
+        app_commands.Choice(name="終了", value="close"),
+    ])
+    @app_commands.default_permissions(manage_guild=True)
+    async def table(self, interaction: discord.Interaction, action: app_commands.Choice[str], number: app_commands.Range[int, 2] | None = None):
+        if not interaction.guild:
+            await respond(interaction, "サーバー内で実行してください")
+            return
+        if not has_gm_or_manage_guild(interaction):
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
+            return
+        current = tables.of(interaction)
+        if action.value == "list":
+            lines = []
+            for t in tables.all(interaction.guild):
+                game = Storage.get_game(t.id)
+                dash = guild_config.channel(t, "dashboard")
+                lines.append(
+                    f"{'▶' if t == current else '・'} {t.label}: 参加者 {len(Storage.get_participants(t.id))} 名 / "
+                    f"{game['day']}日目 {game['phase']} / {dash.mention if dash else '（ダッシュボード未作成）'}"
+                )
+            await respond(interaction, "🎲 卓の一覧（▶ はこのチャンネルの卓）\n" + "\n".join(lines))
+            return
+        await ensure_deferred(interaction)
+        if action.value == "new":
+            t = tables.create(interaction.guild)
+            _, dash, log = await ensure_gm_environment(t)
+            await respond(interaction, f"🎲 {t.label} を作成しました。{dash.mention} で /entry を実行して参加者を募集してください")
+            await log.send(f"[GM Action] {interaction.user.mention} {t.label} を作成")
+            return
+        t = tables.get(interaction.guild, number) if number else None
+        if t is None:
+            await respond(interaction, "終了する卓の番号（2 以上、/table 一覧 で確認）を指定してください（卓 1 は /reset_game）")
+            return
+        for tid in Storage.get_timers(t.id):
+            timer_wheel.disarm(t.id, tid)
+        await _cleanup_game_resources(t, close=True)
+        tables.close(t)
+        await respond(interaction, f"🧹 {t.label} を終了し、ロール/チャンネルとデータを削除しました")
+        try:
+            _, _, log = await ensure_gm_environment(current if current != t else tables.get(interaction.guild, 1))
+            await log.send(f"[GM Action] {interaction.user.mention} {t.label} を終了")
+        except Exception:
+            pass
+
+    @app_commands.command(name="reload_scenarios", description="scenarios/ の JSON を再読込（デプロイ不要）")
+    @app_commands.default_permissions(manage_guild=True)
+    async def reload_scenarios(self, interaction: discord.Interaction):
+        if not has_gm_or_manage_guild(interaction):
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
+            return
+        changed, errors = scenarios.reload()
+        msg = f"🔄 再読込: {', '.join(changed) if changed else '(変更なし)'}"
+        if errors:
+            msg += "\n❌ 読込失敗: " + ", ".join(f"{name}: {err}" for name, err in errors.items())
+        await respond(interaction, msg)
+
+    @app_commands.command(name="rotation", description="役職の回転を表示/設定（例: HO2=占い HO3=狩人 HO6=狂人 を今日の配置にする）")
+    @app_commands.describe(assignments="今日の配置 HO=役職 を空白区切りで（未指定なら今日/明日の配置を表示）")
+    @app_commands.default_permissions(manage_guild=True)
+    async def rotation_command(self, interaction: discord.Interaction, assignments: str | None = None):
+        if not interaction.guild:
+            await respond(interaction, "サーバー内で実行してください")
+            return
+        if not has_gm_or_manage_guild(interaction):
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
+            return
+        guild = tables.of(interaction)
+        if assignments:
+            fixed = scenarios.for_guild(guild.id).fixed_hos
+            base = {}
+            for token in assignments.replace(",", " ").split():
+                ho, sep, role = token.partition("=")
+                ho = ho.strip().upper()
+                if not sep or not ho or not role.strip():
+                    await respond(interaction, f"'{token}' は HO=役職 の形式で指定してください")
+                    return
+                if ho in fixed:
+                    await respond(interaction, f"{ho} は回転しない役職です")
+                    return
+                base[ho] = role.strip()
+            rotation.set_base(guild.id, base)
             try:
-                await interaction.followup.send(f"❌ 同期に失敗しました: {e}", ephemeral=True)
+                _, _, log = await ensure_gm_environment(guild)
+                await log.send(f"[GM Action] {interaction.user.mention} 回転の配置を設定: {' '.join(f'{h}={r}' for h, r in base.items())}")
             except Exception:
                 pass
+        day = int(Storage.get_game(guild.id)["day"])
+        today = rotation.assignment(guild.id, day)
+        if today is None:
+            await respond(interaction, "回転の配置が未設定です（例: /rotation assignments:HO2=占い HO3=狩人）")
+            return
+        tomorrow = rotation.assignment(guild.id, day + 1)
+        lines = [f"🔄 役職の回転（{'逆回転' if Storage.is_spirit_reverse_used(guild.id) else '通常'}）"]
+        for label, a in ((f"{day}日目", today), (f"{day + 1}日目", tomorrow)):
+            lines.append(f"{label}: " + (" ".join(f"{h}={r}" for h, r in a.as_dict().items()) or "(役職なし)"))
+        await respond(interaction, "\n".join(lines))
 
     @app_commands.command(name="add_spirit", description="死亡者を霊界に移動（役職\"霊界\"付与＆霊界チャンネル作成/入室）")
     @app_commands.default_permissions(manage_guild=True)
     async def add_spirit(self, interaction: discord.Interaction, member: discord.Member):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
         if not has_gm_or_manage_guild(interaction):
-            await interaction.response.send_message("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
-        guild = interaction.guild
+        guild = tables.of(interaction)
         await Storage.ensure_loaded()
         # 静かにdefer（UIに通知は出さない）
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
+        await ensure_deferred(interaction)
         # playerロール保持者のみ対象
         player_role = await ensure_player_role(guild)
         if player_role and player_role not in member.roles:
@@ -157,12 +327,7 @@ class GameCog(commands.Cog):
                 pass
             return
         # 霊界ロールの用意
-        spirit_role = discord.utils.get(guild.roles, name="霊界")
-        if spirit_role is None:
-            try:
-                spirit_role = await guild.create_role(name="霊界", reason="Spirit role for afterlife chat")
-            except discord.Forbidden:
-                spirit_role = None
+        spirit_role = await ensure_spirit_role(guild)
         # 付与
         if spirit_role is not None:
             try:
@@ -171,25 +336,10 @@ class GameCog(commands.Cog):
             except discord.Forbidden:
                 pass
         # 霊界チャンネルの用意（個別チャンネルカテゴリ配下）
-        gm_role = discord.utils.get(guild.roles, name=GM_ROLE_NAME)
-        category = discord.utils.get(guild.categories, name=PRIVATE_CATEGORY_NAME)
-        if category is None:
-            try:
-                category = await guild.create_category(PRIVATE_CATEGORY_NAME, reason="Create private HO category")
-            except discord.Forbidden:
-                category = None
-        channel = discord.utils.get(guild.text_channels, name="霊界")
-        if channel is None and category is not None and spirit_role is not None:
-            overwrites = {
-                guild.default_role: discord.PermissionOverwrite(view_channel=False),
-                gm_role or guild.default_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True),
-                spirit_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True),
-            }
-            try:
-                channel = await guild.create_text_channel("霊界", category=category, overwrites=overwrites, reason="Create shared spirit channel")
-            except discord.Forbidden:
-                channel = None
+        await ensure_spirit_channel(guild, spirit_role)
         # ログ
+        dead = Storage.get_participant(guild.id, member.id)
+        game_log.record(guild.id, "death", uid=int(member.id), ho=dead.get("ho") if dead else None)
         try:
             _, _, log = await ensure_gm_environment(guild)
             await log.send(f"[GM Action] {interaction.user.mention} 霊界付与: {member.display_name} ({member.id})")
@@ -198,39 +348,12 @@ class GameCog(commands.Cog):
 
         # 個別チャンネル（HOチャンネル）へ文面を送信
         try:
-            parts = Storage.get_participants(guild.id)
-            ho = ""
-            for p in parts:
-                try:
-                    if int(p.get("id", 0)) == int(member.id):
-                        ho = str(p.get("ho") or "").upper()
-                        break
-                except Exception:
-                    continue
-            label_map = {
-                "HO1": "味噌汁",
-                "HO2": "マグロ",
-                "HO3": "えび",
-                "HO4": "茶碗蒸し",
-                "HO5": "サーモン",
-                "HO6": "つぶ貝",
-                "HO7": "鯛",
-                "HO8": "イクラ",
-                "HO9": "ぶり",
-                "HO10": "うどん",
-                "HO11": "ハマチ",
-                "HO12": "イカ",
-                "HO13": "タコ",
-                "HO14": "コハダ",
-            }
-            label = label_map.get(ho, "")
+            p = Storage.get_participant(guild.id, member.id)
+            ho = str(p.get("ho") or "").upper() if p else ""
             if ho:
-                ch = discord.utils.get(guild.text_channels, name=ho.lower())
+                ch = channel_index.ho(guild, ho)
                 if ch is not None:
-                    body = (
-                        "【あなたは死にました】\n"
-                        "あなたは死にましたが、処刑時の投票以外のすべての能力が使えます。昼の会議にも参加可能です。 \n霊界チャンネルが解放されました。 また、あなたは生前【" + label + "】であったことを思い出しました。"
-                    )
+                    body = scenarios.for_guild(guild.id).spirit_text(ho, p.get("name") if p else None)
                     try:
                         await ch.send(body)
                     except Exception:
@@ -254,26 +377,24 @@ class GameCog(commands.Cog):
         except Exception:
             pass
         # 最終確認（エフェメラル）
-        try:
-            await interaction.followup.send("✅ 対象を霊界に移動し、必要な通知を送信しました", ephemeral=True)
-        except Exception:
-            pass
+        await respond(interaction, "✅ 対象を霊界に移動し、必要な通知を送信しました")
 
     @app_commands.command(name="spirit_reverse_button", description="霊界に逆回転ボタンを表示（1回限り）")
     @app_commands.default_permissions(manage_guild=True)
     async def spirit_reverse_button(self, interaction: discord.Interaction):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
         if not has_gm_or_manage_guild(interaction):
-            await interaction.response.send_message("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
         await Storage.ensure_loaded()
-        gid = interaction.guild.id
+        guild = tables.of(interaction)
+        gid = guild.id
         channel = interaction.channel
-        # 霊界チャンネル限定
-        if not isinstance(channel, discord.TextChannel) or channel.name != "霊界":
-            await interaction.response.send_message("霊界チャンネルで実行してください", ephemeral=True)
+        # 霊界チャンネル限定（この卓の霊界）
+        if not isinstance(channel, discord.TextChannel) or not guild_config.is_channel(guild, channel, "spirit"):
+            await respond(interaction, "霊界チャンネルで実行してください")
             return
         used = Storage.is_spirit_reverse_used(gid)
 
@@ -286,24 +407,19 @@ class GameCog(commands.Cog):
                     self.disabled = True
 
             async def callback(self, interaction: discord.Interaction):
-                # 二重実行の防止と応答の安定化
-                if Storage.is_spirit_reverse_used(self._gid):
-                    if not interaction.response.is_done():
-                        await interaction.response.send_message("このボタンは既に使用されています", ephemeral=True)
-                    else:
-                        try:
-                            await interaction.followup.send("このボタンは既に使用されています", ephemeral=True)
-                        except Exception:
-                            pass
-                    return
-                if not interaction.response.is_done():
+                # 二重実行の防止: 確認と使用済み記録を await なしで一度に行う
+                if not Storage.claim_spirit_reverse(self._gid):
                     try:
-                        await interaction.response.defer(ephemeral=True, thinking=False)
+                        await respond(interaction, "このボタンは既に使用されています")
                     except Exception:
                         pass
-                Storage.set_spirit_reverse_used(self._gid, True)
+                    return
+                # 翌日から役職の回転が逆向きになる
+                rotation.reverse(self._gid)
+                game_log.record(self._gid, "reverse", uid=int(interaction.user.id))
+                await ensure_deferred(interaction)
                 # ボタンを無効化して編集
-                v = discord.ui.View(timeout=None)
+                v = GameView(timeout=None)
                 b = ReverseButton(self._gid)
                 b.disabled = True
                 v.add_item(b)
@@ -318,109 +434,101 @@ class GameCog(commands.Cog):
                     pass
                 # ログ
                 try:
-                    _, _, log = await ensure_gm_environment(interaction.guild)
+                    _, _, log = await ensure_gm_environment(tables.of(interaction))
                     await log.send(f"[GM Action] {interaction.user.mention} 霊界で逆回転を実行")
                 except Exception:
                     pass
                 # 応答（エフェメラル）
-                try:
-                    await interaction.followup.send("✅ 実行しました", ephemeral=True)
-                except Exception:
-                    pass
+                await respond(interaction, "✅ 実行しました")
 
-        view = discord.ui.View(timeout=None)
+        # チャンネルへの送信より先に応答を確保する
+        await ensure_deferred(interaction)
+        view = GameView(timeout=None)
         view.add_item(ReverseButton(gid))
         try:
             await channel.send("🌀 逆回転ボタン 🌀\nこのボタンを押すと、役職の流れる向きが反対になります。\n霊界から誰でも押せますが、ゲーム全体を通じて一度しか押せません。", view=view)
         except Exception:
-            if not interaction.response.is_done():
-                await interaction.response.send_message("送信に失敗しました", ephemeral=True)
+            await respond(interaction, "送信に失敗しました")
             return
-        if not interaction.response.is_done():
-            await interaction.response.send_message("✅ 逆回転ボタンを設置しました", ephemeral=True)
+        await respond(interaction, "✅ 逆回転ボタンを設置しました")
 
     @app_commands.command(name="end_game", description="ゲームを終了し、解説チャンネルを設定")
     @app_commands.default_permissions(manage_guild=True)
-    @app_commands.describe(channel_name="解説チャンネル名（既定: 解説）")
-    async def end_game(self, interaction: discord.Interaction, channel_name: str = "解説"):
+    @app_commands.describe(channel_name="解説チャンネル名（既定: 解説。卓 n では 解説-n）")
+    async def end_game(self, interaction: discord.Interaction, channel_name: str | None = None):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
         if not has_gm_or_manage_guild(interaction):
-            await interaction.response.send_message("このコマンドを実行する権限がありません (GM または サーバーの管理が必要)", ephemeral=True)
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
             return
-        guild = interaction.guild
+        guild = tables.of(interaction)
+        channel_name = channel_name or ("解説" if guild.number == 1 else f"解説-{guild.number}")
         await Storage.ensure_loaded()
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
+        await ensure_deferred(interaction)
         gm_role, gm_dash, gm_log = await ensure_gm_environment(guild)
         gm_category = gm_dash.category
-        ch_name_lower = str(channel_name).lower()
-        explanation_channel = discord.utils.get(guild.text_channels, name=ch_name_lower)
         player_role = await ensure_player_role(guild)
-        overwrites = {
-            guild.default_role: discord.PermissionOverwrite(view_channel=False),
-            gm_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True),
-            player_role: discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True),
-        }
-        if explanation_channel is None:
+        overwrites = private_overwrites(guild, gm_role, player_role)
+        existed = discord.utils.get(guild.text_channels, name=str(channel_name).lower()) is not None
+        result = await ChannelPlan(guild, reason="ゲーム終了時の解説チャンネル").channel(
+            channel_name, category=gm_category.name if gm_category else None, overwrites=overwrites
+        ).apply()
+        explanation_channel = result.channels.get(channel_name)
+        error = result.errors.get(channel_name)
+        if error is not None and existed:
+            # フォールバック: 既存を移動/編集できなければ新規に解説チャンネルを作成
             try:
-                explanation_channel = await guild.create_text_channel(channel_name, category=gm_category, overwrites=overwrites, reason="ゲーム終了時の解説チャンネル")
-            except discord.Forbidden:
-                try:
-                    await interaction.followup.send("チャンネルの作成に失敗しました（権限不足）", ephemeral=True)
-                except Exception:
-                    pass
-                return
-            except Exception as e:
-                try:
-                    await interaction.followup.send(f"チャンネルの作成に失敗しました: {e}", ephemeral=True)
-                except Exception:
-                    pass
+                explanation_channel = await guild.create_text_channel(channel_name, category=gm_category, overwrites=overwrites, reason=f"ゲーム終了時の解説チャンネル（移動/編集失敗: {error}）")
+            except Exception as e2:
+                await respond(interaction, f"既存チャンネルの設定変更に失敗し、新規作成も失敗しました: {e2}")
                 return
+        elif error is not None or explanation_channel is None:
+            reason = "権限不足" if isinstance(error, discord.Forbidden) or error is None else str(error)
+            await respond(interaction, f"チャンネルの作成に失敗しました: {reason}")
+            return
+        if not existed:
             try:
                 await explanation_channel.send("ゲーム終了。ここで振り返りや解説を行ってください。")
             except Exception:
                 pass
-        else:
-            try:
-                if explanation_channel.category_id != gm_category.id:
-                    await explanation_channel.edit(category=gm_category)
-                await explanation_channel.edit(overwrites=overwrites)
-            except discord.Forbidden:
-                # フォールバック: 新規に解説チャンネルを作成
-                try:
-                    new_ch = await guild.create_text_channel(channel_name, category=gm_category, overwrites=overwrites, reason="ゲーム終了時の解説チャンネル（既存編集不可のため新規作成）")
-                    explanation_channel = new_ch
-                except Exception as e2:
-                    try:
-                        await interaction.followup.send(f"既存チャンネルの設定変更に失敗し、新規作成も失敗しました: {e2}", ephemeral=True)
-                    except Exception:
-                        pass
-                    return
-            except Exception as e:
-                # その他の失敗もフォールバックで新規作成を試みる
-                try:
-                    new_ch = await guild.create_text_channel(channel_name, category=gm_category, overwrites=overwrites, reason=f"ゲーム終了時の解説チャンネル（移動/編集失敗: {e}）")
-                    explanation_channel = new_ch
-                except Exception as e2:
-                    try:
-                        await interaction.followup.send(f"チャンネルの設定変更に失敗し、新規作成も失敗しました: {e2}", ephemeral=True)
-                    except Exception:
-                        pass
-                    return
-        try:
-            await interaction.followup.send(f"ゲームを終了しました。解説チャンネル: {explanation_channel.mention}", ephemeral=True)
-        except Exception:
-            pass
+        game_log.record(guild.id, "end")
+        await respond(interaction, f"ゲームを終了しました。解説チャンネル: {explanation_channel.mention}")
         try:
             await gm_log.send(f"[GM Action] {interaction.user.mention} ゲーム終了 / 解説チャンネル: {explanation_channel.mention}")
         except Exception:
             pass
 
+    @app_commands.command(name="export_game", description="ゲームログ（1 行 1 イベントの JSON）をファイルで取得")
+    @app_commands.describe(game_id="ログのID（未指定なら現在のゲーム）")
+    @app_commands.default_permissions(manage_guild=True)
+    async def export_game(self, interaction: discord.Interaction, game_id: str | None = None):
+        if not interaction.guild:
+            await respond(interaction, "サーバー内で実行してください")
+            return
+        if not has_gm_or_manage_guild(interaction):
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
+            return
+        guild = tables.of(interaction)
+        key = game_id or Storage.game_log_key(guild.id)
+        # 他のサーバーのログは出さない
+        if not _LOG_KEY.fullmatch(key) or not key.startswith(f"{guild.id}-"):
+            await respond(interaction, "このサーバーのログIDではありません")
+            return
+        await ensure_deferred(interaction, thinking=True)
+        await game_log.flush()
+        # バックエンドからチャンクごとに一時ファイルへ書き出して添付（全体をメモリに載せない）
+        fp, count = await asyncio.to_thread(game_log.spool, key)
+        with fp:
+            if not count:
+                await respond(interaction, f"ログ {key} は空です")
+                return
+            await respond(
+                interaction,
+                f"📜 ゲームログ {key}（{count} 件）\n`python -m tools.replay_game {key}.jsonl --at N` で N 件目時点の状態を再現できます",
+                file=discord.File(fp, filename=f"{key}.jsonl"),
+            )
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(GameCog(bot))
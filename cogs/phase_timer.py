@@ -0,0 +1,191 @@
+# cogs/phase_timer.py
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from storage import Storage
+from utils.helpers import ensure_gm_environment, has_gm_or_manage_guild
+from utils.interactions import ensure_deferred, respond
+from utils.lifecycle import lifecycle
+from utils.locks import guild_locks
+from utils.tables import tables
+from utils.timers import timer_wheel
+from cogs.entry_manager import _do_close_vote, _do_next_day, _do_night_phase, _gm_log
+
+TIMER_TZ = ZoneInfo(os.getenv("TIMER_TZ", "Asia/Tokyo"))
+_AT = re.compile(r"(\d{1,2}):(\d{2})")
+
+ACTIONS = {
+    "next_day": ("翌日に進む", _do_next_day),
+    "night_phase": ("夜に移行する", _do_night_phase),
+    "close_vote": ("夜のアクションを締め切る", _do_close_vote),
+}
+
+
+def _parse_at(at: str) -> float:
+    """"21:00" → 次に来るその時刻（TIMER_TZ）の epoch 秒。HH:MM 以外は ValueError"""
+    m = _AT.fullmatch(at.strip())
+    if m is None:
+        raise ValueError(f"invalid time: {at!r}")
+    now = datetime.now(TIMER_TZ)
+    # 範囲外（25:00 や 21:60）は replace が ValueError にする
+    target = now.replace(hour=int(m.group(1)), minute=int(m.group(2)), second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return target.timestamp()
+
+
+def _countdown_text(timer: dict, remaining: float | None = None) -> str:
+    label = ACTIONS.get(timer.get("action"), (timer.get("action"),))[0]
+    due = int(timer["due"])
+    text = f"⏰ {label}: <t:{due}:t>（<t:{due}:R>）"
+    if remaining is not None and remaining > 0:
+        text += f"\n残り約 {max(1, round(remaining / 60))} 分"
+    return text
+
+
+async def _edit_countdown(guild: discord.Guild, timer: dict, content: str) -> None:
+    channel = guild.get_channel(int(timer.get("channel_id") or 0))
+    if channel is None or not timer.get("message_id"):
+        return
+    try:
+        await channel.get_partial_message(int(timer["message_id"])).edit(content=content)
+    except Exception:
+        pass
+
+
+class PhaseTimerCog(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        lifecycle.expect_recovery("timers")
+
+    async def cog_load(self):
+        timer_wheel.start(self._on_fire, self._on_countdown, self._on_expire)
+
+    async def cog_unload(self):
+        timer_wheel.stop()
+
+    # ===== スケジューラからの呼び出し =====
+    async def _on_fire(self, guild_id: int, timer_id: str, timer: dict, late: float) -> None:
+        guild = await tables.fetch(self.bot, guild_id)
+        if guild is None:
+            return
+        label, action = ACTIONS[timer["action"]]
+        # GM のクリックと同じロックで直列化（クリックと同時でも二重に進めない）
+        async with guild_locks.lock(guild_id):
+            game = Storage.get_game(guild_id)
+            stale = game["day"] != timer.get("day")
+            if timer["action"] == "night_phase" and game["phase"] == "night":
+                stale = True
+            if stale:
+                await _edit_countdown(guild, timer, f"⏹️ {label}: 既に進行済みのため実行しませんでした")
+                await _gm_log(guild, f"[Timer] ⏰ {label}（{timer_id}）は進行済みのためスキップ")
+                return
+            await action(guild, None)
+        await _edit_countdown(guild, timer, f"✅ {label}: 実行しました（遅延 {late * 1000:.0f}ms）")
+
+    async def _on_countdown(self, guild_id: int, timer_id: str, timer: dict, remaining: float) -> None:
+        guild = await tables.fetch(self.bot, guild_id)
+        if guild is not None:
+            await _edit_countdown(guild, timer, _countdown_text(timer, remaining))
+
+    async def _on_expire(self, guild_id: int, timer_id: str, timer: dict, late: float) -> None:
+        guild = await tables.fetch(self.bot, guild_id)
+        if guild is None:
+            return
+        label = ACTIONS.get(timer["action"], (timer["action"],))[0]
+        await _edit_countdown(guild, timer, f"⚠️ {label}: 停止中に期限を過ぎたため実行しませんでした")
+        await _gm_log(guild, f"[Timer] ⚠️ {label}（{timer_id}）は {late / 60:.0f} 分遅れのため破棄")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        try:
+            # 再起動後、保存済みのタイマーを全卓分登録し直す（ギルドの読み込みは entry_manager の on_ready と共通）
+            n = 0
+            for table in await tables.load_known(self.bot):
+                n += timer_wheel.rearm_guild(table.id)
+            if n:
+                print(f"[Timer] re-armed {n} timers")
+        finally:
+            lifecycle.recovered("timers")
+
+    # ===== コマンド =====
+    @app_commands.command(name="schedule", description="フェーズ進行を予約（minutes 分後 または at=\"21:00\"）")
+    @app_commands.describe(action="実行する進行", minutes="何分後に実行するか", at="実行時刻 HH:MM（TIMER_TZ、既定 Asia/Tokyo）")
+    @app_commands.choices(action=[app_commands.Choice(name=label, value=key) for key, (label, _) in ACTIONS.items()])
+    @app_commands.default_permissions(manage_guild=True)
+    async def schedule(self, interaction: discord.Interaction, action: app_commands.Choice[str], minutes: app_commands.Range[int, 1, 1440] | None = None, at: str | None = None):
+        if not interaction.guild:
+            await respond(interaction, "サーバー内で実行してください")
+            return
+        if not has_gm_or_manage_guild(interaction):
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
+            return
+        if (minutes is None) == (at is None):
+            await respond(interaction, "minutes か at のどちらか一方を指定してください")
+            return
+        try:
+            due = time.time() + minutes * 60 if minutes is not None else _parse_at(at)
+        except ValueError:
+            await respond(interaction, "at は HH:MM 形式で指定してください（例: 21:00）")
+            return
+        guild = tables.of(interaction)
+        await ensure_deferred(interaction)
+        timer = {
+            "action": action.value,
+            "due": due,
+            "day": Storage.get_game(guild.id)["day"],
+            "created_by": int(interaction.user.id),
+        }
+        tid = Storage.add_timer(guild.id, timer)
+        # カウントダウン表示は gm-dashboard に掲示
+        try:
+            _, dash, _ = await ensure_gm_environment(guild)
+            msg = await dash.send(_countdown_text(timer, due - time.time()))
+            timer.update(channel_id=dash.id, message_id=msg.id)
+            Storage.update_timer(guild.id, tid, channel_id=dash.id, message_id=msg.id)
+        except Exception:
+            pass
+        timer_wheel.arm(guild.id, tid, timer)
+        await respond(interaction, f"⏰ 予約しました（ID: {tid}）: {action.name} <t:{int(due)}:f>")
+        await _gm_log(guild, f"[GM Action] {interaction.user.mention} 予約: {action.name} <t:{int(due)}:f>（{tid}）")
+
+    @app_commands.command(name="timers", description="予約中のフェーズ進行を一覧表示")
+    async def timers(self, interaction: discord.Interaction):
+        if not interaction.guild:
+            await respond(interaction, "サーバー内で実行してください")
+            return
+        items = sorted(Storage.get_timers(tables.of(interaction).id).items(), key=lambda kv: kv[1]["due"])
+        lines = [f"{tid}: {ACTIONS.get(t['action'], (t['action'],))[0]} <t:{int(t['due'])}:f>（<t:{int(t['due'])}:R>）" for tid, t in items]
+        await respond(interaction, "\n".join(lines) if lines else "予約はありません")
+
+    @app_commands.command(name="cancel_timer", description="予約したフェーズ進行を取り消す")
+    @app_commands.describe(timer_id="/timers で表示される ID")
+    @app_commands.default_permissions(manage_guild=True)
+    async def cancel_timer(self, interaction: discord.Interaction, timer_id: str):
+        if not interaction.guild:
+            await respond(interaction, "サーバー内で実行してください")
+            return
+        if not has_gm_or_manage_guild(interaction):
+            await respond(interaction, "このコマンドを実行する権限がありません (GM または サーバーの管理が必要)")
+            return
+        guild = tables.of(interaction)
+        timer = Storage.remove_timer(guild.id, timer_id)
+        if timer is None:
+            await respond(interaction, "その ID の予約はありません")
+            return
+        timer_wheel.disarm(guild.id, timer_id)
+        await respond(interaction, f"🗑️ 予約 {timer_id} を取り消しました")
+        label = ACTIONS.get(timer["action"], (timer["action"],))[0]
+        await _edit_countdown(guild, timer, f"🗑️ {label}: 取り消されました")
+        await _gm_log(guild, f"[GM Action] {interaction.user.mention} 予約取消: {label}（{timer_id}）")
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(PhaseTimerCog(bot))
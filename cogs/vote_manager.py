@@ -5,7 +5,10 @@ from discord.ext import commands
 
 from storage import Storage
 from utils.helpers import ensure_gm_environment
-from cogs.entry_manager import _build_role_message_view, _disable_old_role_message_ui
+from utils.interactions import ensure_deferred, respond
+from utils.events import bus, RoleUiPosted
+from utils.tables import tables
+from cogs.entry_manager import _build_role_message_view
 
 class VoteManagerCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -13,72 +16,29 @@ class VoteManagerCog(commands.Cog):
 
     @app_commands.command(name="start_vote", description="投票を開始（雛形）")
     async def start_vote(self, interaction: discord.Interaction):
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
+        await ensure_deferred(interaction)
         if interaction.guild:
-            _, _, log = await ensure_gm_environment(interaction.guild)
+            _, _, log = await ensure_gm_environment(tables.of(interaction))
             await log.send(f"[GM Action] {interaction.user.mention} 投票開始（雛形）")
 
     @app_commands.command(name="close_vote", description="夜の投票を締め切る（以降の投票は無効）")
     async def close_vote(self, interaction: discord.Interaction):
         if not interaction.guild:
-            await interaction.response.send_message("サーバー内で実行してください", ephemeral=True)
+            await respond(interaction, "サーバー内で実行してください")
             return
-        if not interaction.response.is_done():
-            try:
-                await interaction.response.defer(ephemeral=True, thinking=False)
-            except Exception:
-                pass
+        await ensure_deferred(interaction)
         await Storage.ensure_loaded()
-        Storage.set_voting_open(interaction.guild.id, False)
-        # GM集計メッセージを更新
-        gm_role, gm_dash, _ = await ensure_gm_environment(interaction.guild)
-        gm_category = gm_dash.category
-        vote_channel = None
-        if gm_category:
-            vote_channel = discord.utils.get(gm_category.text_channels, name="vote_night")
-        text = "🗳️ 夜の投票は締め切られました。集計結果:\n"
-        # 軽い最終集計（DayProgressCogのロジックに依存しないよう簡易表示）
-        parts = Storage.get_participants(interaction.guild.id)
-        name_by_ho = {str(p.get("ho")): p.get("name") for p in parts if p.get("ho")}
-        votes = Storage.get_votes(interaction.guild.id)
-        lines = []
-        for ho in sorted(name_by_ho.keys()):
-            target = votes.get(ho)
-            if target:
-                tname = name_by_ho.get(target, target)
-                lines.append(f"{ho} → {target} ({tname})")
-            else:
-                lines.append(f"{ho} → 未投票")
-        text += "\n".join(lines)
-        if vote_channel is not None:
-            msg_id = Storage.get_gm_vote_message(interaction.guild.id)
-            try:
-                if msg_id:
-                    msg = await vote_channel.fetch_message(msg_id)
-                    await msg.edit(content=text)
-                else:
-                    msg = await vote_channel.send(text)
-                    Storage.set_gm_vote_message(interaction.guild.id, msg.id)
-            except discord.NotFound:
-                msg = await vote_channel.send(text)
-                Storage.set_gm_vote_message(interaction.guild.id, msg.id)
+        guild = tables.of(interaction)
+        # GM集計メッセージは VotingClosed を受けて集計サービスが更新する
+        Storage.set_voting_open(guild.id, False)
+        _, gm_dash, _ = await ensure_gm_environment(guild)
         try:
-            new_msg = await gm_dash.send("役職連絡: 役職/対象/送る内容を選んで送信してください", view=_build_role_message_view(interaction.guild.id))
-            try:
-                await _disable_old_role_message_ui(interaction.guild, keep_id=new_msg.id)
-            except Exception:
-                pass
+            new_msg = await gm_dash.send("役職連絡: 役職/対象/送る内容を選んで送信してください", view=_build_role_message_view(guild.id))
+            bus.publish(RoleUiPosted(guild.id, new_msg.id))
         except Exception:
             pass
-        try:
-            await interaction.followup.send("✅ 夜の投票を締め切り、役職連絡UIを表示しました", ephemeral=True)
-        except Exception:
-            pass
-        _, _, log = await ensure_gm_environment(interaction.guild)
+        await respond(interaction, "✅ 夜の投票を締め切り、役職連絡UIを表示しました")
+        _, _, log = await ensure_gm_environment(guild)
         await log.send(f"[GM Action] {interaction.user.mention} 夜の投票を締め切り")
 
 
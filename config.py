@@ -9,3 +9,8 @@ GM_CATEGORY_NAME = "GM専用"
 GM_ROLE_NAME = "GM"
 PRIVATE_CATEGORY_NAME = "個別チャンネル"
 PLAYER_ROLE_NAME = "player"
+PROGRESS_CATEGORY_NAME = "ゲーム進行"
+VOTE_CHANNEL_NAME = "vote_night"
+SPIRIT_NAME = "霊界"                 # 霊界ロール/チャンネル
+CONTACT_CHANNEL_NAME = "連絡"
+HINT_CHANNEL_NAME = "ヒント"
@@ -1,5 +1,8 @@
 # main.py
 import os
+import time
+import random
+import signal
 import asyncio
 import logging
 import discord
@@ -8,12 +11,30 @@ from discord import app_commands
 from dotenv import load_dotenv
 from aiohttp import web
 
+from storage import Storage
+from utils.events import bus
+from utils.game_log import game_log
+from utils.health import liveness, readiness
+from utils.interactions import reject_if_stopping, response_guard
+from utils.lifecycle import SHUTDOWN_DEADLINE, lifecycle
+from utils.members import MEMBER_CACHE, bot_options as member_cache_options
+from utils.tables import tables
+from utils.tasks import supervisor
+from utils.timers import timer_wheel
+
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
 APP_ID = os.getenv("APPLICATION_ID")
 DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() == "true"
 GUILD_ID = os.getenv("GUILD_ID")
 PORT = int(os.getenv("PORT", "10000"))
+# 複数プロセスで分担する場合: SHARD_COUNT=全シャード数, SHARD_IDS=このプロセスの担当 (例 "0,1")
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0") or 0)
+SHARD_IDS = [int(x) for x in os.getenv("SHARD_IDS", "").split(",") if x.strip()] or None
+# 再接続の待ち時間（秒）: RECONNECT_BASE * 2^n（上限 RECONNECT_CAP）の半分〜全部の間でランダム
+RECONNECT_BASE = float(os.getenv("RECONNECT_BASE", "1"))
+RECONNECT_CAP = float(os.getenv("RECONNECT_CAP", "300"))
+RECONNECT_STABLE = 60.0   # これ以上つながっていた後の切断は 1 回目として扱う
 
 if not TOKEN or not APP_ID:
     raise RuntimeError(".env の DISCORD_TOKEN / APPLICATION_ID を設定してください")
@@ -23,20 +44,67 @@ log = logging.getLogger("werewolf")
 
 intents = discord.Intents.default()
 intents.guilds = True
-intents.members = True
+intents.members = True   # ID 指定の取り寄せ（MEMBER_CACHE=players）にも必要
+
+
+async def _log_events(events: list) -> None:
+    for e in events:
+        log.info(f"📣 {e}")
+
+
+class WerewolfTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # 停止処理中は新しいコマンドを受け付けない
+        if await reject_if_stopping(interaction):
+            return False
+        # コマンド実行前にそのギルド（全卓）の状態だけを読み込む（遅延読み込み）
+        if interaction.guild_id:
+            await tables.load(interaction.guild_id)
+        return True
 
 
-class WerewolfBot(commands.Bot):
+_BotBase = commands.AutoShardedBot if SHARD_COUNT else commands.Bot
+_commands_synced = False
+
+
+class WerewolfBot(_BotBase):
     def __init__(self):
-        super().__init__(command_prefix="!", intents=intents, application_id=int(APP_ID))
+        shard_kwargs = {}
+        if SHARD_COUNT:
+            shard_kwargs = {"shard_count": SHARD_COUNT, "shard_ids": SHARD_IDS}
+        super().__init__(
+            command_prefix="!",
+            intents=intents,
+            application_id=int(APP_ID),
+            tree_cls=WerewolfTree,
+            **member_cache_options(),
+            **shard_kwargs,
+        )
+        # 投げっぱなしのタスクの監督（close でキャンセルして終了を待つ）
+        self.tasks = supervisor
 
     async def setup_hook(self):
+        self.tasks.open()
+        # 担当シャードのギルド一覧だけを読み込む（各ギルドの状態は初回操作時に読む）
+        if SHARD_COUNT:
+            Storage.configure_shards(SHARD_IDS, SHARD_COUNT)
+            if SHARD_IDS and len(SHARD_IDS) < SHARD_COUNT and Storage.backend().name == "file":
+                log.warning("⚠️ 複数プロセス構成でファイルストレージを使用しています（共有されません）")
+        await Storage.ensure_loaded()
+        Storage.start_invalidation_listener()
+        Storage.start_idle_eviction()
+
+        # 状態変更イベントの配信を開始（ログ購読者はここで登録）
+        bus.subscribe("logger", _log_events, batch_window=0)
+        bus.start()
+
         # Load cogs
         for ext in [
             "cogs.entry_manager",
             "cogs.game",
             "cogs.day_progress",
             "cogs.vote_manager",
+            "cogs.phase_timer",
         ]:
             try:
                 await self.load_extension(ext)
@@ -44,7 +112,10 @@ class WerewolfBot(commands.Bot):
             except Exception as e:
                 log.exception(f"❌ Failed to load {ext}: {e}")
 
-        # Sync commands
+        # Sync commands（Bot を作り直したときはコマンド定義が同じなので省略）
+        global _commands_synced
+        if _commands_synced:
+            return
         try:
             if DEBUG_MODE and GUILD_ID:
                 guild_obj = discord.Object(id=int(GUILD_ID))
@@ -53,53 +124,198 @@ class WerewolfBot(commands.Bot):
             else:
                 synced = await self.tree.sync()
                 log.info(f"🌍 Synced {len(synced)} global cmds")
+            _commands_synced = True
         except Exception as e:
             log.exception(f"❌ Sync failed: {e}")
 
     async def on_ready(self):
         log.info(f"✅ Logged in as {self.user} ({self.user.id})")
+        log.info(f"👥 member cache: {MEMBER_CACHE} ({sum(len(g.members) for g in self.guilds)} cached)")
 
+    # ゲートウェイの接続状態（/readyz, /livez 用）
+    async def on_connect(self):
+        lifecycle.gateway_up()
 
-async def run_bot():
-    bot = WerewolfBot()
-    backoff = [1, 2, 5, 10]
-    for i, wait in enumerate([0] + backoff, start=1):
-        try:
-            if wait:
-                log.warning(f"🌐 再接続試行 {i}/{len(backoff)+1}… {wait}s 後に再試行")
-                await asyncio.sleep(wait)
-            await bot.start(TOKEN)
-            return
-        except (OSError, discord.GatewayNotFound, discord.HTTPException) as e:
-            log.warning(f"⚠️ 接続エラー: {e}")
-            continue
-        except Exception:
-            log.exception("🔥 予期せぬ例外で停止")
-            break
+    async def on_resumed(self):
+        lifecycle.gateway_up(resumed=True)
+
+    async def on_disconnect(self):
+        lifecycle.gateway_down()
+
+    async def on_interaction(self, interaction: discord.Interaction):
+        # 全コマンド/コンポーネント共通: 期限内に未応答なら自動で defer
+        response_guard.arm(interaction)
+
+    async def close(self):
+        left = await self.tasks.shutdown()
+        if left:
+            log.warning(f"⚠️ {left} 件のタスクが終了しないまま停止します")
+        await super().close()
+
+
+class BotRunner:
+    """Bot の接続を維持する。
+
+    ゲートウェイの切断からの復帰（RESUME を含む）は discord.py の connect(reconnect=True) に任せ、
+    ここでは login/connect 自体が例外で抜けたときに、上限付き指数バックオフ＋ジッタで
+    何度でもやり直す。同じ Bot を使い続けるので、再接続してもキャッシュや View は失われない。
+    Bot が閉じられていた（close 済み）ときだけ拡張を外して作り直す。
+    """
 
+    def __init__(self) -> None:
+        self.bot = WerewolfBot()
+        self._logged_in = False
 
-async def run_http_server():
+    async def _recreate(self) -> None:
+        old = self.bot
+        for ext in list(old.extensions):
+            try:
+                await old.unload_extension(ext)
+            except Exception:
+                log.exception(f"❌ Failed to unload {ext}")
+        self.bot, self._logged_in = WerewolfBot(), False
+        lifecycle.reset_recovery()
+        log.warning("♻️ 閉じられた Bot を作り直しました")
+
+    async def _connect(self) -> None:
+        if self.bot.is_closed():
+            await self._recreate()
+        if not self._logged_in:
+            await self.bot.login(TOKEN)
+            self._logged_in = True
+        await self.bot.connect(reconnect=True)
+
+    async def run(self) -> None:
+        attempt = 0
+        while not lifecycle.stopping:
+            started = time.monotonic()
+            try:
+                await self._connect()
+                if lifecycle.stopping:
+                    return
+                error = "connection closed"
+            except (discord.LoginFailure, discord.PrivilegedIntentsRequired) as e:
+                # 設定の誤りは待っても直らない
+                log.error(f"🔥 接続できません（設定を確認してください）: {e}")
+                lifecycle.gateway["last_error"] = str(e)
+                return
+            except Exception as e:
+                if lifecycle.stopping:
+                    return  # 停止処理で閉じた Bot を再び start しない
+                error = f"{type(e).__name__}: {e}"
+                if isinstance(e, (OSError, discord.GatewayNotFound, discord.HTTPException, discord.ConnectionClosed)):
+                    log.warning(f"⚠️ 接続エラー: {error}")
+                else:
+                    log.exception("🔥 予期せぬ例外で切断")
+            lifecycle.gateway["last_error"] = error
+            lifecycle.gateway["bot_restarts"] += 1
+            # 長く接続できていたなら待ち時間を最初からにする
+            if time.monotonic() - started >= RECONNECT_STABLE:
+                attempt = 0
+            delay = min(RECONNECT_CAP, RECONNECT_BASE * 2 ** attempt)
+            delay = random.uniform(delay / 2, delay)
+            attempt += 1
+            log.warning(f"🌐 再接続試行 {attempt} 回目… {delay:.1f}s 後")
+            try:
+                await asyncio.wait_for(lifecycle.wait_stop(), timeout=delay)
+                return  # 待っている間に停止を要求された
+            except asyncio.TimeoutError:
+                pass
+
+
+async def run_http_server(runner: BotRunner, stop: asyncio.Event):
     async def health(request: web.Request) -> web.Response:
         return web.Response(text="ok")
 
+    def probe(check):
+        async def handler(request: web.Request) -> web.Response:
+            ok, detail = check(runner.bot)
+            status = 200 if ok else 503
+            if "verbose" in request.query:
+                return web.json_response(detail, status=status)
+            return web.Response(text="ok" if ok else "unavailable", status=status)
+        return handler
+
+    async def storage_stats(request: web.Request) -> web.Response:
+        return web.json_response(Storage.cache_stats())
+
+    async def interaction_stats(request: web.Request) -> web.Response:
+        return web.json_response(response_guard.snapshot())
+
+    async def task_stats(request: web.Request) -> web.Response:
+        return web.json_response(supervisor.snapshot())
+
+    async def gateway_stats(request: web.Request) -> web.Response:
+        return web.json_response(lifecycle.gateway_stats())
+
     app = web.Application()
     app.router.add_get("/", health)
-    app.router.add_get("/healthz", health)
+    app.router.add_get("/healthz", probe(liveness))
+    app.router.add_get("/livez", probe(liveness))
+    app.router.add_get("/readyz", probe(readiness))
+    app.router.add_get("/storage", storage_stats)
+    app.router.add_get("/interactions", interaction_stats)
+    app.router.add_get("/tasks", task_stats)
+    app.router.add_get("/gateway", gateway_stats)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, host="0.0.0.0", port=PORT)
     log.info(f"🌐 HTTP server listening on :{PORT}")
     await site.start()
-    # Keep running
-    while True:
-        await asyncio.sleep(3600)
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+
+
+async def graceful_shutdown(bot: WerewolfBot) -> None:
+    """新規受付を止め、処理中のハンドラ/タスクを待ってから状態を書き切って閉じる"""
+    started = time.monotonic()
+    lifecycle.request_stop(lifecycle.reason or "bot stopped")
+    timer_wheel.stop()
+    finished, abandoned = await lifecycle.drain(SHUTDOWN_DEADLINE)
+    remaining = max(1.0, SHUTDOWN_DEADLINE - (time.monotonic() - started))
+    abandoned += await bot.tasks.shutdown(timeout=remaining)
+    # 処理中のハンドラが残した変更/ログ/イベントを書き切る
+    await bus.drain(timeout=2.0)
+    await game_log.flush()
+    saved = await Storage.close()
+    await bot.close()
+    lifecycle.report = {
+        "reason": lifecycle.reason,
+        "drain_s": round(time.monotonic() - started, 3),
+        "handlers_finished": finished,
+        "abandoned": abandoned,
+        "storage_saved": saved,
+    }
+    log.info(f"🛑 停止完了: {lifecycle.report}")
 
 
 async def main():
-    await asyncio.gather(
-        run_bot(),
-        run_http_server(),
-    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, lifecycle.request_stop, sig.name)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows ではシグナルハンドラを登録できない（Ctrl+C は従来どおり）
+
+    runner = BotRunner()
+    stop_http = asyncio.Event()
+    http_task = asyncio.create_task(run_http_server(runner, stop_http), name="http")
+    bot_task = asyncio.create_task(runner.run(), name="bot")
+    stop_task = asyncio.create_task(lifecycle.wait_stop(), name="lifecycle:stop")
+    try:
+        await asyncio.wait({bot_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stop_task.cancel()
+        # シグナルでも Bot の終了でも同じ手順で書き切る
+        await graceful_shutdown(runner.bot)
+        try:
+            await asyncio.wait_for(bot_task, timeout=5)
+        except Exception:
+            log.warning("⚠️ Bot の接続タスクが時間内に終わりませんでした")
+        stop_http.set()
+        await http_task
 
 
 if __name__ == "__main__":
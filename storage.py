@@ -1,21 +1,101 @@
 # storage.py
 from __future__ import annotations
 import os
+import copy
 import json
+import time
+import uuid
 import asyncio
-import requests
-from typing import Any, Dict, List, Optional, Union
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from backends.base import Backend
+from backends.codec import Codec
+from backends.file import FileBackend
+from backends.sqlite import SqliteBackend
+from backends.upstash import UpstashBackend
+from utils.events import bus, GameId, NightActionRecorded, ParticipantsChanged, PhaseChanged, VoteRecorded, VotingClosed
 
 Json = Dict[str, Any]
 
 
+def game_id(guild_id: int, table: int = 1) -> GameId:
+    """卓のゲーム ID（卓 1 はギルド ID そのもの。従来のデータはそのまま卓 1 になる）"""
+    return int(guild_id) if int(table) <= 1 else f"{int(guild_id)}:{int(table)}"
+
+
+def split_game_id(gid: GameId) -> Tuple[int, int]:
+    """ゲーム ID → (ギルド ID, 卓の番号)"""
+    guild, _, table = str(gid).partition(":")
+    return int(guild), int(table or 1)
+
+
+def _event_id(gid: str) -> GameId:
+    # Storage 内部のキー（str）をイベントのゲーム ID（卓 1 は int）に戻す
+    return int(gid) if gid.isdigit() else gid
+
+
+class GuildNotLoaded(RuntimeError):
+    """読み込んでいないギルドの状態に同期アクセスした（先に ensure_guild_loaded を await する）"""
+
+
+class ParticipantChange(NamedTuple):
+    guild_id: GameId
+    kind: str                     # "add" | "remove" | "set_ho" | "bulk_assign" | "replace" | "reset"
+    user_ids: tuple               # 変更のあった user_id
+
+
+def _build_backend(kind: str) -> Backend:
+    """STORAGE_BACKEND からバックエンドを生成（設定不足ならファイルにフォールバック）"""
+    url = os.getenv("UPSTASH_REDIS_REST_URL", "")
+    token = os.getenv("UPSTASH_REDIS_REST_TOKEN", "")
+    codec = Codec.from_env(os.getenv("STORAGE_CODEC"), os.getenv("STORAGE_COMPRESS"))
+    if kind == "upstash" and url and token:
+        return UpstashBackend(url, token, os.getenv("STORAGE_KEY", "werewolf:data"), codec)
+    if kind == "sqlite":
+        return SqliteBackend(os.getenv("SQLITE_PATH", "werewolf.db"))
+    return FileBackend(os.getenv("DATA_FILE", "data.json"), codec)
+
+
 class Storage:
     data_file: str = os.getenv("DATA_FILE", "data.json")
     _loaded: bool = False
+    # 直近の読み込み/書き込みの失敗（/readyz 用。成功すると None に戻る）
+    _load_error: Optional[str] = None
+    _save_error: Optional[str] = None
     _backend: str = os.getenv("STORAGE_BACKEND", "file").lower()
-    _upstash_url: str = os.getenv("UPSTASH_REDIS_REST_URL", "")
-    _upstash_token: str = os.getenv("UPSTASH_REDIS_REST_TOKEN", "")
-    _upstash_key: str = os.getenv("STORAGE_KEY", "werewolf:data")
+    _store: Optional[Backend] = None
+    _dirty: set = set()
+    # flush が書き込み中のギルド（_dirty からは外れているが、書き終わるまでメモリから外さない）
+    _writing: set = set()
+    _flush_lock: Optional[asyncio.Lock] = None
+    _flush_task: Optional[asyncio.Task] = None
+    _listen_task: Optional[asyncio.Task] = None
+    _evict_task: Optional[asyncio.Task] = None
+    _shrink_task: Optional[asyncio.Task] = None
+    # 遅延読み込み: 既知ギルド一覧 / 読み込み中 / 最終アクセス時刻
+    _index: set = set()
+    _inflight: Dict[str, asyncio.Future] = {}
+    _last_access: Dict[str, float] = {}
+    _idle_ttl: float = float(os.getenv("STORAGE_IDLE_TTL", "3600"))
+    # メモリ上のギルド {gid: 概算バイト数}（LRU 順。先頭が最も古い）
+    _resident: "OrderedDict[str, int]" = OrderedDict()
+    _resident_bytes: int = 0
+    _size_stale: set = set()
+    _max_guilds: int = int(os.getenv("STORAGE_MAX_GUILDS", "500"))
+    _max_bytes: int = int(os.getenv("STORAGE_MAX_BYTES", str(32 * 1024 * 1024)))
+    _cache_stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "writebacks": 0}
+    # シャード構成（既定は単一プロセスで全ギルドを担当）
+    _shard_ids: Optional[Sequence[int]] = None
+    _shard_count: int = 1
+
+    SECTIONS = (
+        "participants", "game", "votes", "voting_open", "gm_vote_message_id",
+        "dashboard_message_id", "spirit_reverse_used", "night_actions", "scenario",
+        "timers", "madman", "rotation", "game_log_id", "provision", "guild_config", "tables",
+    )
+    KEEP_ON_RESET = ("scenario", "guild_config", "tables")
 
     data: Json = {
         "participants": {},           # {guild_id: [ {id:int, name:str, ho: Optional[str]} ]}
@@ -26,101 +106,473 @@ class Storage:
         "dashboard_message_id": {},   # {guild_id: int}
         "spirit_reverse_used": {},    # {guild_id: bool}
         "night_actions": {},          # {guild_id: { "占い": {voter_ho: target_ho}, "狩人": {voter_ho: target_ho} }}
+        "scenario": {},               # {guild_id: scenario_id}（未設定なら既定シナリオ）
+        "timers": {},                 # {guild_id: {timer_id: {action, due(epoch秒), day, created_by, channel_id, message_id}}}
+        "madman": {},                 # {guild_id: ho}（GM が狂人連絡 A を送った HO。B で解除）
+        "rotation": {},               # {guild_id: {base: {ho: role}, day, offset, step}}（utils/rotation.py）
+        "game_log_id": {},            # {guild_id: 現在のゲームのログキー}（リセットで次のゲームの新しいキーになる）
+        "provision": {},              # {guild_id: {"roles": {ho: role_id}, "grants": {uid: role_id}, "channels": {name: channel_id}}}（締め切り処理の完了済み手順）
+        "guild_config": {},           # {guild_id: {"names": {key: 名前}, "ids": {key: id}}}（utils/guild_config.py のロール/カテゴリ/チャンネル）
+        "tables": {},                 # {guild_id: [2, 3, ...]}（卓 1 にだけ持つ、追加した卓の番号。utils/tables.py）
     }
 
+    # 参加者の読み取りキャッシュ（data からの派生。変更時に破棄）
+    _participant_views: Dict[str, tuple] = {}
+    _participant_ho_index: Dict[str, Dict[str, Mapping[str, Any]]] = {}
+    _participant_versions: Dict[str, int] = {}
+    _participant_listeners: List[Callable[[ParticipantChange], None]] = []
+    # 夜の判定に使う状態（夜アクション/狂人/逆回転）が変わるたびに増える番号
+    _night_versions: Dict[str, int] = {}
+
+    # ---------- sharding ----------
+    @classmethod
+    def configure_shards(cls, shard_ids: Optional[Sequence[int]], shard_count: int) -> None:
+        """このプロセスが担当するシャードを設定（ensure_loaded より前に呼ぶ）"""
+        cls._shard_ids = list(shard_ids) if shard_ids is not None else None
+        cls._shard_count = max(1, int(shard_count))
+
+    @classmethod
+    def owns(cls, guild_id: GameId) -> bool:
+        """Discord のシャード割当 (guild_id >> 22) % shard_count に従って担当か判定（卓はギルドに従う）"""
+        if cls._shard_ids is None or cls._shard_count <= 1:
+            return True
+        return (split_game_id(guild_id)[0] >> 22) % cls._shard_count in cls._shard_ids
+
     # ---------- IO ----------
+    @classmethod
+    def backend(cls) -> Backend:
+        if cls._store is None:
+            cls._store = _build_backend(cls._backend)
+        return cls._store
+
     @classmethod
     async def ensure_loaded(cls) -> None:
+        """既知ギルドの一覧だけを読み込む（各ギルドの状態は初回アクセス時に読む）"""
         if cls._loaded:
             return
-        if cls._backend == "upstash" and cls._upstash_url and cls._upstash_token:
+        store = cls.backend()
+        try:
+            index = await asyncio.to_thread(store.load_index)
+            cls._load_error = None
+        except Exception as e:
+            print(f"[Storage] load index failed: {e}")
+            cls._load_error = str(e) or type(e).__name__
+            index = []
+        cls._fresh()
+        cls._index = {gid for gid in index if cls.owns(gid)}
+        cls._loaded = True
+
+    @classmethod
+    async def ensure_guild_loaded(cls, guild_id: int) -> None:
+        """ギルドの状態をメモリに読み込む。同じギルドへの同時要求は 1 回の読み込みにまとめる"""
+        await cls.ensure_loaded()
+        gid = str(guild_id)
+        cls._last_access[gid] = time.monotonic()
+        if gid in cls._resident:
+            cls._cache_stats["hits"] += 1
+            cls._resident.move_to_end(gid)
+            return
+        if gid not in cls._index:
+            return
+        fut = cls._inflight.get(gid)
+        if fut is None:
+            cls._cache_stats["misses"] += 1
+            fut = asyncio.get_running_loop().create_future()
+            cls._inflight[gid] = fut
             try:
-                raw = await cls._kv_get()
-                if not isinstance(raw, dict) or not raw:
-                    cls._fresh()
-                else:
-                    for k, v in cls.data.items():
-                        if k not in raw:
-                            raw[k] = v
-                    cls.data = raw
-            except Exception:
-                cls._fresh()
+                doc = await asyncio.to_thread(cls.backend().load_guild, gid)
+                # 読み込み中に書き込みが入っていれば（同期読み込み経由）メモリ側を優先
+                if gid not in cls._resident:
+                    cls._hydrate(gid, doc)
+                fut.set_result(None)
+            except Exception as e:
+                print(f"[Storage] load guild {gid} failed: {e}")
+                fut.set_exception(e)
+                fut.exception()  # 待機者がいなくても警告を出さない
+            finally:
+                cls._inflight.pop(gid, None)
         else:
-            if os.path.exists(cls.data_file):
-                try:
-                    with open(cls.data_file, "r", encoding="utf-8") as f:
-                        raw = json.load(f)
-                    for k, v in cls.data.items():
-                        if k not in raw:
-                            raw[k] = v
-                    cls.data = raw
-                except Exception:
-                    cls._fresh()
-            else:
-                cls._fresh()
-        cls._loaded = True
+            await asyncio.shield(fut)
+
+    @classmethod
+    def is_known(cls, guild_id: Union[int, str]) -> bool:
+        """保存済み（またはこのプロセスで作成済み）のギルドか"""
+        return str(guild_id) in cls._index
+
+    @classmethod
+    def _hydrate(cls, gid: str, doc: Optional[Json]) -> None:
+        cls._apply_doc(gid, doc or {})
+        # 退避中に他プロセスが更新している可能性があるのでキャッシュを無効化
+        cls._participant_versions[gid] = cls._participant_versions.get(gid, 0) + 1
+        cls._admit(gid)
+
+    # ---------- resident cache (LRU) ----------
+    @classmethod
+    def configure_cache(cls, max_guilds: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        if max_guilds is not None:
+            cls._max_guilds = max_guilds
+        if max_bytes is not None:
+            cls._max_bytes = max_bytes
+        cls._enforce_limits()
+
+    @classmethod
+    def health(cls) -> Json:
+        """メモリ上の状態だけから求める健全性（バックエンドには問い合わせない）"""
+        return {
+            "ok": cls._loaded and cls._load_error is None,
+            "backend": cls.backend().name,
+            "loaded": cls._loaded,
+            "load_error": cls._load_error,
+            "save_error": cls._save_error,
+            "dirty": len(cls._dirty),
+        }
+
+    @classmethod
+    def cache_stats(cls) -> Json:
+        cls._refresh_sizes()
+        lookups = cls._cache_stats["hits"] + cls._cache_stats["misses"]
+        return dict(
+            cls._cache_stats,
+            resident=len(cls._resident),
+            known=len(cls._index),
+            dirty=len(cls._dirty),
+            bytes=cls._resident_bytes,
+            max_guilds=cls._max_guilds,
+            max_bytes=cls._max_bytes,
+            hit_ratio=round(cls._cache_stats["hits"] / lookups, 4) if lookups else None,
+        )
+
+    @classmethod
+    def _admit(cls, gid: str) -> None:
+        """ギルドをメモリ上に置く（最新扱い）。上限を超えたら古いものから外す"""
+        if gid not in cls._resident:
+            cls._resident[gid] = 0
+            cls._size_stale.add(gid)
+            cls._last_access[gid] = time.monotonic()
+            cls._enforce_limits(keep=gid)
+        else:
+            cls._resident.move_to_end(gid)
+
+    @classmethod
+    def _refresh_sizes(cls) -> None:
+        """変更のあったギルドだけサイズを測り直す（JSON 換算の概算）"""
+        for gid in cls._size_stale:
+            if gid not in cls._resident:
+                continue
+            doc = cls._guild_doc(gid)
+            size = len(json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")) if doc else 0
+            cls._resident_bytes += size - cls._resident[gid]
+            cls._resident[gid] = size
+        cls._size_stale.clear()
+
+    @classmethod
+    def _over_limit(cls) -> bool:
+        if len(cls._resident) > cls._max_guilds:
+            return True
+        cls._refresh_sizes()
+        return cls._resident_bytes > cls._max_bytes
+
+    @classmethod
+    def _enforce_limits(cls, keep: Optional[str] = None) -> None:
+        """LRU で上限まで外す。未保存のギルドは書き込み後に外す"""
+        if not cls._over_limit():
+            return
+        pending_writeback = False
+        for gid in list(cls._resident):
+            if not cls._over_limit():
+                return
+            if gid == keep or gid in cls._inflight or gid in cls._writing:
+                continue
+            if gid in cls._dirty:
+                pending_writeback = True
+                continue
+            cls._drop(gid)
+            cls._cache_stats["evictions"] += 1
+        if not pending_writeback:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            cls._flush_sync()
+            cls._enforce_limits(keep)
+            return
+        if cls._shrink_task is None or cls._shrink_task.done():
+            cls._shrink_task = loop.create_task(cls._write_back_and_shrink(keep), name="storage:shrink")
+
+    @classmethod
+    async def _write_back_and_shrink(cls, keep: Optional[str]) -> None:
+        written = len(cls._dirty)
+        await cls.flush()
+        cls._cache_stats["writebacks"] += max(0, written - len(cls._dirty))
+        cls._enforce_limits(keep)
+
+    @classmethod
+    def start_idle_eviction(cls, ttl: Optional[float] = None, interval: float = 60.0) -> None:
+        """一定時間アクセスのないギルドを（未保存分を書き込んでから）メモリから外す"""
+        if ttl is not None:
+            cls._idle_ttl = ttl
+        if cls._evict_task is None or cls._evict_task.done():
+            cls._evict_task = asyncio.get_running_loop().create_task(cls._evict_loop(interval), name="storage:evict")
+
+    @classmethod
+    async def _evict_loop(cls, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await cls.evict_idle()
+            except Exception as e:
+                print(f"[Storage] eviction failed: {e}")
+
+    @classmethod
+    async def evict_idle(cls) -> int:
+        now = time.monotonic()
+        idle = [gid for gid in cls._resident if now - cls._last_access.get(gid, 0) > cls._idle_ttl]
+        if not idle:
+            return 0
+        if any(gid in cls._dirty for gid in idle):
+            written = len(cls._dirty)
+            await cls.flush()
+            cls._cache_stats["writebacks"] += max(0, written - len(cls._dirty))
+        evicted = 0
+        for gid in idle:
+            # flush 中に再アクセス/再変更されたもの・書き込み中のものは残す
+            if gid in cls._dirty or gid in cls._writing or time.monotonic() - cls._last_access.get(gid, 0) <= cls._idle_ttl:
+                continue
+            cls._drop(gid)
+            evicted += 1
+        cls._cache_stats["evictions"] += evicted
+        return evicted
+
+    @classmethod
+    def _drop(cls, gid: str) -> None:
+        for section in cls.SECTIONS:
+            cls.data.get(section, {}).pop(gid, None)
+        cls._participant_views.pop(gid, None)
+        cls._participant_ho_index.pop(gid, None)
+        cls._resident_bytes -= cls._resident.pop(gid, 0)
+        cls._size_stale.discard(gid)
+        cls._last_access.pop(gid, None)
 
     @classmethod
     def _fresh(cls) -> None:
-        cls.data = {"participants": {}, "game": {}, "votes": {}, "voting_open": {}, "gm_vote_message_id": {}, "dashboard_message_id": {}, "spirit_reverse_used": {}, "night_actions": {}}
-        cls.save()
+        cls.data = {section: {} for section in cls.SECTIONS}
+        cls._resident.clear()
+        cls._resident_bytes = 0
+        cls._size_stale.clear()
+        cls._participant_views.clear()
+        cls._participant_ho_index.clear()
 
     @classmethod
-    def save(cls) -> None:
+    def _apply_doc(cls, gid: str, doc: Json) -> None:
+        """ギルド単位のドキュメントをメモリ上の data に反映"""
+        for section in cls.SECTIONS:
+            cls.data.setdefault(section, {})
+            if section in doc:
+                cls.data[section][gid] = doc[section]
+            else:
+                cls.data[section].pop(gid, None)
+        cls._participant_views.pop(gid, None)
+        cls._participant_ho_index.pop(gid, None)
+        cls._night_changed(gid)
+
+    @classmethod
+    def _guild_doc(cls, gid: str) -> Json:
+        return {s: cls.data[s][gid] for s in cls.SECTIONS if gid in cls.data.get(s, {})}
+
+    @classmethod
+    def _mark_dirty(cls, gid: str) -> None:
+        """変更されたギルドを記録し、イベントループ上なら書き込みを予約する"""
+        gid = str(gid)
+        cls._dirty.add(gid)
+        cls._index.add(gid)
+        cls._size_stale.add(gid)
+        cls._admit(gid)
         try:
-            if cls._backend == "upstash" and cls._upstash_url and cls._upstash_token:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # ループ外（スクリプト等）では同期で書き込む
+            cls._flush_sync()
+            return
+        if cls._flush_task is None or cls._flush_task.done():
+            cls._flush_task = loop.create_task(cls.flush(), name="storage:flush")
+
+    @classmethod
+    def save(cls) -> None:
+        """互換用: メモリ上の全ギルドを書き込み対象にする"""
+        for gid in list(cls._resident):
+            cls._mark_dirty(gid)
+
+    @classmethod
+    def _take_dirty(cls) -> Dict[str, Json]:
+        # ループ上でスナップショットを取り、書き込みはスレッドで行う
+        dirty, cls._dirty = cls._dirty, set()
+        return {gid: copy.deepcopy(cls._guild_doc(gid)) for gid in dirty}
+
+    @classmethod
+    def _write_docs(cls, store: Backend, docs: Dict[str, Json]) -> None:
+        """空になったギルド（リセット後など）は保存せず削除する"""
+        live = {gid: doc for gid, doc in docs.items() if doc}
+        if live:
+            store.save_guilds(live)
+        for gid, doc in docs.items():
+            if not doc:
+                store.delete_guild(gid)
+
+    @classmethod
+    def _forget_empty(cls, docs: Dict[str, Json]) -> None:
+        for gid, doc in docs.items():
+            if not doc and gid not in cls._dirty:
+                cls._index.discard(gid)
+
+    @classmethod
+    def _flush_sync(cls) -> None:
+        docs = cls._take_dirty()
+        if docs:
+            try:
+                cls._write_docs(cls.backend(), docs)
+                cls._forget_empty(docs)
+            except Exception as e:
+                print(f"[Storage] save failed: {e}")
+
+    @classmethod
+    async def flush(cls) -> None:
+        """未保存の変更をバックエンドへ書き込む（書き込み順を保つため直列化）"""
+        if cls._flush_lock is None:
+            cls._flush_lock = asyncio.Lock()
+        async with cls._flush_lock:
+            while cls._dirty:
+                docs = cls._take_dirty()
+                store = cls.backend()
+                # 書き込み中に他のギルドの変更で上限を超えても、これらは外さない
+                # （外すと次のアクセスで書き込み前の内容を読み直してしまう）
+                cls._writing.update(docs.keys())
                 try:
-                    json_str = json.dumps(cls.data, ensure_ascii=False)
+                    await asyncio.to_thread(cls._write_docs, store, docs)
+                    cls._save_error = None
                 except Exception as e:
-                    print(f"[Storage] serialize failed: {e}")
+                    print(f"[Storage] save failed: {e}")
+                    cls._save_error = str(e) or type(e).__name__
+                    # 次回の書き込みで再試行
+                    cls._dirty.update(docs.keys())
                     return
-                try:
-                    headers = {"Authorization": f"Bearer {cls._upstash_token}"}
-                    url = cls._upstash_url.rstrip("/") + f"/set/{cls._upstash_key}"
-                    resp = requests.post(url, headers=headers, json={"value": json_str}, timeout=10)
-                    if resp.status_code >= 300:
-                        print(f"[Storage] kv set failed: {resp.status_code} {resp.text}")
-                except Exception as e:
-                    print(f"[Storage] kv save failed: {e}")
-            else:
-                with open(cls.data_file, "w", encoding="utf-8") as f:
-                    json.dump(cls.data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"[Storage] save failed: {e}")
+                finally:
+                    cls._writing.difference_update(docs.keys())
+                cls._forget_empty(docs)
+                await asyncio.to_thread(store.publish_invalidation, list(docs.keys()))
+        cls._enforce_limits()
+
+    @classmethod
+    async def close(cls) -> bool:
+        """他プロセスからの通知の受信を止め、未保存の変更を書き切る（停止時）。すべて書けたら True"""
+        # 退避/縮小のタスクは flush と同じロックで直列化されるので止めない（書き込み途中で切らない）
+        if cls._listen_task is not None:
+            cls._listen_task.cancel()
+            cls._listen_task = None
+        await cls.flush()
+        if cls._dirty:
+            print(f"[Storage] {len(cls._dirty)} guild(s) could not be saved before shutdown")
+            return False
+        return True
 
+    # ---------- cross-process invalidation ----------
     @classmethod
-    async def _kv_get(cls) -> Json:
-        def _do() -> Json:
-            headers = {"Authorization": f"Bearer {cls._upstash_token}"}
-            url = cls._upstash_url.rstrip("/") + f"/get/{cls._upstash_key}"
-            resp = requests.get(url, headers=headers, timeout=10)
-            if resp.status_code >= 300:
-                return {}
+    def start_invalidation_listener(cls) -> None:
+        """他プロセスの書き込み通知を受けて担当ギルドを読み直す"""
+        if cls._listen_task is None or cls._listen_task.done():
+            cls._listen_task = asyncio.get_running_loop().create_task(cls._listen(), name="storage:invalidate")
+
+    @classmethod
+    async def _listen(cls) -> None:
+        async for gid in cls.backend().listen_invalidations():
+            if not gid or not cls.owns(gid):
+                continue
+            cls._index.add(gid)
+            # メモリに無いギルドは次回アクセス時に読むので何もしない
+            if gid not in cls._resident or gid in cls._dirty:
+                continue
             try:
-                payload = resp.json()
-                val = payload.get("result")
-                if not val:
-                    return {}
-                return json.loads(val)
-            except Exception:
-                return {}
-        return await asyncio.to_thread(_do)
+                doc = await asyncio.to_thread(cls.backend().load_guild, gid)
+            except Exception as e:
+                print(f"[Storage] reload {gid} failed: {e}")
+                continue
+            cls._apply_doc(gid, doc or {})
+            cls._participant_versions[gid] = cls._participant_versions.get(gid, 0) + 1
+            cls._size_stale.add(gid)
 
     # ---------- helpers ----------
     @classmethod
     def _g(cls, guild_id: int) -> str:
-        return str(guild_id)
+        gid = str(guild_id)
+        # ヒット/ミスは数えない（1 つのハンドラ内で何度も呼ばれる。常駐の判定は ensure_guild_loaded）
+        if gid in cls._resident:
+            cls._resident.move_to_end(gid)
+        elif gid in cls._index:
+            # 保存済みだがメモリに無い。イベントループ上でブロッキング読み込みはせず、呼び出し元の
+            # 非同期の入口（interaction_check / イベント購読 / タイマー）で読み込んでおく
+            print(f"[Storage] ⚠️ guild {gid} was accessed before ensure_guild_loaded")
+            raise GuildNotLoaded(gid)
+        else:
+            cls._admit(gid)
+        cls._last_access[gid] = time.monotonic()
+        return gid
 
     # ---------- participants ----------
     @classmethod
-    def get_participants(cls, guild_id: int) -> List[Json]:
-        return list(cls.data["participants"].get(cls._g(guild_id), []))
+    def on_participants_changed(cls, listener: Callable[[ParticipantChange], None]) -> None:
+        """参加者の変更通知を購読する（同じ関数の二重登録は無視）"""
+        if listener not in cls._participant_listeners:
+            cls._participant_listeners.append(listener)
+
+    @classmethod
+    def _participants_changed(cls, gid: str, kind: str, user_ids: Iterable[int]) -> None:
+        cls._participant_views.pop(gid, None)
+        cls._participant_ho_index.pop(gid, None)
+        cls._participant_versions[gid] = cls._participant_versions.get(gid, 0) + 1
+        cls._mark_dirty(gid)
+        change = ParticipantChange(_event_id(gid), kind, tuple(int(u) for u in user_ids))
+        for listener in list(cls._participant_listeners):
+            try:
+                listener(change)
+            except Exception as e:
+                print(f"[Storage] participant listener failed: {e}")
+        bus.publish(ParticipantsChanged(change.guild_id, change.kind, change.user_ids))
+
+    @classmethod
+    def participants_version(cls, guild_id: int) -> int:
+        """参加者一覧が変わるたびに増える番号（描画キャッシュの判定用）"""
+        return cls._participant_versions.get(cls._g(guild_id), 0)
+
+    @classmethod
+    def get_participants(cls, guild_id: int) -> Sequence[Mapping[str, Any]]:
+        """読み取り専用ビューを返す（変更があるまで同じタプルを使い回す）"""
+        gid = cls._g(guild_id)
+        view = cls._participant_views.get(gid)
+        if view is None:
+            view = tuple(MappingProxyType(p) for p in cls.data["participants"].get(gid, []))
+            cls._participant_views[gid] = view
+        return view
+
+    @classmethod
+    def get_participant_by_ho(cls, guild_id: int, ho: str) -> Optional[Mapping[str, Any]]:
+        gid = cls._g(guild_id)
+        index = cls._participant_ho_index.get(gid)
+        if index is None:
+            index = {str(p["ho"]).upper(): p for p in cls.get_participants(guild_id) if p.get("ho")}
+            cls._participant_ho_index[gid] = index
+        return index.get(str(ho).upper())
+
+    @classmethod
+    def get_participant(cls, guild_id: int, user_id: int) -> Optional[Mapping[str, Any]]:
+        for p in cls.get_participants(guild_id):
+            if int(p["id"]) == int(user_id):
+                return p
+        return None
 
     @classmethod
     def set_participants(cls, guild_id: int, participants: List[Json]) -> None:
         gid = cls._g(guild_id)
-        cls.data["participants"][gid] = participants
-        cls.save()
+        cls.data["participants"][gid] = [dict(p) for p in participants]
+        cls._participants_changed(gid, "replace", (p["id"] for p in participants))
 
     @classmethod
     def get_participant_names(cls, guild_id: int) -> List[str]:
@@ -136,51 +588,95 @@ class Storage:
         else:
             uid = int(user["id"])  # type: ignore[index]
             name = str(user["name"])  # type: ignore[index]
-        for p in cls.data["participants"][gid]:
-            if int(p["id"]) == uid:
-                return
+        if cls.get_participant(guild_id, uid) is not None:
+            return
         cls.data["participants"][gid].append({"id": uid, "name": name, "ho": None})
-        cls.save()
+        cls._participants_changed(gid, "add", (uid,))
 
     @classmethod
     def remove_participant(cls, guild_id: int, user_id: int) -> None:
         gid = cls._g(guild_id)
         arr = cls.data["participants"].get(gid, [])
-        arr = [p for p in arr if int(p["id"]) != int(user_id)]
-        cls.data["participants"][gid] = arr
-        cls.save()
+        for i, p in enumerate(arr):
+            if int(p["id"]) == int(user_id):
+                del arr[i]
+                cls._participants_changed(gid, "remove", (user_id,))
+                return
+
+    @classmethod
+    def set_participant_ho(cls, guild_id: int, user_id: int, ho: Optional[str]) -> None:
+        cls.bulk_assign_ho(guild_id, {int(user_id): ho})
 
     @classmethod
-    def assign_ho_sequential(cls, guild_id: int) -> List[Json]:
+    def bulk_assign_ho(cls, guild_id: int, assignments: Mapping[int, Optional[str]]) -> None:
+        """{user_id: ho} をまとめて反映し、変更があった分だけ通知する"""
+        gid = cls._g(guild_id)
+        changed: List[int] = []
+        for p in cls.data["participants"].get(gid, []):
+            uid = int(p["id"])
+            if uid in assignments and p.get("ho") != assignments[uid]:
+                p["ho"] = assignments[uid]
+                changed.append(uid)
+        if changed:
+            cls._participants_changed(gid, "set_ho" if len(assignments) == 1 else "bulk_assign", changed)
+
+    @classmethod
+    def assign_ho_sequential(cls, guild_id: int) -> Sequence[Mapping[str, Any]]:
         """
         参加順に HO1, HO2, ... を割り当てて保存して返す
         """
         gid = cls._g(guild_id)
         arr = cls.data["participants"].get(gid, [])
-        for i, p in enumerate(arr, start=1):
-            p["ho"] = f"HO{i}"
-        cls.data["participants"][gid] = arr
-        cls.save()
-        return arr
+        cls.bulk_assign_ho(guild_id, {int(p["id"]): f"HO{i}" for i, p in enumerate(arr, start=1)})
+        return cls.get_participants(guild_id)
 
     # ---------- game ----------
     @classmethod
     def ensure_game(cls, guild_id: int) -> None:
         gid = cls._g(guild_id)
-        cls.data["game"].setdefault(gid, {"day": 0, "phase": "day"})
-        cls.save()
+        if gid not in cls.data["game"]:
+            cls.data["game"][gid] = {"day": 0, "phase": "day"}
+            cls._mark_dirty(cls._g(guild_id))
+
+    @classmethod
+    def get_game(cls, guild_id: int) -> Json:
+        cls.ensure_game(guild_id)
+        return dict(cls.data["game"][cls._g(guild_id)])
+
+    @classmethod
+    def advance_day(cls, guild_id: int) -> int:
+        """Day+1 / Phase=day にして新しい日数を返す"""
+        gid = cls._g(guild_id)
+        cls.ensure_game(guild_id)
+        game = cls.data["game"][gid]
+        game["day"] += 1
+        game["phase"] = "day"
+        cls._mark_dirty(cls._g(guild_id))
+        bus.publish(PhaseChanged(_event_id(gid), int(game["day"]), "day"))
+        return int(game["day"])
+
+    @classmethod
+    def set_phase(cls, guild_id: int, phase: str) -> None:
+        gid = cls._g(guild_id)
+        cls.ensure_game(guild_id)
+        game = cls.data["game"][gid]
+        game["phase"] = phase
+        cls._mark_dirty(cls._g(guild_id))
+        bus.publish(PhaseChanged(_event_id(gid), int(game["day"]), phase))
 
     @classmethod
-    def reset_guild(cls, guild_id: int) -> None:
+    def reset_guild(cls, guild_id: GameId, keep: Optional[Sequence[str]] = None) -> None:
+        """ゲームの状態を消す（keep の節は残す。既定は KEEP_ON_RESET、卓の終了では () ですべて消す）"""
         gid = cls._g(guild_id)
-        cls.data["participants"][gid] = []
-        cls.data["game"][gid] = {"day": 0, "phase": "day"}
-        cls.data["votes"][gid] = {}
-        cls.data["voting_open"][gid] = False
-        cls.data["gm_vote_message_id"].pop(gid, None)
-        cls.data["dashboard_message_id"].pop(gid, None)
-        cls.data["spirit_reverse_used"][gid] = False
-        cls.save()
+        removed = [int(p["id"]) for p in cls.data["participants"].get(gid, [])]
+        keep = cls.KEEP_ON_RESET if keep is None else keep
+        # 既定値の空エントリは残さない（何も残らなければ保存時にギルドごと削除される）
+        # シナリオ選択は次のゲームにも引き継ぐ
+        for section in cls.SECTIONS:
+            if section not in keep:
+                cls.data[section].pop(gid, None)
+        cls._night_changed(gid)
+        cls._participants_changed(gid, "reset", removed)
 
     # ---------- night vote ----------
     @classmethod
@@ -188,14 +684,15 @@ class Storage:
         gid = cls._g(guild_id)
         cls.data["votes"].setdefault(gid, {})
         cls.data["votes"][gid] = {voter: None for voter in participants_ho}
-        cls.save()
+        cls._mark_dirty(cls._g(guild_id))
 
     @classmethod
     def set_vote(cls, guild_id: int, voter_ho: str, target_ho: Optional[str]) -> None:
         gid = cls._g(guild_id)
         cls.data["votes"].setdefault(gid, {})
         cls.data["votes"][gid][voter_ho] = target_ho
-        cls.save()
+        cls._mark_dirty(cls._g(guild_id))
+        bus.publish(VoteRecorded(_event_id(gid), voter_ho, target_ho))
 
     @classmethod
     def get_votes(cls, guild_id: int) -> Dict[str, Optional[str]]:
@@ -203,8 +700,11 @@ class Storage:
 
     @classmethod
     def set_voting_open(cls, guild_id: int, is_open: bool) -> None:
-        cls.data["voting_open"][cls._g(guild_id)] = bool(is_open)
-        cls.save()
+        gid = cls._g(guild_id)
+        cls.data["voting_open"][gid] = bool(is_open)
+        cls._mark_dirty(gid)
+        if not is_open:
+            bus.publish(VotingClosed(_event_id(gid)))
 
     @classmethod
     def is_voting_open(cls, guild_id: int) -> bool:
@@ -213,7 +713,7 @@ class Storage:
     @classmethod
     def set_gm_vote_message(cls, guild_id: int, message_id: int) -> None:
         cls.data["gm_vote_message_id"][cls._g(guild_id)] = int(message_id)
-        cls.save()
+        cls._mark_dirty(cls._g(guild_id))
 
     # ---------- night actions (占い/狩人) ----------
     @classmethod
@@ -228,7 +728,18 @@ class Storage:
             ga[role_key].pop(voter_ho, None)
         else:
             ga[role_key][voter_ho] = target_ho
-        cls.save()
+        cls._night_changed(gid)
+        cls._mark_dirty(cls._g(guild_id))
+        bus.publish(NightActionRecorded(_event_id(gid), role_key, voter_ho, target_ho))
+
+    @classmethod
+    def set_night_action_if_absent(cls, guild_id: int, role: str, voter_ho: str, target_ho: str) -> bool:
+        """未確定のときだけ記録して True（確認と記録の間に await を挟まない）"""
+        gid = cls._g(guild_id)
+        if cls.data.get("night_actions", {}).get(gid, {}).get(str(role), {}).get(voter_ho):
+            return False
+        cls.set_night_action(guild_id, role, voter_ho, target_ho)
+        return True
 
     @classmethod
     def get_night_actions(cls, guild_id: int) -> Dict[str, Dict[str, Optional[str]]]:
@@ -242,7 +753,128 @@ class Storage:
         gid = cls._g(guild_id)
         cls.data.setdefault("night_actions", {})
         cls.data["night_actions"][gid] = {}
-        cls.save()
+        cls._night_changed(gid)
+        cls._mark_dirty(cls._g(guild_id))
+
+    @classmethod
+    def _night_changed(cls, gid: str) -> None:
+        cls._night_versions[gid] = cls._night_versions.get(gid, 0) + 1
+
+    @classmethod
+    def night_version(cls, guild_id: int) -> int:
+        """夜アクション/狂人/逆回転が変わるたびに増える番号（夜の判定キャッシュ用）"""
+        return cls._night_versions.get(cls._g(guild_id), 0)
+
+    # ---------- game log ----------
+    @classmethod
+    def game_log_key(cls, guild_id: int) -> str:
+        """現在のゲームのログキー（無ければ発行）"""
+        gid = cls._g(guild_id)
+        key = cls.data["game_log_id"].get(gid)
+        if key is None:
+            key = f"{gid}-{int(time.time())}"
+            cls.data["game_log_id"][gid] = key
+            cls._mark_dirty(gid)
+        return key
+
+    # ---------- provision checkpoint ----------
+    @classmethod
+    def get_provision(cls, guild_id: int) -> Json:
+        """締め切り処理（ロール作成/付与・チャンネル作成）の完了済み手順"""
+        cp = cls.data["provision"].get(cls._g(guild_id)) or {}
+        return {kind: dict(cp.get(kind) or {}) for kind in ("roles", "grants", "channels")}
+
+    @classmethod
+    def checkpoint_provision(cls, guild_id: int, kind: str, key: str, value: Any) -> None:
+        """手順 1 件の完了を記録（value=None で取り消し）"""
+        gid = cls._g(guild_id)
+        done = cls.data["provision"].setdefault(gid, {}).setdefault(kind, {})
+        if value is None:
+            if done.pop(str(key), None) is None:
+                return
+        elif done.get(str(key)) == value:
+            return
+        else:
+            done[str(key)] = value
+        cls._mark_dirty(gid)
+
+    # ---------- guild config ----------
+    @classmethod
+    def get_guild_config(cls, guild_id: int) -> Json:
+        """ロール/カテゴリ/チャンネルの名前の上書きと、解決済みの ID"""
+        cfg = cls.data["guild_config"].get(cls._g(guild_id)) or {}
+        return {kind: dict(cfg.get(kind) or {}) for kind in ("names", "ids")}
+
+    @classmethod
+    def set_guild_config(cls, guild_id: int, kind: str, key: str, value: Any) -> None:
+        """kind（"names" / "ids"）の key を value にする（None で削除）"""
+        gid = cls._g(guild_id)
+        if value is None:
+            cfg = cls.data["guild_config"].get(gid) or {}
+            if (cfg.get(kind) or {}).pop(key, None) is None:
+                return
+            if not cfg[kind]:
+                cfg.pop(kind)
+            if not cfg:
+                cls.data["guild_config"].pop(gid, None)
+        else:
+            entries = cls.data["guild_config"].setdefault(gid, {}).setdefault(kind, {})
+            if entries.get(key) == value:
+                return
+            entries[key] = value
+        cls._mark_dirty(gid)
+
+    # ---------- tables ----------
+    @classmethod
+    def get_tables(cls, guild_id: int) -> List[int]:
+        """追加した卓の番号（卓 1 は含まない）"""
+        return sorted(int(n) for n in cls.data["tables"].get(cls._g(guild_id), []))
+
+    @classmethod
+    def set_table(cls, guild_id: int, number: int, exists: bool) -> None:
+        gid = cls._g(guild_id)
+        numbers = set(cls.get_tables(guild_id))
+        if (int(number) in numbers) == exists:
+            return
+        numbers = numbers | {int(number)} if exists else numbers - {int(number)}
+        if numbers:
+            cls.data["tables"][gid] = sorted(numbers)
+        else:
+            cls.data["tables"].pop(gid, None)
+        cls._mark_dirty(gid)
+
+    # ---------- rotation ----------
+    @classmethod
+    def get_rotation(cls, guild_id: int) -> Optional[Json]:
+        r = cls.data["rotation"].get(cls._g(guild_id))
+        return copy.deepcopy(r) if r is not None else None
+
+    @classmethod
+    def set_rotation(cls, guild_id: int, rotation: Json) -> None:
+        gid = cls._g(guild_id)
+        cls.data["rotation"][gid] = copy.deepcopy(rotation)
+        cls._night_changed(gid)
+        cls._mark_dirty(gid)
+
+    # ---------- madman ----------
+    @classmethod
+    def get_madman(cls, guild_id: int) -> Optional[str]:
+        return cls.data["madman"].get(cls._g(guild_id))
+
+    @classmethod
+    def set_madman(cls, guild_id: int, ho: Optional[str]) -> None:
+        """狂人の HO を記録（None で解除）"""
+        gid = cls._g(guild_id)
+        previous = cls.data["madman"].get(gid)
+        if ho is None:
+            cls.data["madman"].pop(gid, None)
+        else:
+            cls.data["madman"][gid] = str(ho)
+        if previous == ho:
+            return
+        cls._night_changed(gid)
+        cls._mark_dirty(gid)
+        bus.publish(NightActionRecorded(_event_id(gid), "狂人", str(ho or previous), ho))
 
     @classmethod
     def get_gm_vote_message(cls, guild_id: int) -> Optional[int]:
@@ -252,7 +884,7 @@ class Storage:
     @classmethod
     def set_dashboard_message(cls, guild_id: int, message_id: int) -> None:
         cls.data["dashboard_message_id"][cls._g(guild_id)] = int(message_id)
-        cls.save()
+        cls._mark_dirty(cls._g(guild_id))
 
     @classmethod
     def get_dashboard_message(cls, guild_id: int) -> Optional[int]:
@@ -268,4 +900,66 @@ class Storage:
         gid = cls._g(guild_id)
         cls.data.setdefault("spirit_reverse_used", {})
         cls.data["spirit_reverse_used"][gid] = bool(used)
-        cls.save()
+        cls._night_changed(gid)
+        cls._mark_dirty(cls._g(guild_id))
+
+    @classmethod
+    def claim_spirit_reverse(cls, guild_id: int) -> bool:
+        """未使用なら使用済みにして True、既に使用済みなら False"""
+        if cls.is_spirit_reverse_used(guild_id):
+            return False
+        cls.set_spirit_reverse_used(guild_id, True)
+        return True
+
+    # ---------- timers ----------
+    @classmethod
+    def add_timer(cls, guild_id: int, timer: Json) -> str:
+        gid = cls._g(guild_id)
+        timers = cls.data["timers"].setdefault(gid, {})
+        tid = uuid.uuid4().hex[:6]
+        while tid in timers:
+            tid = uuid.uuid4().hex[:6]
+        timers[tid] = dict(timer)
+        cls._mark_dirty(gid)
+        return tid
+
+    @classmethod
+    def get_timer(cls, guild_id: int, timer_id: str) -> Optional[Json]:
+        t = cls.data["timers"].get(cls._g(guild_id), {}).get(timer_id)
+        return dict(t) if t is not None else None
+
+    @classmethod
+    def get_timers(cls, guild_id: int) -> Dict[str, Json]:
+        return {tid: dict(t) for tid, t in cls.data["timers"].get(cls._g(guild_id), {}).items()}
+
+    @classmethod
+    def update_timer(cls, guild_id: int, timer_id: str, **fields: Any) -> None:
+        gid = cls._g(guild_id)
+        t = cls.data["timers"].get(gid, {}).get(timer_id)
+        if t is not None:
+            t.update(fields)
+            cls._mark_dirty(gid)
+
+    @classmethod
+    def remove_timer(cls, guild_id: int, timer_id: str) -> Optional[Json]:
+        """削除して中身を返す（既に無ければ None）"""
+        gid = cls._g(guild_id)
+        timers = cls.data["timers"].get(gid)
+        if not timers or timer_id not in timers:
+            return None
+        t = timers.pop(timer_id)
+        if not timers:
+            cls.data["timers"].pop(gid, None)
+        cls._mark_dirty(gid)
+        return t
+
+    # ---------- scenario ----------
+    @classmethod
+    def get_scenario(cls, guild_id: int) -> Optional[str]:
+        return cls.data["scenario"].get(cls._g(guild_id))
+
+    @classmethod
+    def set_scenario(cls, guild_id: int, scenario_id: str) -> None:
+        gid = cls._g(guild_id)
+        cls.data["scenario"][gid] = str(scenario_id)
+        cls._mark_dirty(gid)
@@ -0,0 +1,55 @@
+import copy
+import os
+import sys
+import threading
+from typing import Dict, List, Optional
+
+import pytest
+
+# リポジトリ直下のモジュール（storage, utils, backends）を import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends.base import Backend, Json  # noqa: E402
+from storage import Storage  # noqa: E402
+
+
+class SlowBackend(Backend):
+    """save_guilds が release されるまで止まるメモリ上のバックエンド"""
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self.docs: Dict[str, Json] = {}
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def load_index(self) -> List[str]:
+        return list(self.docs)
+
+    def load_guild(self, gid: str) -> Optional[Json]:
+        return copy.deepcopy(self.docs.get(gid))
+
+    def save_guilds(self, docs: Dict[str, Json]) -> None:
+        self.started.set()
+        assert self.release.wait(5)
+        self.docs.update(copy.deepcopy(docs))
+
+    def delete_guild(self, gid: str) -> None:
+        self.docs.pop(gid, None)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    backend = SlowBackend()
+    fresh = {
+        "_store": backend, "_loaded": False, "_dirty": set(), "_writing": set(), "_index": set(),
+        "_inflight": {}, "_last_access": {}, "_flush_lock": None, "_flush_task": None,
+        "_shrink_task": None, "_size_stale": set(), "_max_guilds": 2, "_max_bytes": 1 << 30,
+        "_participant_views": {}, "_participant_ho_index": {}, "_participant_versions": {},
+        "_participant_listeners": [], "_night_versions": {},
+        "_cache_stats": {"hits": 0, "misses": 0, "evictions": 0, "writebacks": 0},
+    }
+    for name, value in fresh.items():
+        monkeypatch.setattr(Storage, name, value)
+    monkeypatch.setattr(Storage, "data", {s: {} for s in Storage.SECTIONS})
+    return backend
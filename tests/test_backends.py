@@ -0,0 +1,99 @@
+"""ファイル / SQLite バックエンドの保存と読み込み"""
+import pytest
+
+from backends.codec import Codec, available_codecs
+from backends.file import FileBackend
+from backends.sqlite import SqliteBackend
+
+
+def test_file_log_round_trip(tmp_path):
+    store = FileBackend(str(tmp_path / "data.json"))
+    store.append_log("1:2-100", ["a", "b", "c"])
+    assert [line for batch in store.iter_log("1:2-100", chunk=2) for line in batch] == ["a", "b", "c"]
+    assert list(store.iter_log("1-200")) == []
+
+
+@pytest.mark.parametrize("key", ["1-../../x", "../x", "1-a/b", "..", ""])
+def test_file_log_key_cannot_leave_the_log_directory(tmp_path, key):
+    store = FileBackend(str(tmp_path / "data.json"))
+    with pytest.raises(ValueError):
+        list(store.iter_log(key))
+    with pytest.raises(ValueError):
+        store.append_log(key, ["x"])
+
+
+def sample(day: int = 1) -> dict:
+    return {
+        "game": {"day": day, "phase": "night"},
+        "voting_open": True,
+        "spirit_reverse_used": False,
+        "participants": [{"id": 11, "name": "a", "ho": "HO1"}, {"id": 12, "name": "b", "ho": "HO2"}],
+        "night_actions": {"占い": {"HO1": "HO2"}, "狩人": {"HO2": None}},
+        "votes": {"HO1": "HO2", "HO2": None},
+        "dashboard_message_id": 555,
+        "rotation": {"base": {"HO1": "占い"}},
+    }
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = str(tmp_path / "data.db")
+    store = SqliteBackend(path)
+    store.save_guilds({"1": sample(), "2": {"game": {"day": 3, "phase": "day"}}})
+    doc = sample()
+    doc["participants"].reverse()
+    doc["participants"].append({"id": 13, "name": "c", "ho": None})
+    doc["night_actions"]["占い"]["HO1"] = "HO1"
+    del doc["night_actions"]["狩人"]
+    doc["votes"].pop("HO2")
+    del doc["dashboard_message_id"]
+    doc["rotation"] = {"base": {"HO2": "狩人"}}
+    store.save_guilds({"1": doc})
+    store.append_log("1-100", ["a", "b", "c"])
+    store.close()
+
+    # 別の接続（差分の基準なし）からも同じ内容で読める
+    other = SqliteBackend(path)
+    assert sorted(other.load_index()) == ["1", "2"]
+    assert other.load_guilds(["1", "2", "3"]) == {"1": doc, "2": {"game": {"day": 3, "phase": "day"}}}
+    assert [line for batch in other.iter_log("1-100", chunk=2) for line in batch] == ["a", "b", "c"]
+    other.delete_guild("1")
+    assert other.load_index() == ["2"]
+    assert other.load_guild("1") is None
+    # ログはリセットでは消さない
+    assert list(other.iter_log("1-100")) == [["a", "b", "c"]]
+    other.close()
+
+
+def test_sqlite_invalidation_drops_the_diff_base(tmp_path):
+    path = str(tmp_path / "data.db")
+    mine, theirs = SqliteBackend(path), SqliteBackend(path)
+    mine.save_guilds({"1": sample()})
+    assert theirs.load_guild("1") == sample()
+    theirs.save_guilds({"1": sample(2)})
+    theirs.publish_invalidation(["1"])
+    mine.publish_invalidation(["1"])
+    # 自分の通知は無視し、他プロセスの通知では基準を捨てる
+    assert mine._poll() == ["1"]
+    assert "1" not in mine._saved and mine._poll() == []
+    # 基準が無いので全行を書き直し、相手の書き込みと混ざらない
+    doc = sample(3)
+    doc["participants"].pop()
+    mine.save_guilds({"1": doc})
+    assert theirs.load_guild("1") == doc
+    mine.close()
+    theirs.close()
+
+
+@pytest.mark.parametrize("name", available_codecs())
+@pytest.mark.parametrize("compress", [False, True])
+def test_codec_round_trip(name, compress):
+    codec = Codec(name, compress)
+    doc = {"participants": {"1": [{"id": 11, "name": "あ", "ho": "HO1"}]}, "day": 2}
+    assert Codec.decode(codec.encode(doc)) == doc
+    assert Codec.decode_text(codec.encode_text(doc)) == doc
+
+
+def test_unavailable_codec_fails_loudly():
+    # 黙って json にしない
+    with pytest.raises(ValueError):
+        Codec.from_env("no-such-codec", None)
@@ -0,0 +1,114 @@
+"""夜の判定（utils/night.py）の性質をランダムなゲームで確かめる"""
+import random
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import pytest
+
+from utils.night import ABILITY_ROLES, ATTACK, MADMAN, build_rule_table, resolve
+
+SEEDS = range(300)
+
+Actions = Dict[str, Dict[str, Optional[str]]]
+
+
+def random_game(rnd: random.Random) -> Tuple[List[str], FrozenSet[str], FrozenSet[str], Optional[str], bool, Actions]:
+    """(HO, 人狼, 回転しない HO, 狂人, 逆回転, 夜アクション)"""
+    hos = [f"HO{i}" for i in range(1, rnd.randint(4, 14) + 1)]
+    wolves = frozenset(rnd.sample(hos, rnd.randint(1, min(3, len(hos) - 1))))
+    villagers = [h for h in hos if h not in wolves]
+    parents = rnd.sample(villagers, rnd.choice([0, 0, 2]) if len(villagers) > 3 else 0)
+    fixed = wolves | frozenset(parents)
+    madman = rnd.choice([None, *villagers])
+    actions: Actions = {}
+    for role in ABILITY_ROLES:
+        for voter in rnd.sample(villagers, rnd.randint(0, min(2, len(villagers)))):
+            actions.setdefault(role, {})[voter] = rnd.choice([None, *[h for h in hos if h != voter]])
+    # 襲撃はたいてい村人を狙うが、まれに人狼への無効な襲撃も混ぜる
+    for wolf in rnd.sample(sorted(wolves), rnd.randint(0, len(wolves))):
+        actions.setdefault(ATTACK, {})[wolf] = rnd.choice([None, *villagers, *villagers, rnd.choice(sorted(wolves))])
+    return hos, wolves, fixed, madman, rnd.random() < 0.5, actions
+
+
+def shuffled(rnd: random.Random, actions: Actions) -> Actions:
+    out: Actions = {}
+    for role in rnd.sample(list(actions), len(actions)):
+        items = list(actions[role].items())
+        rnd.shuffle(items)
+        out[role] = dict(items)
+    return out
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_resolve_is_deterministic(seed):
+    rnd = random.Random(seed)
+    hos, wolves, fixed, madman, reversed_, actions = random_game(rnd)
+    table = build_rule_table(hos, wolves, fixed, madman, reversed_)
+    # HO の並びや夜アクションの記録順が違っても同じ表・同じ結果になる
+    assert build_rule_table(rnd.sample(hos, len(hos)), wolves, fixed, madman, reversed_) == table
+    result = resolve(table, actions)
+    assert resolve(table, actions) == result
+    assert resolve(table, shuffled(rnd, actions)) == result
+
+
+def cursed_users(actions: Actions, madman: Optional[str]) -> set:
+    """狂人に能力を使った能力者（狂人ルールで死亡する。護衛の対象外）"""
+    return {
+        voter
+        for role in ABILITY_ROLES
+        for voter, target in (actions.get(role) or {}).items()
+        if madman and target == madman and voter != madman
+    }
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_protected_targets_never_die(seed):
+    hos, wolves, fixed, madman, reversed_, actions = random_game(random.Random(seed))
+    result = resolve(build_rule_table(hos, wolves, fixed, madman, reversed_), actions)
+    dead = {ho for ho, _ in result.deaths}
+    cursed = cursed_users(actions, madman)
+    guarded = {target for _, target in result.protected}
+    # 狩人が護衛した HO は、自分が狂人ルールに掛からない限り死なない
+    assert not (guarded - cursed) & dead
+    # 護衛されていない村人への襲撃は必ず死亡、人狼への襲撃は無効
+    attacked = {t for t in (actions.get(ATTACK) or {}).values() if t}
+    assert (attacked - wolves - guarded) <= dead
+    assert not (attacked & wolves) & dead
+    assert set(result.guarded) == (attacked - wolves) & guarded
+    # それ以外の理由では死なない
+    assert dead <= cursed | (attacked - wolves - guarded)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_fixed_hos_do_not_rotate(seed):
+    hos, wolves, fixed, madman, _, actions = random_game(random.Random(seed))
+    forward = build_rule_table(hos, wolves, fixed, madman, False)
+    backward = build_rule_table(hos, wolves, fixed, madman, True)
+    for table in (forward, backward):
+        # 人狼・親子などは輪に入らず、役職も翌朝そのまま
+        assert not fixed & (set(table.next_seat) | set(table.next_seat.values()))
+        for role, ho, nxt in resolve(table, actions).rotation:
+            if ho in fixed:
+                assert nxt == ho
+    # 逆回転は順回転のちょうど逆向き
+    assert {nxt: ho for ho, nxt in forward.next_seat.items()} == backward.next_seat
+
+
+def test_madman_rule_marks_the_ability_user():
+    table = build_rule_table(["HO1", "HO2", "HO3", "HO4"], frozenset({"HO1"}), frozenset({"HO1"}), madman="HO3")
+    result = resolve(table, {"占い": {"HO2": "HO3"}, "狩人": {"HO4": "HO1"}})
+    assert result.seer == (("HO2", "HO3", False),)
+    assert result.protected == (("HO4", "HO1"),)
+    assert [ho for ho, _ in result.deaths] == ["HO2"]
+    assert (MADMAN, "HO3", "HO4") in result.rotation
+
+
+def test_knight_guards_the_attacked_target():
+    table = build_rule_table(["HO1", "HO2", "HO3", "HO4"], frozenset({"HO1"}), frozenset({"HO1"}))
+    actions = {"狩人": {"HO4": "HO2"}, ATTACK: {"HO1": "HO2"}}
+    result = resolve(table, actions)
+    assert result.deaths == ()
+    assert result.guarded == ("HO2",)
+    # 護衛先が外れれば襲撃先は死亡する
+    result = resolve(table, {"狩人": {"HO4": "HO3"}, ATTACK: {"HO1": "HO2"}})
+    assert result.deaths == (("HO2", "人狼に襲撃された"),)
+    assert result.guarded == ()
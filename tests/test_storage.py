@@ -0,0 +1,63 @@
+"""Storage のメモリ上限（LRU）と書き込みの競合"""
+import asyncio
+
+import pytest
+
+from storage import GuildNotLoaded, Storage
+
+
+def test_guild_being_written_is_not_evicted(store):
+    async def scenario() -> None:
+        await Storage.ensure_loaded()
+        Storage.add_participant(1, {"id": 11, "name": "a"})
+        # guild 1 の書き込みが止まっている間に他のギルドで上限（2）を超える
+        await asyncio.to_thread(store.started.wait, 5)
+        assert "1" in Storage._writing
+        Storage.add_participant(2, {"id": 21, "name": "b"})
+        Storage.add_participant(3, {"id": 31, "name": "c"})
+        assert "1" in Storage._resident
+        # 書き込み中の変更は書き込み後のメモリ上の状態に積まれる（古い保存内容を読み直さない）
+        Storage.add_participant(1, {"id": 12, "name": "d"})
+        store.release.set()
+        await Storage.flush()
+        assert not Storage._writing
+        assert [p["id"] for p in store.docs["1"]["participants"]] == [11, 12]
+
+        # 追い出されたあとに読み直しても最新の状態になる
+        Storage._drop("1")
+        await Storage.ensure_guild_loaded(1)
+        assert [p["id"] for p in Storage.get_participants(1)] == [11, 12]
+
+    asyncio.run(scenario())
+
+
+def test_unloaded_guild_is_not_read_synchronously(store):
+    store.docs["5"] = {"participants": [{"id": 51, "name": "e", "ho": None}]}
+    store.release.set()
+
+    async def scenario() -> None:
+        await Storage.ensure_loaded()
+        # 同期アクセスはイベントループを止めて読み込まず、エラーにする
+        with pytest.raises(GuildNotLoaded):
+            Storage.get_participants(5)
+        await Storage.ensure_guild_loaded(5)
+        assert [p["id"] for p in Storage.get_participants(5)] == [51]
+
+    asyncio.run(scenario())
+
+
+def test_cache_hits_are_counted_per_load(store):
+    store.docs["7"] = {"participants": [{"id": 71, "name": "f", "ho": None}]}
+    store.release.set()
+
+    async def scenario() -> None:
+        await Storage.ensure_loaded()
+        await Storage.ensure_guild_loaded(7)
+        # 1 つのハンドラ内の何度ものアクセスはヒットに数えない
+        for _ in range(5):
+            Storage.get_participants(7)
+        await Storage.ensure_guild_loaded(7)
+        stats = Storage.cache_stats()
+        assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+    asyncio.run(scenario())
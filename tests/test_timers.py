@@ -0,0 +1,128 @@
+"""フェーズ進行タイマー（utils/timers.py の TimerWheel と /schedule の時刻指定）"""
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+import cogs.phase_timer as phase_timer
+from storage import Storage
+from utils.timers import TIMER_MAX_LATE, TimerWheel
+
+GID = 1
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.fired: list = []
+        self.expired: list = []
+
+    async def on_fire(self, guild_id, timer_id, timer, late):
+        self.fired.append(timer_id)
+
+    async def on_countdown(self, guild_id, timer_id, timer, remaining):
+        pass
+
+    async def on_expire(self, guild_id, timer_id, timer, late):
+        self.expired.append(timer_id)
+
+
+def run_wheel(store, scenario):
+    store.release.set()
+
+    async def main() -> None:
+        await Storage.ensure_loaded()
+        wheel, calls = TimerWheel(), Recorder()
+        wheel.start(calls.on_fire, calls.on_countdown, calls.on_expire)
+        try:
+            await scenario(wheel, calls)
+        finally:
+            wheel.stop()
+
+    asyncio.run(main())
+
+
+def add_timer(due: float) -> str:
+    return Storage.add_timer(GID, {"action": "next_day", "due": due, "day": 1})
+
+
+def test_late_timers_fire_until_max_late_then_expire(store):
+    async def scenario(wheel, calls) -> None:
+        now = time.time()
+        on_time = add_timer(now - (TIMER_MAX_LATE - 5))
+        too_late = add_timer(now - (TIMER_MAX_LATE + 5))
+        wheel.arm(GID, on_time, Storage.get_timer(GID, on_time))
+        wheel.arm(GID, too_late, Storage.get_timer(GID, too_late))
+        await asyncio.sleep(0.1)
+        assert (calls.fired, calls.expired) == ([on_time], [too_late])
+        # どちらも一度きりでストレージから消える
+        assert Storage.get_timers(GID) == {}
+        assert wheel.pending() == 0
+
+        # ちょうど TIMER_MAX_LATE 遅れは発火、それを超えたら期限切れ
+        exact, over = add_timer(now), add_timer(now)
+        await wheel._fire(GID, exact, TIMER_MAX_LATE)
+        await wheel._fire(GID, over, TIMER_MAX_LATE + 0.001)
+        assert (calls.fired[-1], calls.expired[-1]) == (exact, over)
+
+    run_wheel(store, scenario)
+
+
+def test_disarmed_timer_never_fires(store):
+    async def scenario(wheel, calls) -> None:
+        tid = add_timer(time.time() + 0.05)
+        wheel.arm(GID, tid, Storage.get_timer(GID, tid))
+        wheel.disarm(GID, tid)
+        # ストレージから取り消されたタイマーも、ヒープに残ったエントリでは発火しない
+        cancelled = add_timer(time.time() + 0.05)
+        wheel.arm(GID, cancelled, Storage.get_timer(GID, cancelled))
+        Storage.remove_timer(GID, cancelled)
+        await asyncio.sleep(0.3)
+        assert (calls.fired, calls.expired) == ([], [])
+        assert wheel.pending() == 0
+
+    run_wheel(store, scenario)
+
+
+def test_rescheduled_timer_fires_once_at_the_new_due(store):
+    async def scenario(wheel, calls) -> None:
+        tid = add_timer(time.time() + 0.05)
+        wheel.arm(GID, tid, Storage.get_timer(GID, tid))
+        Storage.update_timer(GID, tid, due=time.time() + 0.6)
+        wheel.arm(GID, tid, Storage.get_timer(GID, tid))
+        # 古い期限のエントリでは発火しない（新しい期限はまとめ処理の幅 0.25 秒以内の誤差で発火）
+        await asyncio.sleep(0.2)
+        assert calls.fired == []
+        await asyncio.sleep(0.6)
+        assert calls.fired == [tid]
+
+    run_wheel(store, scenario)
+
+
+def fixed_now(monkeypatch, hour: int, minute: int) -> datetime:
+    now = datetime(2026, 3, 31, hour, minute, 30, tzinfo=phase_timer.TIMER_TZ)
+
+    class FixedDateTime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    monkeypatch.setattr(phase_timer, "datetime", FixedDateTime)
+    return now
+
+
+def test_parse_at_rolls_over_to_the_next_day(monkeypatch):
+    fixed_now(monkeypatch, 22, 30)
+    tz = phase_timer.TIMER_TZ
+    assert phase_timer._parse_at("23:15") == datetime(2026, 3, 31, 23, 15, tzinfo=tz).timestamp()
+    # 過ぎた時刻（同じ分を含む）は翌日。月末もまたぐ
+    assert phase_timer._parse_at("21:00") == datetime(2026, 4, 1, 21, 0, tzinfo=tz).timestamp()
+    assert phase_timer._parse_at("22:30") == datetime(2026, 4, 1, 22, 30, tzinfo=tz).timestamp()
+    assert phase_timer._parse_at(" 0:05 ") == datetime(2026, 4, 1, 0, 5, tzinfo=tz).timestamp()
+
+
+@pytest.mark.parametrize("at", ["", "21", "21:", "21:0", "21:00:00", "25:00", "21:60", "-1:00", "+9:00", "９:ab", "21.00"])
+def test_parse_at_rejects_malformed_input(monkeypatch, at):
+    fixed_now(monkeypatch, 12, 0)
+    with pytest.raises(ValueError):
+        phase_timer._parse_at(at)
@@ -0,0 +1,229 @@
+"""Upstash バックエンド（ハッシュ形式）を REST のフェイクで確かめる"""
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+import backends.upstash as upstash
+from backends.codec import Codec
+from backends.upstash import UpstashBackend
+
+URL = "https://kv.example"
+KEY = "werewolf:data"
+
+
+class FakeResponse:
+    def __init__(self, body: Any, status_code: int = 200) -> None:
+        self.body = body
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+    def json(self) -> Any:
+        return self.body
+
+
+class FakeRedis:
+    """Upstash の REST（/ ・/pipeline ・/multi-exec）を受けるメモリ上の Redis"""
+
+    def __init__(self) -> None:
+        self.strings: Dict[str, str] = {}
+        self.hashes: Dict[str, Dict[str, str]] = {}
+        self.sets: Dict[str, set] = {}
+        self.lists: Dict[str, List[str]] = {}
+        # 受け取ったリクエスト（path, [コマンド...]）
+        self.requests: List[tuple] = []
+
+    def post(self, url: str, headers: Dict[str, str], json: Any, timeout: float) -> FakeResponse:
+        assert headers["Authorization"] == "Bearer token"
+        path = url[len(URL):]
+        if path == "":
+            self.requests.append((path, [json]))
+            return FakeResponse({"result": self.run(json)})
+        assert path in ("/pipeline", "/multi-exec")
+        self.requests.append((path, json))
+        return FakeResponse([{"result": self.run(cmd)} for cmd in json])
+
+    def _stores(self) -> List[Dict[str, Any]]:
+        return [self.strings, self.hashes, self.sets, self.lists]
+
+    def run(self, cmd: List[str]) -> Any:
+        op, *args = cmd
+        if op == "GET":
+            return self.strings.get(args[0])
+        if op == "SET":
+            self.strings[args[0]] = args[1]
+            return "OK"
+        if op == "DEL":
+            return sum(1 for k in args for store in self._stores() if store.pop(k, None) is not None)
+        if op == "EXISTS":
+            return sum(1 for k in args if any(k in store for store in self._stores()))
+        if op == "HSET":
+            h = self.hashes.setdefault(args[0], {})
+            h.update(zip(args[1::2], args[2::2]))
+            return len(args[1:]) // 2
+        if op == "HDEL":
+            h = self.hashes.get(args[0], {})
+            removed = sum(1 for f in args[1:] if h.pop(f, None) is not None)
+            if not h:
+                self.hashes.pop(args[0], None)
+            return removed
+        if op == "HGETALL":
+            return [x for item in self.hashes.get(args[0], {}).items() for x in item]
+        if op == "SADD":
+            self.sets.setdefault(args[0], set()).update(args[1:])
+            return len(args) - 1
+        if op == "SREM":
+            s = self.sets.get(args[0], set())
+            s.difference_update(args[1:])
+            if not s:
+                self.sets.pop(args[0], None)
+            return len(args) - 1
+        if op == "SMEMBERS":
+            return sorted(self.sets.get(args[0], set()))
+        if op == "SCARD":
+            return len(self.sets.get(args[0], set()))
+        if op == "RPUSH":
+            self.lists.setdefault(args[0], []).extend(args[1:])
+            return len(self.lists[args[0]])
+        if op == "LRANGE":
+            items = self.lists.get(args[0], [])
+            return items[int(args[1]):int(args[2]) + 1]
+        if op == "PUBLISH":
+            return 0
+        raise AssertionError(f"unexpected command {op}")
+
+    def writes(self) -> List[List[str]]:
+        """/multi-exec で送られた書き込みコマンド"""
+        return [cmd for path, cmds in self.requests if path == "/multi-exec" for cmd in cmds]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(upstash.requests, "post", fake.post)
+    return fake
+
+
+def backend() -> UpstashBackend:
+    return UpstashBackend(URL, "token", KEY)
+
+
+def sample(day: int = 1) -> Dict[str, Any]:
+    return {
+        "game": {"day": day, "phase": "night"},
+        "voting_open": True,
+        "participants": [{"id": 11, "name": "a", "ho": "HO1"}, {"id": 12, "name": "b", "ho": "HO2"}],
+        "night_actions": {"占い": {"HO1": "HO2"}, "狩人": {"HO2": None}},
+        "votes": {"HO1": "HO2", "HO2": None},
+        "dashboard_message_id": 555,
+        "rotation": {"base": {"HO1": "占い"}},
+    }
+
+
+def hash_of(redis: FakeRedis, gid: str, part: str) -> Dict[str, str]:
+    return redis.hashes.get(f"{KEY}:guild:{gid}:{part}", {})
+
+
+def test_save_and_load_round_trip(redis):
+    store = backend()
+    store.save_guilds({"1": sample(), "2": {"game": {"day": 3, "phase": "day"}}})
+    assert hash_of(redis, "1", "ho") == {"HO1": "11", "HO2": "12"}
+    # 別プロセス（差分の基準なし）からも同じ内容で読める
+    other = backend()
+    assert sorted(other.load_index()) == ["1", "2"]
+    assert other.load_guilds(["1", "2", "3"]) == {"1": sample(), "2": {"game": {"day": 3, "phase": "day"}}}
+    assert other.load_guild("3") is None
+
+
+def test_only_changed_fields_are_written(redis):
+    store = backend()
+    store.save_guilds({"1": sample()})
+    redis.requests.clear()
+    doc = sample()
+    doc["participants"][1]["name"] = "b2"
+    doc["night_actions"]["占い"]["HO1"] = "HO1"
+    del doc["night_actions"]["狩人"]
+    doc["votes"].pop("HO2")
+    store.save_guilds({"1": doc})
+    part = f"{KEY}:guild:1"
+    assert redis.writes() == [
+        ["HSET", f"{part}:participants", "12", json.dumps({"seq": 1, "name": "b2", "ho": "HO2"}, ensure_ascii=False, separators=(",", ":"))],
+        ["HSET", f"{part}:night:占い", "HO1", "HO1"],
+        ["HDEL", f"{part}:night:狩人", "HO2"],
+        ["SREM", f"{part}:night", "狩人"],
+        ["HDEL", f"{part}:votes", "HO2"],
+        ["SADD", f"{KEY}:guilds", "1"],
+    ]
+    assert backend().load_guild("1") == doc
+    # 変化が無ければ索引の SADD だけ
+    redis.requests.clear()
+    store.save_guilds({"1": doc})
+    assert redis.writes() == [["SADD", f"{KEY}:guilds", "1"]]
+
+
+def test_delete_guild_removes_every_key(redis):
+    store = backend()
+    store.save_guilds({"1": sample(), "2": sample(2)})
+    store.delete_guild("1")
+    assert not [k for store_ in redis._stores() for k in store_ if k.startswith(f"{KEY}:guild:1:")]
+    assert backend().load_index() == ["2"]
+    # 基準も捨てているので、同じギルドを書き直すと全体が入る
+    store.save_guilds({"1": sample(5)})
+    assert backend().load_guild("1") == sample(5)
+
+
+def legacy_blob(docs: Dict[str, Dict[str, Any]]) -> str:
+    data: Dict[str, Dict[str, Any]] = {}
+    for gid, doc in docs.items():
+        for section, value in doc.items():
+            data.setdefault(section, {})[gid] = value
+    return Codec().encode_text(data)
+
+
+def test_legacy_blob_is_split_and_deleted_atomically(redis):
+    redis.strings[KEY] = legacy_blob({"1": sample(), "2": sample(4)})
+    store = backend()
+    assert sorted(store.load_index()) == ["1", "2"]
+    assert KEY not in redis.strings
+    # 分割と旧値の削除は同じ MULTI/EXEC
+    [(path, cmds)] = [r for r in redis.requests if r[0] == "/multi-exec"]
+    assert ["DEL", KEY] in cmds and ["SADD", f"{KEY}:guilds", "1", "2"] in cmds
+    assert backend().load_guilds(["1", "2"]) == {"1": sample(), "2": sample(4)}
+
+
+def test_deleted_guilds_stay_deleted_after_migration(redis):
+    redis.strings[KEY] = legacy_blob({"1": sample()})
+    store = backend()
+    store.load_index()
+    store.delete_guild("1")
+    # 索引が空に戻っても、次の起動で旧値から復活しない
+    assert backend().load_index() == []
+    assert backend().load_guild("1") is None
+
+
+def test_stale_blob_next_to_an_index_is_removed(redis):
+    # 旧値を消さずに移行した版の残り
+    backend().save_guilds({"1": sample()})
+    redis.strings[KEY] = legacy_blob({"1": sample(9), "2": sample()})
+    assert backend().load_index() == ["1"]
+    assert KEY not in redis.strings
+    assert backend().load_guild("1") == sample()
+
+
+def test_legacy_guild_value_is_rewritten_as_hashes(redis):
+    redis.strings[f"{KEY}:guild:1"] = Codec().encode_text(sample())
+    redis.sets[f"{KEY}:guilds"] = {"1"}
+    store = backend()
+    assert store.legacy_guilds(["1"]) == ["1"]
+    assert store.migrate_guild("1") is True
+    assert f"{KEY}:guild:1" not in redis.strings
+    assert hash_of(redis, "1", "participants")
+    assert backend().load_guild("1") == sample()
+
+
+def test_logs_round_trip(redis):
+    store = backend()
+    store.append_log("1-1", [f"line{i}" for i in range(5)])
+    assert [line for batch in store.iter_log("1-1", chunk=2) for line in batch] == [f"line{i}" for i in range(5)]
+    assert list(store.iter_log("missing")) == []
+
@@ -0,0 +1,82 @@
+# tools/bench_codecs.py
+"""保存データのエンコード方式を比較するベンチマーク。
+
+実際のゲーム状態に近いデータ（14 人卓、夜アクション、メッセージID など）を
+指定ギルド数分生成し、方式ごとのサイズとエンコード/デコード時間を表示する。
+
+    python -m tools.bench_codecs --guilds 500
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Dict
+
+from backends.codec import Codec, available_codecs
+
+NAMES = ["たろう", "はなこ", "Sushi Lover", "まぐろ好き", "ikura", "タコさん", "GM見習い", "寿司職人"]
+
+
+def make_state(guilds: int, seed: int = 0) -> Dict[str, Any]:
+    rnd = random.Random(seed)
+    data: Dict[str, Dict[str, Any]] = {
+        s: {} for s in (
+            "participants", "game", "votes", "voting_open", "gm_vote_message_id",
+            "dashboard_message_id", "spirit_reverse_used", "night_actions",
+        )
+    }
+    for g in range(guilds):
+        gid = str(900000000000000000 + rnd.randrange(10**17))
+        players = [
+            {"id": 100000000000000000 + rnd.randrange(10**17), "name": f"{rnd.choice(NAMES)}{i}", "ho": f"HO{i + 1}"}
+            for i in range(14)
+        ]
+        hos = [p["ho"] for p in players]
+        data["participants"][gid] = players
+        data["game"][gid] = {"day": rnd.randint(0, 6), "phase": rnd.choice(["day", "night"])}
+        data["votes"][gid] = {}
+        data["voting_open"][gid] = False
+        data["gm_vote_message_id"][gid] = 1100000000000000000 + rnd.randrange(10**17)
+        data["dashboard_message_id"][gid] = 1100000000000000000 + rnd.randrange(10**17)
+        data["spirit_reverse_used"][gid] = rnd.random() < 0.3
+        data["night_actions"][gid] = {
+            "占い": {rnd.choice(hos): rnd.choice(hos)},
+            "狩人": {rnd.choice(hos): rnd.choice(hos)},
+        }
+    return data
+
+
+def bench(codec: Codec, state: Dict[str, Any], repeat: int) -> Dict[str, float]:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        raw = codec.encode(state)
+    t1 = time.perf_counter()
+    for _ in range(repeat):
+        decoded = Codec.decode(raw)
+    t2 = time.perf_counter()
+    assert decoded == state
+    return {"bytes": len(raw), "encode_ms": (t1 - t0) / repeat * 1000, "decode_ms": (t2 - t1) / repeat * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    state = make_state(args.guilds)
+    print(f"guilds={args.guilds} repeat={args.repeat} codecs={', '.join(available_codecs())}")
+    print(f"{'codec':<16}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}")
+    import json
+    legacy = json.dumps(state, ensure_ascii=False, indent=2).encode("utf-8")
+    print(f"{'legacy indent=2':<16}{len(legacy):>12}{'-':>12}{'-':>12}")
+    for name in available_codecs():
+        for compress in (False, True):
+            codec = Codec(name, compress)
+            r = bench(codec, state, args.repeat)
+            print(f"{codec.label:<16}{r['bytes']:>12}{r['encode_ms']:>12.2f}{r['decode_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# tools/bench_members.py
+"""メンバーキャッシュ方式（MEMBER_CACHE）ごとのメモリ量を比較するベンチマーク。
+
+指定人数の合成ギルド（GUILD_CREATE 相当のデータ）を discord.py の ConnectionState に読み込み、
+- full: 全メンバーをキャッシュ（起動時のチャンク読み込み後と同じ状態）
+- players: キャッシュなしで読み込み、参加者だけを GUILD_MEMBERS_CHUNK（query_members の応答）で追加
+のそれぞれで、読み込み後に残るメモリを tracemalloc で測る。接続はしない。
+
+    python -m tools.bench_members --members 100000 --players 14
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import tracemalloc
+from typing import Any, Dict, List
+
+import discord
+from discord.state import ChunkRequest, ConnectionState
+
+GUILD_ID = 900000000000000000
+PLAYER_ROLE_ID = GUILD_ID + 1
+
+
+def _member(i: int) -> Dict[str, Any]:
+    roles = [str(PLAYER_ROLE_ID)] if i % 1000 == 0 else [str(GUILD_ID + 2 + i % 8)]
+    return {
+        "user": {"id": str(100000000000000000 + i), "username": f"user{i}", "discriminator": "0", "global_name": f"ユーザー{i}", "avatar": None},
+        "roles": roles, "joined_at": "2024-01-01T00:00:00+00:00", "nick": None, "deaf": False, "mute": False, "flags": 0,
+    }
+
+
+def make_guild(members: int) -> Dict[str, Any]:
+    def role(rid: int, name: str, pos: int) -> Dict[str, Any]:
+        return {"id": str(rid), "name": name, "position": pos, "permissions": "0", "color": 0, "hoist": False, "managed": False, "mentionable": False}
+    roles = [role(GUILD_ID, "@everyone", 0), role(PLAYER_ROLE_ID, "PL", 1)]
+    roles += [role(GUILD_ID + 2 + i, f"role{i}", i + 2) for i in range(8)]
+    return {
+        "id": str(GUILD_ID), "name": "bench", "owner_id": "1", "member_count": members, "features": [], "premium_tier": 0,
+        "roles": roles, "channels": [], "emojis": [], "stickers": [], "members": [_member(i) for i in range(members)],
+    }
+
+
+def _state(flags: discord.MemberCacheFlags) -> ConnectionState:
+    intents = discord.Intents.default()
+    intents.members = True
+    return ConnectionState(dispatch=lambda *a, **k: None, handlers={}, hooks={}, http=None, intents=intents, member_cache_flags=flags)  # type: ignore[arg-type]
+
+
+def measure(mode: str, members: int, players: int) -> Dict[str, Any]:
+    data = make_guild(members)
+    chunk = data["members"][::max(1, members // max(1, players))][:players]
+    loop = asyncio.new_event_loop()
+    gc.collect()
+    tracemalloc.start()
+    flags = discord.MemberCacheFlags.all() if mode == "full" else discord.MemberCacheFlags.none()
+    state = _state(flags)
+    guild = discord.Guild(data=data, state=state)
+    state._add_guild(guild)
+    if mode == "players":
+        # query_members(user_ids=..., cache=True) の応答と同じ経路でキャッシュに載せる
+        request = ChunkRequest(guild.id, None, loop, state._get_guild, cache=True)
+        state._chunk_requests[request.nonce] = request
+        state.parse_guild_members_chunk({"guild_id": str(guild.id), "members": chunk, "nonce": request.nonce, "chunk_index": 0, "chunk_count": 1})  # type: ignore[typeddict-item]
+    del data, chunk
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    loop.close()
+    return {"mode": mode, "cached": len(guild.members), "current": current, "peak": peak}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--players", type=int, default=14)
+    args = parser.parse_args()
+
+    rows: List[Dict[str, Any]] = [measure(mode, args.members, args.players) for mode in ("full", "players")]
+    print(f"guild members={args.members}, players={args.players}")
+    print(f"{'mode':<8} {'cached':>8} {'retained':>12} {'peak':>12}")
+    for r in rows:
+        print(f"{r['mode']:<8} {r['cached']:>8} {r['current'] / 1024:>10.0f}KB {r['peak'] / 1024:>10.0f}KB")
+    full, players = rows
+    if players["current"]:
+        print(f"retained memory: {full['current'] / players['current']:.0f}x smaller with MEMBER_CACHE=players")
+
+
+if __name__ == "__main__":
+    main()
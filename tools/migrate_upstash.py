@@ -0,0 +1,54 @@
+# tools/migrate_upstash.py
+"""Upstash の保存データを旧形式（値 1 つ）からギルドごとのハッシュへ一括移行する。
+
+Bot も読み込み時に移行するが（backends/upstash.py）、このツールは全ギルドを起動前にまとめて移す。
+- {STORAGE_KEY} に全体を 1 つの値で保存した形式 → ギルドごとに分割
+- {STORAGE_KEY}:guild:<guild_id> にギルド全体を 1 つの値で保存した形式 → ハッシュへ書き直して削除
+接続先は Bot と同じ環境変数（UPSTASH_REDIS_REST_URL / UPSTASH_REDIS_REST_TOKEN / STORAGE_KEY /
+STORAGE_CODEC / STORAGE_COMPRESS）。何度実行しても同じ結果になる。
+
+    python -m tools.migrate_upstash --dry-run
+    python -m tools.migrate_upstash
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from backends.codec import Codec
+from backends.upstash import UpstashBackend
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="移行対象の数だけ表示して書き込まない")
+    args = parser.parse_args()
+
+    load_dotenv()
+    url = os.getenv("UPSTASH_REDIS_REST_URL", "")
+    token = os.getenv("UPSTASH_REDIS_REST_TOKEN", "")
+    if not url or not token:
+        sys.exit("UPSTASH_REDIS_REST_URL と UPSTASH_REDIS_REST_TOKEN を設定してください")
+    codec = Codec.from_env(os.getenv("STORAGE_CODEC"), os.getenv("STORAGE_COMPRESS"))
+    store = UpstashBackend(url, token, os.getenv("STORAGE_KEY", "werewolf:data"), codec)
+
+    if args.dry_run:
+        # load_index は全体の値を分割してしまうので、ここでは索引を直接読む
+        gids = [str(g) for g in (store.command("SMEMBERS", store._index_key) or [])]
+        legacy = store.legacy_guilds(gids) if gids else []
+        # 索引があるのに残っている全体の値は移行済みの残り（load_index で消える）
+        blob = ("stale" if gids else "yes") if store.command("EXISTS", store.key) else "no"
+        print(f"guilds={len(gids)} legacy guild values={len(legacy)} legacy whole value={blob}")
+        return
+
+    gids = store.load_index()
+    legacy = store.legacy_guilds(gids) if gids else []
+    rewritten = sum(store.migrate_guild(gid) for gid in legacy)
+    print(f"guilds={len(gids)} migrated={rewritten} removed stale values={len(legacy) - rewritten}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# tools/replay_game.py
+"""/export_game で取得したゲームログを再生し、任意の時点の状態を表示する（解説用）。
+
+ファイルは 1 行ずつ読むので、長いゲームでも全体をメモリに載せない。
+
+    python -m tools.replay_game 123456789-1700000000.jsonl            # 最終状態
+    python -m tools.replay_game 123456789-1700000000.jsonl --at 120   # 120 件目までを適用した状態
+    python -m tools.replay_game 123456789-1700000000.jsonl --timeline # イベント一覧
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Dict, Iterable, Optional
+
+
+def new_state() -> Dict[str, Any]:
+    return {
+        "offset": 0,
+        "day": 0,
+        "phase": "day",
+        "players": {},        # {uid: {"name", "ho", "dead"}}
+        "night_actions": {},  # {役職: {能力者HO: 対象HO}}
+        "madman": None,
+        "hints": [],
+        "deaths": [],         # [{"day", "ho", "uid"}]
+        "reversed": False,
+        "ended": False,
+    }
+
+
+def apply(state: Dict[str, Any], ev: Dict[str, Any]) -> None:
+    kind = ev.get("e")
+    players = state["players"]
+    if kind == "join":
+        players[ev["uid"]] = {"name": ev.get("name"), "ho": None, "dead": False}
+    elif kind == "leave":
+        players.pop(ev["uid"], None)
+    elif kind == "ho":
+        players.setdefault(ev["uid"], {"name": None, "ho": None, "dead": False})["ho"] = ev.get("ho")
+    elif kind == "players":
+        state["players"] = {uid: {"name": name, "ho": ho, "dead": False} for uid, name, ho in ev.get("list", [])}
+    elif kind == "phase":
+        # 夜に入るたびに夜アクションはクリアされる
+        if ev.get("phase") == "night" and state["phase"] != "night":
+            state["night_actions"] = {}
+        state["day"], state["phase"] = ev.get("day"), ev.get("phase")
+    elif kind == "night":
+        if ev.get("role") == "狂人":
+            state["madman"] = ev.get("target")
+        elif ev.get("target") is None:
+            state["night_actions"].get(ev.get("role"), {}).pop(ev.get("voter"), None)
+        else:
+            state["night_actions"].setdefault(ev.get("role"), {})[ev.get("voter")] = ev.get("target")
+    elif kind == "hint":
+        state["hints"].append(ev.get("idx"))
+    elif kind == "death":
+        state["deaths"].append({"day": state["day"], "ho": ev.get("ho"), "uid": ev.get("uid")})
+        if ev.get("uid") in players:
+            players[ev["uid"]]["dead"] = True
+    elif kind == "reverse":
+        state["reversed"] = True
+    elif kind == "end":
+        state["ended"] = True
+
+
+def replay(lines: Iterable[str], at: Optional[int] = None) -> Dict[str, Any]:
+    """先頭から at 件（省略時は全件）のイベントを適用した状態"""
+    state = new_state()
+    for line in lines:
+        if at is not None and state["offset"] >= at:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        apply(state, json.loads(line))
+        state["offset"] += 1
+    return state
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--at", type=int, default=None, help="適用するイベント数（未指定なら全件）")
+    parser.add_argument("--timeline", action="store_true", help="イベントを番号付きで一覧表示")
+    args = parser.parse_args()
+
+    with open(args.path, "r", encoding="utf-8") as f:
+        if args.timeline:
+            for i, line in enumerate(f, start=1):
+                if args.at is not None and i > args.at:
+                    break
+                ev = json.loads(line)
+                stamp = time.strftime("%m/%d %H:%M:%S", time.localtime(ev.pop("t", 0)))
+                kind = ev.pop("e", "?")
+                print(f"{i:>5} {stamp} {kind:<8} {json.dumps(ev, ensure_ascii=False)}")
+            return
+        state = replay(f, args.at)
+    state["players"] = {str(uid): p for uid, p in state["players"].items()}
+    print(json.dumps(state, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# utils/broadcast.py
+"""複数の HO チャンネルへの一斉送信。
+
+- チャンネル名 → ID を卓ごとにキャッシュ（毎回 text_channels を走査しない）
+- 宛先は卓の HO チャンネル（guild_config.ho_channel_name。卓 n は "ho1-n"）
+- セマフォで同時送信数を抑えつつ並行送信（レート制限の待機は discord.py に任せる）
+- 403 の場合は Bot 自身にチャンネル権限を付与して 1 回だけ再送
+- 宛先ごとの結果と所要時間を Delivery で返し、format_report で一覧にする
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+from storage import GameId, split_game_id
+from utils.guild_config import guild_config
+
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "5"))
+
+
+class ChannelIndex:
+    """卓ごとのテキストチャンネル名 → ID（チャンネルの作成/削除/改名で破棄）"""
+
+    def __init__(self) -> None:
+        self._by_guild: Dict[GameId, Dict[str, int]] = {}
+
+    def _build(self, guild: discord.Guild) -> Dict[str, int]:
+        names: Dict[str, int] = {}
+        for ch in guild.text_channels:
+            # 同名が複数あれば discord.utils.get と同じく先頭を使う
+            names.setdefault(ch.name, ch.id)
+        self._by_guild[guild.id] = names
+        return names
+
+    def get(self, guild: discord.Guild, name: str) -> Optional[discord.TextChannel]:
+        names = self._by_guild.get(guild.id)
+        if names is None:
+            names = self._build(guild)
+        cid = names.get(name)
+        ch = guild.get_channel(cid) if cid else None
+        if isinstance(ch, discord.TextChannel) and ch.name == name:
+            return ch
+        # キャッシュが古い（削除/改名の通知を取りこぼした）場合は作り直す
+        cid = self._build(guild).get(name)
+        ch = guild.get_channel(cid) if cid else None
+        return ch if isinstance(ch, discord.TextChannel) else None
+
+    def ho(self, guild: discord.Guild, ho: str) -> Optional[discord.TextChannel]:
+        """卓の HO 個別チャンネル"""
+        return self.get(guild, guild_config.ho_channel_name(guild.id, ho))
+
+    def invalidate(self, guild_id: int) -> None:
+        """ギルドの全卓のキャッシュを破棄"""
+        for gid in [gid for gid in self._by_guild if split_game_id(gid)[0] == guild_id]:
+            self._by_guild.pop(gid, None)
+
+
+channel_index = ChannelIndex()
+
+
+@dataclass
+class Delivery:
+    ho: str
+    status: str                    # "sent" | "sent_after_grant" | "forbidden" | "no_channel" | "skipped" | "error"
+    latency_ms: float = 0.0
+    attempts: int = 0
+    detail: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("sent", "sent_after_grant")
+
+
+_STATUS_LABELS = {
+    "sent": "✅",
+    "sent_after_grant": "✅(権限付与後)",
+    "forbidden": "❌ 権限不足",
+    "no_channel": "⚠️ チャンネルなし",
+    "skipped": "⏭️ 対象外",
+    "error": "❌ エラー",
+}
+
+
+async def _send_one(guild: discord.Guild, ho: str, channel: discord.TextChannel, body: str, sem: asyncio.Semaphore) -> Delivery:
+    async with sem:
+        started = time.perf_counter()
+        d = Delivery(ho=ho, status="error")
+        try:
+            d.attempts += 1
+            await channel.send(body)
+            d.status = "sent"
+        except discord.Forbidden:
+            me = getattr(guild, "me", None)
+            try:
+                if me is None:
+                    raise
+                await channel.set_permissions(me, view_channel=True, read_message_history=True, send_messages=True)
+                d.attempts += 1
+                await channel.send(body)
+                d.status = "sent_after_grant"
+            except discord.Forbidden:
+                d.status = "forbidden"
+            except Exception as e:
+                d.detail = str(e)
+        except Exception as e:
+            d.detail = str(e)
+        d.latency_ms = (time.perf_counter() - started) * 1000
+        return d
+
+
+async def broadcast(
+    guild: discord.Guild,
+    messages: Iterable[Tuple[str, Optional[str]]],
+    concurrency: int = BROADCAST_CONCURRENCY,
+) -> List[Delivery]:
+    """[(HO, 本文)] を各 HO チャンネルへ並行送信する。本文が None の HO は対象外として記録"""
+    sem = asyncio.Semaphore(max(1, concurrency))
+    results: List[Optional[Delivery]] = []
+    jobs = []
+    for ho, body in messages:
+        if body is None:
+            results.append(Delivery(ho=ho, status="skipped"))
+            continue
+        channel = channel_index.ho(guild, ho)
+        if channel is None:
+            results.append(Delivery(ho=ho, status="no_channel"))
+            continue
+        jobs.append((len(results), _send_one(guild, ho, channel, body, sem)))
+        results.append(None)
+    if jobs:
+        done = await asyncio.gather(*(job for _, job in jobs))
+        for (i, _), d in zip(jobs, done):
+            results[i] = d
+    return [d for d in results if d is not None]
+
+
+def format_report(deliveries: List[Delivery], elapsed_ms: float) -> str:
+    ok = sum(1 for d in deliveries if d.ok)
+    lines = [f"📨 送信結果: {ok}/{len(deliveries)} 件成功（{elapsed_ms:.0f}ms）"]
+    for d in deliveries:
+        line = f"{d.ho}: {_STATUS_LABELS.get(d.status, d.status)}"
+        if d.attempts:
+            line += f" {d.latency_ms:.0f}ms"
+        if d.detail:
+            line += f" ({d.detail[:80]})"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,201 @@
+"""チャンネル配置のプランナ。
+
+「どのカテゴリの下に、どの権限で、どのチャンネルがあるべきか」を宣言し、ギルドの
+キャッシュ（guild.categories / guild.text_channels）との差分だけを REST で反映する。
+
+- 無いカテゴリ/チャンネルは作成（作成時に権限もまとめて指定）
+- 既存チャンネルのカテゴリ違い・権限違いは 1 回の edit(category=..., overwrites=...) で直す
+- 差分の無いチャンネルには何もしない（何度適用しても同じ状態になる）
+- known に ID を渡したカテゴリ/チャンネルは、ID で見つかれば名前で探さない（guild_config の解決済み ID）
+
+既存チャンネルの edit と、カテゴリの異なるチャンネルの作成は互いに独立なので並列に行う。
+カテゴリ自体の作成と同じカテゴリへの作成だけは、並び順が宣言順になるよう順番に行う。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Dict, List, Mapping, Optional, Tuple, Union
+
+import discord
+
+log = logging.getLogger("werewolf.channels")
+
+Target = Union[discord.Role, discord.Member]
+Overwrites = Mapping[Target, discord.PermissionOverwrite]
+
+VISIBLE = discord.PermissionOverwrite(view_channel=True, read_message_history=True, send_messages=True)
+HIDDEN = discord.PermissionOverwrite(view_channel=False)
+
+
+def private_overwrites(guild: discord.Guild, *visible: Optional[Target]) -> Dict[Target, discord.PermissionOverwrite]:
+    """@everyone からは隠し、visible（None は無視）にだけ見せる権限"""
+    overwrites: Dict[Target, discord.PermissionOverwrite] = {guild.default_role: HIDDEN}
+    for target in visible:
+        if target is not None:
+            overwrites[target] = VISIBLE
+    return overwrites
+
+
+def _same_overwrites(current: Mapping, desired: Overwrites) -> bool:
+    def norm(ow: Mapping) -> Dict[int, tuple]:
+        return {target.id: tuple(p.value for p in o.pair()) for target, o in ow.items()}
+    return norm(current) == norm(desired)
+
+
+@dataclass(frozen=True)
+class ChannelSpec:
+    name: str
+    category: Optional[str] = None          # None ならカテゴリは変更しない
+    overwrites: Optional[Overwrites] = None  # None なら権限は変更しない
+    reason: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Op:
+    kind: str                    # "create_category" / "create" / "edit"
+    name: str
+    changes: Tuple[str, ...] = ()  # edit で変える項目（"category", "overwrites"）
+
+
+@dataclass
+class PlanResult:
+    channels: Dict[str, Optional[discord.TextChannel]] = field(default_factory=dict)
+    categories: Dict[str, Optional[discord.CategoryChannel]] = field(default_factory=dict)
+    errors: Dict[str, Exception] = field(default_factory=dict)   # {カテゴリ/チャンネル名: 例外}
+    calls: int = 0
+
+
+class ChannelPlan:
+    def __init__(self, guild: discord.Guild, *, reason: Optional[str] = None) -> None:
+        self.guild = guild
+        self.reason = reason
+        self._categories: List[str] = []
+        self._specs: Dict[str, ChannelSpec] = {}
+        self._known: Dict[Tuple[str, str], int] = {}   # {("category"/"channel", 名前): ID}
+
+    def category(self, name: str, *, known: Optional[int] = None) -> "ChannelPlan":
+        if name not in self._categories:
+            self._categories.append(name)
+        if known:
+            self._known[("category", name)] = int(known)
+        return self
+
+    def channel(
+        self,
+        name: str,
+        *,
+        category: Optional[str] = None,
+        overwrites: Optional[Overwrites] = None,
+        reason: Optional[str] = None,
+        known: Optional[int] = None,
+    ) -> "ChannelPlan":
+        """チャンネルの望む状態を宣言する（同名は後勝ち）"""
+        if category is not None:
+            self.category(category)
+        self._specs[name.lower()] = ChannelSpec(name, category, overwrites, reason)
+        if known:
+            self._known[("channel", name.lower())] = int(known)
+        return self
+
+    def _by_id(self, kind: str, name: str, cls: type) -> Optional[discord.abc.GuildChannel]:
+        cid = self._known.get((kind, name))
+        ch = self.guild.get_channel(cid) if cid else None
+        return ch if isinstance(ch, cls) else None
+
+    def _existing_category(self, name: str) -> Optional[discord.CategoryChannel]:
+        return self._by_id("category", name, discord.CategoryChannel) or discord.utils.get(self.guild.categories, name=name)
+
+    def _existing_channel(self, name: str) -> Optional[discord.TextChannel]:
+        return self._by_id("channel", name.lower(), discord.TextChannel) or discord.utils.get(self.guild.text_channels, name=name.lower())
+
+    def diff(self) -> List[Op]:
+        """キャッシュ上の現状から、必要な REST 呼び出しの一覧を求める"""
+        ops = [Op("create_category", name) for name in self._categories if self._existing_category(name) is None]
+        for spec in self._specs.values():
+            ch = self._existing_channel(spec.name)
+            if ch is None:
+                ops.append(Op("create", spec.name))
+                continue
+            changes = []
+            if spec.category is not None:
+                cat = self._existing_category(spec.category)
+                if cat is None or ch.category_id != cat.id:
+                    changes.append("category")
+            if spec.overwrites is not None and not _same_overwrites(ch.overwrites, spec.overwrites):
+                changes.append("overwrites")
+            if changes:
+                ops.append(Op("edit", spec.name, tuple(changes)))
+        return ops
+
+    async def apply(self) -> PlanResult:
+        guild = self.guild
+        result = PlanResult()
+        ops = self.diff()
+
+        # 1) カテゴリ（並び順が宣言順になるよう順番に）
+        for name in self._categories:
+            result.categories[name] = self._existing_category(name)
+        for op in ops:
+            if op.kind != "create_category":
+                continue
+            result.calls += 1
+            try:
+                result.categories[op.name] = await guild.create_category(op.name, reason=self.reason)
+            except Exception as e:
+                result.errors[op.name] = e
+
+        # 2) チャンネル: edit は並列、作成はカテゴリごとに宣言順
+        by_name = {op.name.lower(): op for op in ops if op.kind != "create_category"}
+        creates: Dict[Optional[str], List[ChannelSpec]] = {}
+        jobs: List[Awaitable[None]] = []
+        for key, spec in self._specs.items():
+            op = by_name.get(key)
+            if op is None:
+                result.channels[spec.name] = self._existing_channel(spec.name)
+            elif op.kind == "create":
+                creates.setdefault(spec.category, []).append(spec)
+            else:
+                jobs.append(self._edit(spec, op, result))
+        for category, specs in creates.items():
+            jobs.append(self._create_all(category, specs, result))
+        await asyncio.gather(*jobs)
+        if ops:
+            log.info(f"📐 {guild.id}: {len(ops)} change(s), {result.calls} call(s), {len(result.errors)} error(s)")
+        return result
+
+    async def _edit(self, spec: ChannelSpec, op: Op, result: PlanResult) -> None:
+        ch = self._existing_channel(spec.name)
+        result.channels[spec.name] = ch
+        kwargs = {}
+        if "category" in op.changes:
+            cat = result.categories.get(spec.category)
+            if cat is not None:
+                kwargs["category"] = cat
+        if "overwrites" in op.changes:
+            kwargs["overwrites"] = spec.overwrites
+        if not kwargs:
+            return  # 移動先のカテゴリを作れなかった
+        result.calls += 1
+        try:
+            result.channels[spec.name] = await ch.edit(reason=spec.reason or self.reason, **kwargs) or ch
+        except Exception as e:
+            result.errors[spec.name] = e
+
+    async def _create_all(self, category: Optional[str], specs: List[ChannelSpec], result: PlanResult) -> None:
+        cat = result.categories.get(category) if category is not None else None
+        for spec in specs:
+            result.channels[spec.name] = None
+            if category is not None and cat is None:
+                continue  # カテゴリを作れなかった
+            kwargs = {}
+            if spec.overwrites is not None:
+                kwargs["overwrites"] = spec.overwrites
+            result.calls += 1
+            try:
+                result.channels[spec.name] = await self.guild.create_text_channel(
+                    spec.name, category=cat, reason=spec.reason or self.reason, **kwargs
+                )
+            except Exception as e:
+                result.errors[spec.name] = e
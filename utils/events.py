@@ -0,0 +1,202 @@
+# utils/events.py
+"""ゲーム状態の変更イベントと、プロセス内の非同期イベントバス。
+
+Storage が状態変更時に publish し、パネル描画・集計更新・ログなどの購読者が
+それぞれ専用のキューとワーカーで処理する。publish はブロックしない。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Type, Union
+
+log = logging.getLogger("werewolf.events")
+
+# ゲーム ID: 卓 1 はギルド ID（int）、卓 n は "ギルドID:n"（storage.game_id）
+GameId = Union[int, str]
+
+
+# ---------- events ----------
+@dataclass(frozen=True)
+class ParticipantsChanged:
+    guild_id: GameId
+    kind: str
+    user_ids: Tuple[int, ...] = ()
+
+
+@dataclass(frozen=True)
+class PhaseChanged:
+    guild_id: GameId
+    day: int
+    phase: str
+
+
+@dataclass(frozen=True)
+class NightActionRecorded:
+    guild_id: GameId
+    role: str
+    voter_ho: str
+    target_ho: Optional[str]
+
+
+@dataclass(frozen=True)
+class VoteRecorded:
+    guild_id: GameId
+    voter_ho: str
+    target_ho: Optional[str]
+
+
+@dataclass(frozen=True)
+class VotingClosed:
+    guild_id: GameId
+
+
+@dataclass(frozen=True)
+class RoleUiPosted:
+    guild_id: GameId
+    message_id: int
+
+
+Event = Any
+Handler = Callable[[List[Event]], Awaitable[None]]
+
+
+class Subscriber:
+    """購読者ごとのキューとワーカー。
+
+    キューは上限付きで、溢れた場合は最も古いイベントを捨てる（dropped に計上）。
+    ワーカーは最初のイベントを受け取ってから batch_window 秒待ち、その間に
+    溜まったイベントをまとめて handler に渡す。
+    """
+
+    def __init__(self, name: str, handler: Handler, event_types: Sequence[Type], maxsize: int, batch_window: float):
+        self.name = name
+        self.handler = handler
+        self.event_types = tuple(event_types)
+        self.batch_window = batch_window
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.handled = 0
+        self.failures = 0
+
+    def accepts(self, event: Event) -> bool:
+        return not self.event_types or isinstance(event, self.event_types)
+
+    def offer(self, event: Event) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except asyncio.QueueEmpty:
+                pass
+            self.dropped += 1
+            self.queue.put_nowait(event)
+
+    async def run(self) -> None:
+        while True:
+            first = await self.queue.get()
+            if self.batch_window:
+                await asyncio.sleep(self.batch_window)
+            batch = [first]
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self.handler(batch)
+                self.handled += len(batch)
+            except Exception:
+                self.failures += 1
+                log.exception(f"subscriber {self.name} failed")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+class EventBus:
+    def __init__(self) -> None:
+        self._subscribers: Dict[str, Subscriber] = {}
+        self._taps: Dict[str, Callable[[Event], None]] = {}
+        self._running = False
+
+    def subscribe(
+        self,
+        name: str,
+        handler: Handler,
+        event_types: Sequence[Type] = (),
+        *,
+        maxsize: int = 256,
+        batch_window: float = 0.0,
+    ) -> Subscriber:
+        """name 単位で購読を登録（同名があれば置き換え）"""
+        self.unsubscribe(name)
+        sub = Subscriber(name, handler, event_types, maxsize, batch_window)
+        self._subscribers[name] = sub
+        if self._running:
+            self._start_worker(sub)
+        return sub
+
+    def unsubscribe(self, name: str) -> None:
+        sub = self._subscribers.pop(name, None)
+        if sub and sub.task:
+            sub.task.cancel()
+
+    def tap(self, name: str, fn: Callable[[Event], None]) -> None:
+        """publish と同じ順序で同期的に呼ばれる軽い処理を登録（記録用。await しないこと）"""
+        self._taps[name] = fn
+
+    def publish(self, event: Event) -> None:
+        for name, fn in list(self._taps.items()):
+            try:
+                fn(event)
+            except Exception:
+                log.exception(f"tap {name} failed")
+        for sub in list(self._subscribers.values()):
+            if sub.accepts(event):
+                sub.offer(event)
+
+    def start(self) -> None:
+        self._running = True
+        for sub in self._subscribers.values():
+            if sub.task is None or sub.task.done():
+                self._start_worker(sub)
+
+    def _start_worker(self, sub: Subscriber) -> None:
+        sub.task = asyncio.get_running_loop().create_task(sub.run(), name=f"events:{sub.name}")
+
+    async def drain(self, timeout: float) -> bool:
+        """全購読者のキューが空になるまで待つ。期限内に終われば True"""
+        waits = [sub.queue.join() for sub in self._subscribers.values() if sub.task and not sub.task.done()]
+        if not waits:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.gather(*waits), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self) -> None:
+        self._running = False
+        tasks = [sub.task for sub in self._subscribers.values() if sub.task]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"queued": sub.queue.qsize(), "handled": sub.handled, "dropped": sub.dropped, "failures": sub.failures}
+            for name, sub in self._subscribers.items()
+        }
+
+
+def guild_ids(events: List[Event]) -> List[GameId]:
+    """バッチ内のゲーム ID を出現順に重複なく返す"""
+    seen: Dict[GameId, None] = {}
+    for e in events:
+        seen.setdefault(e.guild_id, None)
+    return list(seen)
+
+
+bus = EventBus()
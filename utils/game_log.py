@@ -0,0 +1,115 @@
+"""ゲームのリプレイログ（追記のみ）。
+
+参加/HO 割当/フェーズ/夜アクション/ヒント/死亡/逆回転を 1 行 1 イベントの JSON
+（空白なし、{"t": 時刻, "e": 種別, ...}）で記録する。ログはゲーム単位
+（Storage.game_log_key、/reset_game で次のキー）で、バックエンドの append_log に追記する。
+
+記録は状態変更と同期に行い（Storage の参加者変更通知と bus.tap）、書き込みは
+Storage と同じくイベントループ上でまとめて行う。読み出しは iter_log でチャンク単位。
+再生は tools/replay_game.py。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import tempfile
+import time
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+from storage import ParticipantChange, Storage
+from utils.events import NightActionRecorded, PhaseChanged, bus
+
+
+def _line(kind: str, fields: Dict[str, Any]) -> str:
+    return json.dumps({"t": int(time.time()), "e": kind, **fields}, ensure_ascii=False, separators=(",", ":"))
+
+
+class GameLog:
+    def __init__(self) -> None:
+        self._pending: Dict[str, List[str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    def record(self, guild_id: int, kind: str, **fields: Any) -> None:
+        key = Storage.game_log_key(guild_id)
+        self._pending.setdefault(key, []).append(_line(kind, fields))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._flush_sync()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self.flush(), name="game_log:flush")
+
+    def _take(self) -> Dict[str, List[str]]:
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def _flush_sync(self) -> None:
+        for key, lines in self._take().items():
+            try:
+                Storage.backend().append_log(key, lines)
+            except Exception as e:
+                print(f"[GameLog] append {key} failed: {e}")
+
+    async def flush(self) -> None:
+        """未書き込みの行を追記する（追記順を保つため直列化）"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._pending:
+                pending = self._take()
+                for key, lines in pending.items():
+                    try:
+                        await asyncio.to_thread(Storage.backend().append_log, key, lines)
+                    except Exception as e:
+                        print(f"[GameLog] append {key} failed: {e}")
+                        # 次回の書き込みで再試行（後から記録された行より前に戻す）
+                        self._pending[key] = lines + self._pending.get(key, [])
+                        return
+
+    def spool(self, key: str) -> Tuple[IO[bytes], int]:
+        """ログを一時ファイルへ書き出して (先頭に巻き戻したファイル, 行数) を返す（ブロッキング）"""
+        fp = tempfile.TemporaryFile()
+        count = 0
+        for chunk in Storage.backend().iter_log(key):
+            fp.write("".join(line + "\n" for line in chunk).encode("utf-8"))
+            count += len(chunk)
+        fp.seek(0)
+        return fp, count
+
+
+game_log = GameLog()
+
+
+# ---------- 記録元 ----------
+def _on_participants_changed(change: ParticipantChange) -> None:
+    gid = change.guild_id
+    if change.kind == "reset":
+        return
+    if change.kind == "replace":
+        players = [[int(p["id"]), p.get("name"), p.get("ho")] for p in Storage.get_participants(gid)]
+        game_log.record(gid, "players", list=players)
+        return
+    for uid in change.user_ids:
+        if change.kind == "remove":
+            game_log.record(gid, "leave", uid=uid)
+            continue
+        p = Storage.get_participant(gid, uid)
+        if p is None:
+            continue
+        if change.kind == "add":
+            game_log.record(gid, "join", uid=uid, name=p.get("name"))
+        else:
+            game_log.record(gid, "ho", uid=uid, ho=p.get("ho"))
+
+
+def _on_event(event: Any) -> None:
+    if isinstance(event, PhaseChanged):
+        game_log.record(event.guild_id, "phase", day=event.day, phase=event.phase)
+    elif isinstance(event, NightActionRecorded):
+        game_log.record(event.guild_id, "night", role=event.role, voter=event.voter_ho, target=event.target_ho)
+
+
+Storage.on_participants_changed(_on_participants_changed)
+bus.tap("game_log", _on_event)
@@ -0,0 +1,157 @@
+"""ギルドごとのロール/カテゴリ/チャンネルの設定（名前と解決済み ID）。
+
+config.py の名前は既定値で、/config_names でサーバーごとに上書きできる（再デプロイ不要）。
+名前から見つけたロール/チャンネルは ID を Storage の guild_config に記録し、以降は
+guild.get_role / guild.get_channel の ID 引き（O(1)）で解決する。記録した ID が消えていた
+（削除された）ときだけ名前で探し直し、見つからなければ記録を消す。
+設定は /reset_game 後も維持する（KEEP_ON_RESET）。
+
+卓（utils/tables.py）ごとに設定を持つ。卓 n（2 以上）の既定名は卓 1 の名前に "-n" を付けたもの
+（HO ロール/チャンネルも "HO1-2" / "ho1-2"）。GM ロールだけは全卓で共通（卓 1 の設定を使う）。
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, Optional, Tuple
+
+import discord
+
+from config import (
+    CONTACT_CHANNEL_NAME,
+    DASHBOARD_CHANNEL_NAME,
+    GM_CATEGORY_NAME,
+    GM_ROLE_NAME,
+    HINT_CHANNEL_NAME,
+    LOG_CHANNEL_NAME,
+    PLAYER_ROLE_NAME,
+    PRIVATE_CATEGORY_NAME,
+    PROGRESS_CATEGORY_NAME,
+    SPIRIT_NAME,
+    VOTE_CHANNEL_NAME,
+)
+from storage import GameId, Storage, split_game_id
+from utils.channels import ChannelPlan, PlanResult
+
+# {キー: (種類, 既定名, 表示名)}
+RESOURCES: Dict[str, Tuple[str, str, str]] = {
+    "gm_role": ("role", GM_ROLE_NAME, "GM ロール"),
+    "player_role": ("role", PLAYER_ROLE_NAME, "参加者ロール"),
+    "spirit_role": ("role", SPIRIT_NAME, "霊界ロール"),
+    "gm_category": ("category", GM_CATEGORY_NAME, "GM 用カテゴリ"),
+    "private_category": ("category", PRIVATE_CATEGORY_NAME, "個別チャンネルのカテゴリ"),
+    "progress_category": ("category", PROGRESS_CATEGORY_NAME, "ゲーム進行のカテゴリ"),
+    "dashboard": ("channel", DASHBOARD_CHANNEL_NAME, "GM ダッシュボード"),
+    "log": ("channel", LOG_CHANNEL_NAME, "GM ログ"),
+    "vote": ("channel", VOTE_CHANNEL_NAME, "投票集計"),
+    "spirit": ("channel", SPIRIT_NAME, "霊界チャンネル"),
+    "contact": ("channel", CONTACT_CHANNEL_NAME, "連絡チャンネル"),
+    "hint": ("channel", HINT_CHANNEL_NAME, "ヒントチャンネル"),
+}
+
+# 全卓で共通のキー（卓 1 の設定を使う）
+SHARED = ("gm_role",)
+
+_HO_ROLE = re.compile(r"(HO\d+)(?:-(\d+))?")
+
+
+def _owner(gid: GameId, key: str) -> GameId:
+    guild, table = split_game_id(gid)
+    return guild if key in SHARED or table == 1 else gid
+
+
+def _suffix(gid: GameId) -> str:
+    table = split_game_id(gid)[1]
+    return "" if table == 1 else f"-{table}"
+
+
+class GuildConfig:
+    # ---------- 名前 ----------
+    def default(self, guild_id: GameId, key: str) -> str:
+        """既定名（卓 n は卓 1 の名前 + "-n"）"""
+        guild, table = split_game_id(guild_id)
+        if key in SHARED or table == 1:
+            return RESOURCES[key][1]
+        return self.name(guild, key) + _suffix(guild_id)
+
+    def name(self, guild_id: GameId, key: str) -> str:
+        return Storage.get_guild_config(_owner(guild_id, key))["names"].get(key) or self.default(guild_id, key)
+
+    def names(self, guild_id: GameId) -> Dict[str, str]:
+        return {key: self.name(guild_id, key) for key in RESOURCES}
+
+    def rename(self, guild_id: GameId, key: str, name: Optional[str]) -> None:
+        """名前を変える（None で既定に戻す）。解決済みの ID は捨て、次回は新しい名前で探す"""
+        if name == self.default(guild_id, key):
+            name = None
+        Storage.set_guild_config(_owner(guild_id, key), "names", key, name)
+        Storage.set_guild_config(_owner(guild_id, key), "ids", key, None)
+
+    def ho_role_name(self, guild_id: GameId, ho: str) -> str:
+        return str(ho).upper() + _suffix(guild_id)
+
+    def ho_channel_name(self, guild_id: GameId, ho: str) -> str:
+        return self.ho_role_name(guild_id, ho).lower()
+
+    def ho_of_role(self, guild_id: GameId, name: str) -> Optional[str]:
+        """この卓の HO ロール名（"HO3" / "HO3-2"）なら HO を返す"""
+        m = _HO_ROLE.fullmatch(str(name).upper())
+        if m is None or int(m.group(2) or 1) != split_game_id(guild_id)[1]:
+            return None
+        return m.group(1)
+
+    # ---------- ID ----------
+    def id(self, guild_id: GameId, key: str) -> Optional[int]:
+        rid = Storage.get_guild_config(_owner(guild_id, key))["ids"].get(key)
+        return int(rid) if rid else None
+
+    def remember(self, guild_id: GameId, key: str, obj: Optional[discord.abc.Snowflake]) -> None:
+        Storage.set_guild_config(_owner(guild_id, key), "ids", key, int(obj.id) if obj is not None else None)
+
+    # ---------- 解決 ----------
+    def role(self, guild: discord.Guild, key: str) -> Optional[discord.Role]:
+        role = guild.get_role(self.id(guild.id, key) or 0)
+        if role is None:
+            role = discord.utils.get(guild.roles, name=self.name(guild.id, key))
+            self.remember(guild.id, key, role)
+        return role
+
+    def category(self, guild: discord.Guild, key: str) -> Optional[discord.CategoryChannel]:
+        ch = guild.get_channel(self.id(guild.id, key) or 0)
+        if not isinstance(ch, discord.CategoryChannel):
+            ch = discord.utils.get(guild.categories, name=self.name(guild.id, key))
+            self.remember(guild.id, key, ch)
+        return ch
+
+    def channel(self, guild: discord.Guild, key: str) -> Optional[discord.TextChannel]:
+        ch = guild.get_channel(self.id(guild.id, key) or 0)
+        if not isinstance(ch, discord.TextChannel):
+            ch = discord.utils.get(guild.text_channels, name=self.name(guild.id, key).lower())
+            self.remember(guild.id, key, ch)
+        return ch
+
+    def resolve(self, guild: discord.Guild, key: str) -> Optional[discord.abc.Snowflake]:
+        return getattr(self, RESOURCES[key][0])(guild, key)
+
+    def is_channel(self, guild: discord.Guild, channel: discord.abc.GuildChannel, key: str) -> bool:
+        return self.channel(guild, key) == channel
+
+    # ---------- ChannelPlan ----------
+    def declare(self, plan: ChannelPlan, key: str, *, category: str, **kwargs) -> str:
+        """設定のチャンネル key を category（キー）の下に宣言し、チャンネル名を返す"""
+        gid = plan.guild.id
+        category_name = self.name(gid, category)
+        plan.category(category_name, known=self.id(gid, category))
+        name = self.name(gid, key)
+        plan.channel(name, category=category_name, known=self.id(gid, key), **kwargs)
+        return name
+
+    def record(self, guild_id: GameId, result: PlanResult, *keys: str) -> None:
+        """apply の結果から keys のカテゴリ/チャンネルの ID を記録する"""
+        for key in keys:
+            found = result.categories if RESOURCES[key][0] == "category" else result.channels
+            obj = found.get(self.name(guild_id, key))
+            if obj is not None:
+                self.remember(guild_id, key, obj)
+
+
+guild_config = GuildConfig()
@@ -0,0 +1,51 @@
+"""/livez と /readyz の判定。
+
+どちらもメモリ上の状態（lifecycle / Bot のハートビート / Storage.health）だけを見るので、
+プローブのたびに Discord や Upstash へ問い合わせることはない。
+- liveness: 停止処理中でなく、ゲートウェイの切断が LIVENESS_GRACE 秒（既定 600）を超えて続いていない
+  （再接続のバックオフから戻ってこない Bot は Render に再起動させる）
+- readiness: ゲートウェイ接続済み・ハートビート遅延が READY_MAX_LATENCY 秒（既定 5）以下・
+  ストレージの読み込みに成功・起動時の復旧が完了・停止処理中でない
+"""
+from __future__ import annotations
+
+import math
+import os
+from typing import Any, Dict, Tuple
+
+import discord
+
+from storage import Storage
+from utils.lifecycle import lifecycle
+
+READY_MAX_LATENCY = float(os.getenv("READY_MAX_LATENCY", "5"))
+LIVENESS_GRACE = float(os.getenv("LIVENESS_GRACE", "600"))
+
+
+def liveness(bot: discord.Client) -> Tuple[bool, Dict[str, Any]]:
+    down = lifecycle.downtime()
+    alive = lifecycle.stopping or down <= LIVENESS_GRACE
+    return alive, {"alive": alive, "stopping": lifecycle.stopping, "down_s": round(down, 1), "grace_s": LIVENESS_GRACE}
+
+
+def readiness(bot: discord.Client) -> Tuple[bool, Dict[str, Any]]:
+    latency = bot.latency
+    storage = Storage.health()
+    checks = {
+        "accepting": not lifecycle.stopping,
+        "gateway": lifecycle.connected and bot.is_ready() and not bot.is_closed(),
+        "latency": math.isfinite(latency) and latency <= READY_MAX_LATENCY,
+        "storage": storage["ok"],
+        "recovery": all(lifecycle.recovery.values()),
+    }
+    ready = all(checks.values())
+    return ready, {
+        "ready": ready,
+        "checks": checks,
+        "latency_ms": round(latency * 1000, 1) if math.isfinite(latency) else None,
+        "down_s": round(lifecycle.downtime(), 1),
+        "gateway": lifecycle.gateway_stats(),
+        "storage": storage,
+        "recovery": dict(lifecycle.recovery),
+        "stop": lifecycle.report or ({"reason": lifecycle.reason} if lifecycle.stopping else None),
+    }
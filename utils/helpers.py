@@ -1,60 +1,59 @@
 # utils/helpers.py
 import discord
-from typing import Tuple
-from config import (
-    GM_CATEGORY_NAME,
-    GM_ROLE_NAME,
-    DASHBOARD_CHANNEL_NAME,
-    LOG_CHANNEL_NAME,
-    PLAYER_ROLE_NAME,
-)
+from typing import Optional, Tuple
+from utils.channels import ChannelPlan, private_overwrites
+from utils.guild_config import guild_config
+from utils.interactions import reject_if_stopping
+from utils.tables import tables
+
+
+async def _ensure_role(guild: discord.Guild, key: str, reason: str) -> Optional[discord.Role]:
+    """設定のロール key を返す（無ければ作成。権限不足なら None）"""
+    role = guild_config.role(guild, key)
+    if role is None:
+        try:
+            role = await guild.create_role(name=guild_config.name(guild.id, key), reason=reason)
+        except discord.Forbidden:
+            return None
+        guild_config.remember(guild.id, key, role)
+    return role
+
+
+async def _ensure_gm_channel(guild: discord.Guild, key: str, gm_category: discord.CategoryChannel) -> discord.TextChannel:
+    ch = guild_config.channel(guild, key)
+    if ch is None:
+        ch = await guild.create_text_channel(guild_config.name(guild.id, key), category=gm_category)
+        guild_config.remember(guild.id, key, ch)
+    elif ch.category_id != gm_category.id:
+        # 所属カテゴリが違えば移動
+        try:
+            await ch.edit(category=gm_category)
+        except discord.Forbidden:
+            pass
+    return ch
 
 
 async def ensure_gm_environment(guild: discord.Guild) -> Tuple[discord.Role, discord.TextChannel, discord.TextChannel]:
     """Ensure GM role/category/channels and return (gm_role, dashboard, log)."""
     # role
-    gm_role = discord.utils.get(guild.roles, name=GM_ROLE_NAME)
-    if gm_role is None:
-        try:
-            gm_role = await guild.create_role(name=GM_ROLE_NAME, reason="GM role for Werewolf")
-        except discord.Forbidden:
-            gm_role = discord.utils.get(guild.roles, name='@everyone')  # fallback
+    gm_role = await _ensure_role(guild, "gm_role", "GM role for Werewolf") or guild.default_role  # fallback
 
     # category
-    gm_category = discord.utils.get(guild.categories, name=GM_CATEGORY_NAME)
+    gm_category = guild_config.category(guild, "gm_category")
     if gm_category is None:
-        gm_category = await guild.create_category(GM_CATEGORY_NAME)
-
-    # channels
-    # まずはギルド全体から既存チャンネルを探す
-    dash = discord.utils.get(guild.text_channels, name=DASHBOARD_CHANNEL_NAME)
-    if dash is None:
-        dash = await guild.create_text_channel(DASHBOARD_CHANNEL_NAME, category=gm_category)
-    else:
-        # 所属カテゴリが違えば移動
-        if dash.category_id != gm_category.id:
-            try:
-                await dash.edit(category=gm_category)
-            except discord.Forbidden:
-                pass
-
-    log = discord.utils.get(guild.text_channels, name=LOG_CHANNEL_NAME)
-    if log is None:
-        log = await guild.create_text_channel(LOG_CHANNEL_NAME, category=gm_category)
-    else:
-        if log.category_id != gm_category.id:
-            try:
-                await log.edit(category=gm_category)
-            except discord.Forbidden:
-                pass
+        gm_category = await guild.create_category(guild_config.name(guild.id, "gm_category"))
+        guild_config.remember(guild.id, "gm_category", gm_category)
 
+    # channels（既存はカテゴリを問わず設定の ID/名前で探す）
+    dash = await _ensure_gm_channel(guild, "dashboard", gm_category)
+    log = await _ensure_gm_channel(guild, "log", gm_category)
     return gm_role, dash, log
 
 
 def has_gm_or_manage_guild(interaction: discord.Interaction) -> bool:
     if not interaction.guild:
         return False
-    gm_role = discord.utils.get(interaction.guild.roles, name=GM_ROLE_NAME)
+    gm_role = guild_config.role(interaction.guild, "gm_role")
     if gm_role and gm_role in getattr(interaction.user, 'roles', []):
         return True
     return bool(interaction.user.guild_permissions.manage_guild)
@@ -62,18 +61,38 @@ def has_gm_or_manage_guild(interaction: discord.Interaction) -> bool:
 
 async def ensure_player_role(guild: discord.Guild) -> discord.Role:
     """Ensure the player role exists and return it."""
-    role = discord.utils.get(guild.roles, name=PLAYER_ROLE_NAME)
-    if role is None:
-        try:
-            role = await guild.create_role(name=PLAYER_ROLE_NAME, reason="Player role for Werewolf")
-        except discord.Forbidden:
-            # フォールバック: @everyone を返す（機能制限）
-            role = discord.utils.get(guild.roles, name='@everyone')
-    return role
+    # フォールバック: @everyone を返す（機能制限）
+    return await _ensure_role(guild, "player_role", "Player role for Werewolf") or guild.default_role
+
+
+async def ensure_spirit_role(guild: discord.Guild) -> Optional[discord.Role]:
+    return await _ensure_role(guild, "spirit_role", "Spirit role for afterlife chat")
 
 
-def is_member_spirit(member: discord.Member) -> bool:
-    for r in member.roles:
-        if str(r.name) == "霊界":
-            return True
-    return False
+async def ensure_spirit_channel(guild: discord.Guild, spirit_role: Optional[discord.Role]) -> Optional[discord.TextChannel]:
+    """霊界チャンネル（個別カテゴリ配下、GM と霊界ロールに可視）を用意して返す"""
+    if spirit_role is None:
+        return guild_config.channel(guild, "spirit")
+    gm_role = guild_config.role(guild, "gm_role")
+    plan = ChannelPlan(guild, reason="Create shared spirit channel")
+    name = guild_config.declare(plan, "spirit", category="private_category", overwrites=private_overwrites(guild, gm_role, spirit_role))
+    result = await plan.apply()
+    guild_config.record(guild.id, result, "spirit", "private_category")
+    return result.channels.get(name)
+
+
+def is_member_spirit(guild: discord.Guild, member: discord.Member) -> bool:
+    """member が卓 guild の霊界ロールを持っているか"""
+    spirit_role = guild_config.role(guild, "spirit_role")
+    return spirit_role is not None and member.get_role(spirit_role.id) is not None
+
+
+class GameView(discord.ui.View):
+    """ゲーム用 View の基底。ボタン処理の前にギルド（全卓）の状態を読み込んでおく"""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if await reject_if_stopping(interaction):
+            return False
+        if interaction.guild_id:
+            await tables.load(interaction.guild_id)
+        return True
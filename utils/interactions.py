@@ -0,0 +1,128 @@
+"""インタラクション応答の期限（3 秒）を守るためのガードと応答ヘルパ。
+
+すべてのインタラクション（スラッシュコマンド/ボタン/セレクト）で on_interaction 時に
+ガードを仕掛け、RESPONSE_BUDGET 秒（既定 1.5）経っても未応答なら自動で defer する。
+自動 defer の回数はコマンド名/custom_id ごとに数え、GET /interactions で確認できる。
+
+自動 defer された後でも正しく返信できるよう、応答は respond()（未応答なら response、
+応答済みなら followup）、ボタン/セレクトのメッセージの編集は edit_response()（未応答なら
+response.edit_message、応答済みなら edit_original_response）、長処理前の確保は ensure_deferred() を使う。
+応答済みの判定（is_done）は HTTP 応答が返ってから立つため、ガードの defer と同時に応答すると
+InteractionResponded ではなく 40060（already acknowledged）で失敗する。どちらも応答済みとして扱う。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import discord
+
+from utils.lifecycle import lifecycle
+from utils.tasks import supervisor
+
+log = logging.getLogger("werewolf.interactions")
+
+RESPONSE_BUDGET = float(os.getenv("RESPONSE_BUDGET", "1.5"))
+# Discord のエラーコード: Interaction has already been acknowledged
+ALREADY_ACKNOWLEDGED = 40060
+
+
+def _already_acknowledged(e: Exception) -> bool:
+    return isinstance(e, discord.InteractionResponded) or (
+        isinstance(e, discord.HTTPException) and e.code == ALREADY_ACKNOWLEDGED
+    )
+
+
+async def ensure_deferred(interaction: discord.Interaction, *, thinking: bool = False) -> None:
+    """未応答なら（エフェメラルで）defer する"""
+    if interaction.response.is_done():
+        return
+    try:
+        await interaction.response.defer(ephemeral=True, thinking=thinking)
+    except Exception:
+        pass
+
+
+async def respond(interaction: discord.Interaction, content: Optional[str] = None, **kwargs: Any) -> None:
+    """未応答なら response で、応答済み（defer 済み含む）なら followup で送る"""
+    kwargs.setdefault("ephemeral", True)
+    if not interaction.response.is_done():
+        try:
+            await interaction.response.send_message(content, **kwargs)
+            return
+        except (discord.InteractionResponded, discord.HTTPException) as e:
+            # ガードの自動 defer と競合した
+            if not _already_acknowledged(e):
+                raise
+    await interaction.followup.send(content, **kwargs)
+
+
+async def edit_response(interaction: discord.Interaction, **kwargs: Any) -> None:
+    """ボタン/セレクトのメッセージを編集する（未応答なら response、応答済みなら edit_original_response）"""
+    if not interaction.response.is_done():
+        try:
+            await interaction.response.edit_message(**kwargs)
+            return
+        except (discord.InteractionResponded, discord.HTTPException) as e:
+            if not _already_acknowledged(e):
+                raise
+    await interaction.edit_original_response(**kwargs)
+
+
+async def reject_if_stopping(interaction: discord.Interaction) -> bool:
+    """停止処理中なら断って True を返す（処理中のものは最後まで実行される）"""
+    if not lifecycle.stopping:
+        return False
+    try:
+        await respond(interaction, "🔄 Bot を再起動しています。少し待ってからもう一度お試しください。")
+    except Exception:
+        pass
+    return True
+
+
+def _where(interaction: discord.Interaction) -> str:
+    command = getattr(interaction, "command", None)
+    if command is not None:
+        return f"/{command.qualified_name}"
+    data = interaction.data or {}
+    return str(data.get("custom_id") or data.get("name") or interaction.type.name)
+
+
+class ResponseGuard:
+    def __init__(self, budget: float = RESPONSE_BUDGET) -> None:
+        self.budget = budget
+        # {場所: {"count": 件数, "auto_deferred": 自動 defer した件数}}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def arm(self, interaction: discord.Interaction) -> None:
+        if interaction.type not in (discord.InteractionType.application_command, discord.InteractionType.component):
+            return
+        where = _where(interaction)
+        self.stats.setdefault(where, {"count": 0, "auto_deferred": 0})["count"] += 1
+        # 期限を守るのが目的なのでギルドごとの上限の対象にしない
+        supervisor.spawn(self._watch(interaction, where), name=f"guard:{where}")
+
+    async def _watch(self, interaction: discord.Interaction, where: str) -> None:
+        await asyncio.sleep(self.budget)
+        if interaction.response.is_done():
+            return
+        try:
+            await interaction.response.defer(ephemeral=True, thinking=False)
+        except (discord.InteractionResponded, discord.HTTPException):
+            return  # 同時に応答された
+        self.stats[where]["auto_deferred"] += 1
+        log.info(f"⏱️ auto-deferred {where} after {self.budget:.1f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        slow = {k: v for k, v in self.stats.items() if v["auto_deferred"]}
+        return {
+            "budget_s": self.budget,
+            "total": sum(v["count"] for v in self.stats.values()),
+            "auto_deferred": sum(v["auto_deferred"] for v in self.stats.values()),
+            "by_place": dict(sorted(slow.items(), key=lambda kv: -kv[1]["auto_deferred"])),
+        }
+
+
+response_guard = ResponseGuard()
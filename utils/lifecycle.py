@@ -0,0 +1,129 @@
+"""プロセスの状態（起動時の復旧、ゲートウェイ接続、停止の要求と処理中のハンドラ）。
+
+起動時の復旧（パネル/タイマーの再登録など）は各 Cog が expect_recovery で登録し、
+on_ready の最後に recovered を呼ぶ。ゲートウェイの接続状態は WerewolfBot の
+on_connect / on_resumed / on_disconnect で更新する。どちらも /readyz の判定に使う。
+
+停止が要求されると、新しいコマンド/ボタン/セレクトは受け付けず（WerewolfTree と
+GameView の interaction_check で断る）、処理中のハンドラが終わるのを SHUTDOWN_DEADLINE 秒
+（既定 20。Render は SIGTERM から 30 秒で強制終了する）まで待ってから状態を書き切る。
+手順そのものは main.graceful_shutdown。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+log = logging.getLogger("werewolf.lifecycle")
+
+SHUTDOWN_DEADLINE = float(os.getenv("SHUTDOWN_DEADLINE", "20"))
+
+# discord.py がインタラクションごとに起動するタスクの名前
+_HANDLER_TASKS = (
+    "CommandTree-invoker",
+    "discord-ui-view-dispatch",
+    "discord-ui-modal-dispatch",
+    "discord-ui-dynamic-item",
+)
+
+
+class Lifecycle:
+    def __init__(self) -> None:
+        self.stopping = False
+        self.reason: Optional[str] = None
+        self.requested_at: Optional[float] = None
+        self.report: Dict[str, Any] = {}
+        self._stop: Optional[asyncio.Event] = None
+        self.recovery: Dict[str, bool] = {}
+        self.connected = False
+        self.down_since: Optional[float] = time.monotonic()
+        self.up_since: Optional[float] = None
+        # sessions: 新しいセッション（IDENTIFY）/ resumes: 再開（RESUME）/ reconnects: 切断からの復帰 /
+        # downtime_s: 初回接続後の切断時間の合計 / bot_restarts: 接続処理（login/connect）のやり直し
+        self.gateway: Dict[str, Any] = {
+            "sessions": 0, "resumes": 0, "reconnects": 0, "disconnects": 0,
+            "downtime_s": 0.0, "bot_restarts": 0, "last_error": None,
+        }
+
+    # ---------- 起動時の復旧 ----------
+    def expect_recovery(self, name: str) -> None:
+        self.recovery.setdefault(name, False)
+
+    def recovered(self, name: str) -> None:
+        self.recovery[name] = True
+
+    def reset_recovery(self) -> None:
+        """Bot を作り直したとき（新しい Bot で on_ready の復旧をやり直す）"""
+        self.recovery = {name: False for name in self.recovery}
+
+    # ---------- ゲートウェイ ----------
+    def gateway_up(self, resumed: bool = False) -> None:
+        now = time.monotonic()
+        if self.down_since is not None:
+            if self.gateway["sessions"] or self.gateway["resumes"]:
+                self.gateway["downtime_s"] += now - self.down_since
+                self.gateway["reconnects"] += 1
+        self.gateway["resumes" if resumed else "sessions"] += 1
+        self.connected, self.down_since, self.up_since = True, None, now
+
+    def gateway_down(self) -> None:
+        if self.connected or self.down_since is None:
+            self.connected, self.down_since, self.up_since = False, time.monotonic(), None
+            self.gateway["disconnects"] += 1
+
+    def downtime(self) -> float:
+        """切断されてからの秒数（接続中は 0）"""
+        return 0.0 if self.down_since is None else time.monotonic() - self.down_since
+
+    def uptime(self) -> float:
+        """今の接続が続いている秒数（切断中は 0）"""
+        return 0.0 if self.up_since is None else time.monotonic() - self.up_since
+
+    def gateway_stats(self) -> Dict[str, Any]:
+        return {
+            **self.gateway,
+            "downtime_s": round(self.gateway["downtime_s"] + (self.downtime() if self.gateway["sessions"] else 0.0), 1),
+            "connected": self.connected,
+            "current_down_s": round(self.downtime(), 1),
+            "current_up_s": round(self.uptime(), 1),
+        }
+
+    # ---------- 停止 ----------
+    def _event(self) -> asyncio.Event:
+        if self._stop is None:
+            self._stop = asyncio.Event()
+        return self._stop
+
+    def request_stop(self, reason: str) -> None:
+        """停止を要求する（2 回目以降は無視）"""
+        if self.stopping:
+            return
+        self.stopping, self.reason, self.requested_at = True, reason, time.monotonic()
+        log.info(f"🛑 stop requested ({reason}); rejecting new interactions")
+        self._event().set()
+
+    async def wait_stop(self) -> None:
+        await self._event().wait()
+
+    def inflight(self) -> List[asyncio.Task]:
+        """処理中のコマンド/コンポーネントのハンドラ"""
+        current = asyncio.current_task()
+        return [
+            t for t in asyncio.all_tasks()
+            if t is not current and not t.done() and t.get_name().startswith(_HANDLER_TASKS)
+        ]
+
+    async def drain(self, timeout: float) -> Tuple[int, int]:
+        """処理中のハンドラの終了を timeout 秒まで待つ。(終わった件数, 残った件数) を返す"""
+        tasks = self.inflight()
+        if not tasks:
+            return 0, 0
+        log.info(f"⏳ waiting for {len(tasks)} in-flight handler(s)")
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        return len(done), len(pending)
+
+
+lifecycle = Lifecycle()
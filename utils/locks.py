@@ -0,0 +1,57 @@
+# utils/locks.py
+"""ギルド単位の非同期ロック。
+
+同じギルドへの状態変更だけを直列化し、別ギルドの操作は互いに待たない。
+ボタン連打のような重複操作は待たせずに即座に弾けるよう、非ブロッキングの
+try_hold を用意する。
+"""
+from __future__ import annotations
+
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable
+
+import discord
+
+from utils.interactions import respond
+
+
+class GuildLocks:
+    def __init__(self) -> None:
+        # 保持中/待機中のロックだけが残る（解放後は参照が消えて回収される）
+        self._locks: "weakref.WeakValueDictionary[Hashable, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def lock(self, key: Hashable) -> asyncio.Lock:
+        lk = self._locks.get(key)
+        if lk is None:
+            lk = asyncio.Lock()
+            self._locks[key] = lk
+        return lk
+
+    def is_busy(self, key: Hashable) -> bool:
+        lk = self._locks.get(key)
+        return bool(lk and lk.locked())
+
+    @asynccontextmanager
+    async def try_hold(self, key: Hashable) -> AsyncIterator[bool]:
+        """取得できれば True、既に処理中なら待たずに False を渡す"""
+        lk = self.lock(key)
+        if lk.locked():
+            yield False
+            return
+        async with lk:
+            yield True
+
+
+guild_locks = GuildLocks()
+
+BUSY_MESSAGE = "⏳ 他の操作を処理中です。完了してからもう一度お試しください"
+
+
+async def reply_busy(interaction: discord.Interaction, content: str = BUSY_MESSAGE) -> None:
+    """重複操作を即座に拒否する（エフェメラル）"""
+    try:
+        await respond(interaction, content)
+    except Exception:
+        pass
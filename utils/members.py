@@ -0,0 +1,95 @@
+"""メンバーキャッシュの方針と、キャッシュに無いメンバーの取得。
+
+MEMBER_CACHE（環境変数）で Bot がメモリに持つメンバーを選ぶ。
+- full（既定）: 起動時に全メンバーを読み込み、参加/退出も追う（従来どおり）
+- players: 起動時の読み込みをせず、必要になったメンバー（参加者・GM・霊界）だけを
+  ID 指定でゲートウェイから取り寄せてキャッシュする。大きなサーバーでもメモリは参加人数分で済む
+
+どちらの方式でも、コードは guild.get_member / guild.members の代わりにここの関数を使う。
+- get_member / get_members: キャッシュ → 無ければ query_members(user_ids=..., cache=True)（100 件ずつ）
+  → それでも無ければ REST の fetch_member
+- role_holders: 指定ロールの保持者。players では全メンバーを一時的に取り寄せ（キャッシュしない）、
+  保持者だけを返す
+メモリ量の比較は `python -m tools.bench_members --members 100000`。
+"""
+from __future__ import annotations
+
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import discord
+
+log = logging.getLogger("werewolf.members")
+
+MEMBER_CACHE = os.getenv("MEMBER_CACHE", "full").strip().lower()
+if MEMBER_CACHE not in ("full", "players"):
+    log.warning(f"⚠️ unknown MEMBER_CACHE={MEMBER_CACHE!r}; using full")
+    MEMBER_CACHE = "full"
+
+QUERY_BATCH = 100   # query_members(user_ids=...) の上限
+
+
+def cache_all() -> bool:
+    return MEMBER_CACHE == "full"
+
+
+def member_cache_flags() -> discord.MemberCacheFlags:
+    """Bot に渡すキャッシュ方針（players では参加/退出を追わず、取り寄せたメンバーだけを持つ）"""
+    return discord.MemberCacheFlags.all() if cache_all() else discord.MemberCacheFlags.none()
+
+
+def bot_options() -> Dict[str, object]:
+    """commands.Bot に渡すメンバーキャッシュ関連の引数"""
+    return {"member_cache_flags": member_cache_flags(), "chunk_guilds_at_startup": cache_all()}
+
+
+async def get_members(guild: discord.Guild, ids: Iterable[int]) -> Dict[int, discord.Member]:
+    """ID のメンバーを返す（サーバーにいない ID は含めない）"""
+    found: Dict[int, discord.Member] = {}
+    missing: List[int] = []
+    for uid in dict.fromkeys(int(i) for i in ids if i):
+        member = guild.get_member(uid)
+        if member is not None:
+            found[uid] = member
+        else:
+            missing.append(uid)
+    for i in range(0, len(missing), QUERY_BATCH):
+        batch = missing[i:i + QUERY_BATCH]
+        try:
+            for member in await guild.query_members(user_ids=batch, limit=len(batch), cache=True):
+                found[member.id] = member
+        except Exception as e:
+            log.warning(f"⚠️ query_members failed in {guild.id}: {e}")
+    for uid in missing:
+        if uid in found:
+            continue
+        try:
+            found[uid] = await guild.fetch_member(uid)
+        except discord.NotFound:
+            pass
+        except Exception as e:
+            log.warning(f"⚠️ fetch_member {uid} failed in {guild.id}: {e}")
+    if missing:
+        log.info(f"👥 {guild.id}: fetched {sum(1 for uid in missing if uid in found)}/{len(missing)} uncached member(s)")
+    return found
+
+
+async def get_member(guild: discord.Guild, uid: int) -> Optional[discord.Member]:
+    member = guild.get_member(int(uid))
+    if member is not None:
+        return member
+    return (await get_members(guild, [uid])).get(int(uid))
+
+
+async def role_holders(guild: discord.Guild, roles: Sequence[Optional[discord.Role]]) -> List[discord.Member]:
+    """roles（None は無視）のいずれかを持つ Bot 以外のメンバー"""
+    wanted = {r.id for r in roles if r is not None}
+    if not wanted:
+        return []
+    if cache_all():
+        return [m for m in guild.members if not m.bot and any(r.id in wanted for r in m.roles)]
+    # 全員を一時的に取り寄せて保持者の ID だけを残し、保持者は get_members でキャッシュに載せる
+    ids = [m.id for m in await guild.chunk(cache=False) if not m.bot and any(r.id in wanted for r in m.roles)]
+    members = await get_members(guild, ids)
+    return [members[uid] for uid in ids if uid in members]
@@ -0,0 +1,141 @@
+"""夜の行動の判定（占い結果・護衛・狂人ルールによる死亡・翌朝の役職の回転）。
+
+GM が手で行っていた判定をまとめて行う。
+- 占い: 対象がシナリオの人狼陣営なら「人狼」、それ以外（狂人を含む）は「村人」
+- 狩人: 対象を護衛
+- 襲撃: 人狼の襲撃先は翌朝死亡（狩人に護衛されていれば防がれる。人狼への襲撃は無効）
+- 狂人ルール: 狂人を対象に能力を使った能力者は翌朝死亡（護衛では防げない）
+- 回転: 人狼と回転しない役職（親子など）を除いた HO 番号順の輪（utils/rotation.py）で、
+  役職は翌朝ひとつ隣へ移る。逆回転ボタンが押されていれば向きが反対になる
+- 狂人は GM の狂人連絡で記録された HO、無ければ回転の配置で今日狂人の HO
+
+判定に使う表（RuleTable）はシナリオ/HO 割当/狂人/逆回転の組み合わせごとに一度だけ作る。
+判定結果は日数か Storage.night_version / participants_version が変わるまで使い回す。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from storage import Storage
+from utils import rotation
+from utils.scenario import Scenario, scenarios
+
+ABILITY_ROLES = ("占い", "狩人")
+ATTACK = "襲撃"
+MADMAN = "狂人"
+
+
+@dataclass(frozen=True)
+class RuleTable:
+    wolves: FrozenSet[str]
+    fixed: FrozenSet[str]
+    madman: Optional[str]
+    reversed: bool
+    next_seat: Mapping[str, str]   # 回転する HO → 翌朝その役職を持つ HO
+
+
+@dataclass(frozen=True)
+class NightResult:
+    seer: Tuple[Tuple[str, str, bool], ...]       # (占い師, 対象, 人狼か)
+    protected: Tuple[Tuple[str, str], ...]        # (狩人, 対象)
+    guarded: Tuple[str, ...]                      # 襲撃を護衛で防いだ HO
+    deaths: Tuple[Tuple[str, str], ...]           # (翌朝死亡する HO, 理由)
+    rotation: Tuple[Tuple[str, str, str], ...]    # (役職, 今夜の HO, 翌朝の HO)
+
+
+def build_rule_table(
+    hos: Iterable[str],
+    wolves: FrozenSet[str],
+    fixed: FrozenSet[str],
+    madman: Optional[str] = None,
+    reversed: bool = False,
+) -> RuleTable:
+    ring = rotation.seats(hos, fixed)
+    step = -1 if reversed else 1
+    next_seat = {h: ring[(i + step) % len(ring)] for i, h in enumerate(ring)}
+    return RuleTable(frozenset(wolves), frozenset(fixed), madman, reversed, next_seat)
+
+
+def resolve(table: RuleTable, actions: Mapping[str, Mapping[str, Optional[str]]]) -> NightResult:
+    """夜アクション {役職: {能力者HO: 対象HO}} を一度の走査で判定する（同じ入力なら同じ結果）"""
+    seer: List[Tuple[str, str, bool]] = []
+    protected: List[Tuple[str, str]] = []
+    deaths: Dict[str, str] = {}
+    holders: List[Tuple[str, str]] = []
+    for role in ABILITY_ROLES:
+        for voter, target in sorted((actions.get(role) or {}).items(), key=lambda kv: rotation.ho_order(kv[0])):
+            if not voter:
+                continue
+            holders.append((role, voter))
+            if not target:
+                continue
+            if role == "占い":
+                seer.append((voter, target, target in table.wolves))
+            else:
+                protected.append((voter, target))
+            if target == table.madman and voter != table.madman:
+                deaths.setdefault(voter, f"{role}で狂人（{target}）を対象にした")
+    # 襲撃は能力者の死亡（狂人ルール）の後に判定する（理由は先に決まったものを残す）
+    shielded = {target for _, target in protected}
+    guarded: List[str] = []
+    for target in sorted({t for t in (actions.get(ATTACK) or {}).values() if t}, key=rotation.ho_order):
+        if target in table.wolves:
+            continue
+        if target in shielded:
+            guarded.append(target)
+        else:
+            deaths.setdefault(target, "人狼に襲撃された")
+    if table.madman:
+        holders.append((MADMAN, table.madman))
+    moves = tuple((role, ho, table.next_seat.get(ho, ho)) for role, ho in holders)
+    return NightResult(tuple(seer), tuple(protected), tuple(guarded), tuple(sorted(deaths.items(), key=lambda kv: rotation.ho_order(kv[0]))), moves)
+
+
+# {guild_id: (表の入力, 表)} / {guild_id: ((日, night_version, participants_version, シナリオ), 結果)}
+_tables: Dict[int, Tuple[tuple, RuleTable]] = {}
+_results: Dict[int, Tuple[tuple, NightResult]] = {}
+
+
+def _rule_table(guild_id: int, scenario: Scenario) -> RuleTable:
+    hos = tuple(sorted(str(p["ho"]).upper() for p in Storage.get_participants(guild_id) if p.get("ho")))
+    madman = Storage.get_madman(guild_id) or rotation.holder(guild_id, MADMAN)
+    key = (scenario, hos, madman, Storage.is_spirit_reverse_used(guild_id))
+    cached = _tables.get(guild_id)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    table = build_rule_table(hos, scenario.wolf_hos, scenario.fixed_hos, key[2], key[3])
+    _tables[guild_id] = (key, table)
+    return table
+
+
+def night_result(guild_id: int) -> NightResult:
+    """ギルドの現在の夜アクションの判定結果（変更があるまでキャッシュ）"""
+    scenario = scenarios.for_guild(guild_id)
+    key = (Storage.get_game(guild_id)["day"], Storage.night_version(guild_id), Storage.participants_version(guild_id), scenario)
+    cached = _results.get(guild_id)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    result = resolve(_rule_table(guild_id, scenario), Storage.get_night_actions(guild_id))
+    _results[guild_id] = (key, result)
+    return result
+
+
+def format_result(result: NightResult, name_by_ho: Mapping[str, Optional[str]]) -> List[str]:
+    def disp(ho: str) -> str:
+        name = name_by_ho.get(ho)
+        return f"{ho} ({name})" if name else ho
+
+    lines: List[str] = []
+    for voter, target, is_wolf in result.seer:
+        lines.append(f"占い結果: {voter} → {disp(target)} は「{'人狼' if is_wolf else '村人'}」")
+    for voter, target in result.protected:
+        lines.append(f"護衛: {voter} → {disp(target)}")
+    for ho in result.guarded:
+        lines.append(f"🛡️ 護衛成功: {disp(ho)} への襲撃を防いだ")
+    for ho, reason in result.deaths:
+        lines.append(f"💀 翌朝死亡: {disp(ho)}（{reason}）")
+    for role, ho, nxt in result.rotation:
+        if nxt != ho:
+            lines.append(f"🔄 {role}: {ho} → 翌朝 {nxt}")
+    return lines
@@ -0,0 +1,169 @@
+"""参加者締め切り時の準備（HO ロール作成 → メンバーへの付与 → 個別/進行チャンネル）。
+
+手順を 1 件終えるごとに Storage の provision チェックポイントへ記録するので、途中で失敗したり
+Bot が再起動したりしても、再実行すると残りの手順だけを行う。
+- ロール: 記録した ID のロールが残っていれば完了扱い（作り直したら、その HO の付与とチャンネルもやり直す）
+- 付与: メンバーごとに付与したロール ID を記録
+- チャンネル: 記録した ID のチャンネルが残っていれば完了扱い。残りは ChannelPlan でまとめて反映
+
+ロール作成は同名の重複を避けるため順番に、付与は並列に行い、すべての結果を待って報告する。
+ロール/チャンネル名は卓ごと（guild_config.ho_role_name / ho_channel_name。卓 n は "HO1-n" / "ho1-n"）。
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+import discord
+
+from storage import Storage
+from utils.channels import ChannelPlan, private_overwrites
+from utils.guild_config import guild_config
+from utils.members import get_members
+
+PROGRESS_CHANNELS = ("contact", "hint")   # guild_config のキー
+
+
+@dataclass
+class ProvisionReport:
+    done: int = 0        # 今回行った手順
+    resumed: int = 0     # チェックポイントで完了済みだった手順
+    failures: List[str] = field(default_factory=list)
+    channels: Dict[str, discord.TextChannel] = field(default_factory=dict)   # {HO: 個別チャンネル}
+
+    @property
+    def complete(self) -> bool:
+        return not self.failures
+
+    def summary(self) -> str:
+        text = f"実行 {self.done} 件 / 完了済みのため省略 {self.resumed} 件"
+        if self.failures:
+            text += f" / 失敗 {len(self.failures)} 件（再実行で続きから）: " + "、".join(self.failures)
+        return text
+
+
+def _error(e: BaseException) -> str:
+    return "権限不足" if isinstance(e, discord.Forbidden) else str(e) or type(e).__name__
+
+
+async def _ensure_roles(guild: discord.Guild, hos: Sequence[str], report: ProvisionReport) -> Tuple[Dict[str, discord.Role], Set[str]]:
+    done = Storage.get_provision(guild.id)["roles"]
+    roles: Dict[str, discord.Role] = {}
+    fresh: Set[str] = set()
+    for ho in hos:
+        role = guild.get_role(int(done.get(ho) or 0))
+        if role is not None:
+            report.resumed += 1
+            roles[ho] = role
+            continue
+        name = guild_config.ho_role_name(guild.id, ho)
+        role = discord.utils.get(guild.roles, name=name)
+        if role is None:
+            try:
+                role = await guild.create_role(name=name, reason="HO private role")
+            except Exception as e:
+                report.failures.append(f"{ho} ロール作成: {_error(e)}")
+                continue
+            report.done += 1
+        Storage.checkpoint_provision(guild.id, "roles", ho, role.id)
+        roles[ho] = role
+        fresh.add(ho)
+    return roles, fresh
+
+
+async def _grant_roles(guild: discord.Guild, targets: Sequence[Tuple[discord.Member, discord.Role, str]], report: ProvisionReport) -> None:
+    done = Storage.get_provision(guild.id)["grants"]
+
+    async def grant(member: discord.Member, role: discord.Role) -> None:
+        await member.add_roles(role, reason="Assign HO private role")
+        Storage.checkpoint_provision(guild.id, "grants", str(member.id), role.id)
+
+    pending: List[Tuple[str, asyncio.Task]] = []
+    for member, role, ho in targets:
+        if done.get(str(member.id)) == role.id:
+            report.resumed += 1
+        elif role in member.roles:
+            Storage.checkpoint_provision(guild.id, "grants", str(member.id), role.id)
+            report.resumed += 1
+        else:
+            pending.append((ho, asyncio.create_task(grant(member, role), name=f"provision:grant:{ho}")))
+    outcomes = await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+    for (ho, _), outcome in zip(pending, outcomes):
+        if isinstance(outcome, Exception):
+            report.failures.append(f"{ho} ロール付与: {_error(outcome)}")
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            report.done += 1
+
+
+async def _ensure_channels(
+    guild: discord.Guild,
+    roles: Mapping[str, discord.Role],
+    fresh: Set[str],
+    gm_role: Optional[discord.Role],
+    player_role: Optional[discord.Role],
+    report: ProvisionReport,
+) -> None:
+    done = Storage.get_provision(guild.id)["channels"]
+    me = getattr(guild, "me", None)
+    plan = ChannelPlan(guild)
+    private = guild_config.name(guild.id, "private_category")
+    wanted: Dict[str, Tuple[str, Optional[str]]] = {}   # {チェックポイントのキー: (チャンネル名, HO（進行チャンネルは None）)}
+    for ho, role in roles.items():
+        name = guild_config.ho_channel_name(guild.id, ho)
+        ch = guild.get_channel(int(done.get(name) or 0))
+        if ch is not None and ho not in fresh:
+            report.resumed += 1
+            report.channels[ho] = ch
+            continue
+        plan.category(private, known=guild_config.id(guild.id, "private_category"))
+        plan.channel(name, category=private, overwrites=private_overwrites(guild, gm_role, role, me), reason="Create HO private channel")
+        wanted[name] = (name, ho)
+    if player_role is not None:
+        for key in PROGRESS_CHANNELS:
+            if guild.get_channel(int(done.get(key) or 0)) is not None:
+                report.resumed += 1
+                continue
+            name = guild_config.declare(plan, key, category="progress_category", overwrites=private_overwrites(guild, gm_role, player_role))
+            wanted[key] = (name, None)
+    if not wanted:
+        return
+    result = await plan.apply()
+    guild_config.record(guild.id, result, "private_category", "progress_category", *PROGRESS_CHANNELS)
+    report.done += result.calls
+    for name, err in result.errors.items():
+        report.failures.append(f"{name}: {_error(err)}")
+    for key, (name, ho) in wanted.items():
+        ch = result.channels.get(name)
+        if ch is None or name in result.errors:
+            continue  # 失敗はカテゴリ/チャンネルのエラーとして報告済み
+        Storage.checkpoint_provision(guild.id, "channels", key, ch.id)
+        if ho is not None:
+            report.channels[ho] = ch
+
+
+async def provision(
+    guild: discord.Guild,
+    participants: Sequence[Mapping],
+    gm_role: Optional[discord.Role],
+    player_role: Optional[discord.Role],
+) -> ProvisionReport:
+    """HO 割当済みの参加者に合わせてロール/付与/チャンネルを用意する（何度呼んでも残りだけ行う）"""
+    report = ProvisionReport()
+    members: List[Tuple[discord.Member, str]] = []
+    assigned = [p for p in participants if p.get("ho")]
+    # キャッシュに無い参加者は ID 指定でまとめて取り寄せる（MEMBER_CACHE=players）
+    found = await get_members(guild, [int(p["id"]) for p in assigned])
+    for p in assigned:
+        ho = str(p.get("ho") or "").upper()
+        member = found.get(int(p["id"]))
+        if member is None:
+            report.failures.append(f"{ho}: メンバーが見つかりません")
+            continue
+        members.append((member, ho))
+    roles, fresh = await _ensure_roles(guild, [ho for _, ho in members], report)
+    await _grant_roles(guild, [(m, roles[ho], ho) for m, ho in members if ho in roles], report)
+    await _ensure_channels(guild, roles, fresh, gm_role, player_role, report)
+    return report
@@ -0,0 +1,118 @@
+"""役職の回転（回転寿司）。
+
+人狼と回転しない役職（親子など、シナリオの fixed_hos）を除いた HO を番号順に並べた輪を
+座席とし、基準日の配置（座席ごとの役職の配列）を日ごとに 1 席ずつずらす。逆回転ボタンが
+押されるとその日の位置を基準に取り直し、翌日から向きが反対になる。
+
+day N の配置 = 基準配置を offset(N) = offset + step * (N - 基準日) だけずらしたもの。
+配置はギルド・日ごとにキャッシュし、参加者/回転の設定が変わったときだけ作り直す。
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+from storage import Storage
+from utils.scenario import Scenario, scenarios
+
+_HO_NUMBER = re.compile(r"(\d+)$")
+
+
+def ho_order(ho: str) -> Tuple[int, str]:
+    m = _HO_NUMBER.search(ho)
+    return (int(m.group(1)) if m else 0, ho)
+
+
+def seats(hos: Iterable[str], fixed: FrozenSet[str]) -> Tuple[str, ...]:
+    """回転する HO を番号順に並べた輪"""
+    return tuple(sorted({h for h in hos if h not in fixed}, key=ho_order))
+
+
+@dataclass(frozen=True)
+class Assignment:
+    day: int
+    seats: Tuple[str, ...]
+    roles: Tuple[str, ...]   # roles[i] が seats[i] のその日の役職（"" は役職なし）
+
+    def role_of(self, ho: str) -> Optional[str]:
+        try:
+            return self.roles[self.seats.index(ho)] or None
+        except ValueError:
+            return None
+
+    def holder(self, role: str) -> Optional[str]:
+        try:
+            return self.seats[self.roles.index(role)]
+        except ValueError:
+            return None
+
+    def as_dict(self) -> Dict[str, str]:
+        return {ho: role for ho, role in zip(self.seats, self.roles) if role}
+
+
+def assign(day: int, ring: Tuple[str, ...], base_roles: Tuple[str, ...], offset: int) -> Assignment:
+    """基準配置を offset 席ずらす（役職は ring の後ろ向きに移る）。O(人数)"""
+    n = len(ring)
+    if not n:
+        return Assignment(day, ring, ())
+    return Assignment(day, ring, tuple(base_roles[(i - offset) % n] for i in range(n)))
+
+
+def offset_on(rotation: Mapping[str, int], day: int) -> int:
+    return int(rotation.get("offset", 0)) + int(rotation.get("step", 1)) * (day - int(rotation.get("day", 1)))
+
+
+def _rotation(guild_id: int, scenario: Scenario) -> Optional[dict]:
+    """ギルドの回転設定。未設定ならシナリオの基準配置を 1 日目基準で使う"""
+    rotation = Storage.get_rotation(guild_id)
+    if rotation is None and scenario.rotation_base:
+        rotation = {"base": dict(scenario.rotation_base), "day": 1, "offset": 0, "step": 1}
+    return rotation
+
+
+# {guild_id: ((日, night_version, participants_version, シナリオ), 配置)}
+_cache: Dict[int, Tuple[tuple, Optional[Assignment]]] = {}
+
+
+def assignment(guild_id: int, day: Optional[int] = None) -> Optional[Assignment]:
+    """day 日目（省略時は今日）の配置。基準配置が無ければ None"""
+    if day is None:
+        day = int(Storage.get_game(guild_id)["day"])
+    scenario = scenarios.for_guild(guild_id)
+    key = (day, Storage.night_version(guild_id), Storage.participants_version(guild_id), scenario)
+    cached = _cache.get(guild_id)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    rotation = _rotation(guild_id, scenario)
+    result = None
+    if rotation is not None:
+        hos = (str(p["ho"]).upper() for p in Storage.get_participants(guild_id) if p.get("ho"))
+        ring = seats(hos, scenario.fixed_hos)
+        base = rotation.get("base") or {}
+        result = assign(day, ring, tuple(base.get(ho, "") for ho in ring), offset_on(rotation, day))
+    _cache[guild_id] = (key, result)
+    return result
+
+
+def holder(guild_id: int, role: str) -> Optional[str]:
+    """今日その役職を持つ HO"""
+    a = assignment(guild_id)
+    return a.holder(role) if a is not None else None
+
+
+def set_base(guild_id: int, base: Mapping[str, str]) -> None:
+    """今日の配置を base {HO: 役職} として回転を設定し直す"""
+    day = int(Storage.get_game(guild_id)["day"])
+    step = -1 if Storage.is_spirit_reverse_used(guild_id) else 1
+    Storage.set_rotation(guild_id, {"base": {str(k).upper(): str(v) for k, v in base.items()}, "day": day, "offset": 0, "step": step})
+
+
+def reverse(guild_id: int) -> None:
+    """逆回転: 今日の位置を基準に取り直し、翌日から向きを反対にする"""
+    rotation = _rotation(guild_id, scenarios.for_guild(guild_id))
+    if rotation is None:
+        return
+    day = int(Storage.get_game(guild_id)["day"])
+    rotation.update(offset=offset_on(rotation, day), day=day, step=-int(rotation.get("step", 1)))
+    Storage.set_rotation(guild_id, rotation)
@@ -0,0 +1,198 @@
+# utils/scenario.py
+"""シナリオパック（役職説明・ヒント・霊界ラベル・役職連絡の文面）。
+
+scenarios/*.json を読み込み、{ho} / {name} / {disp} / {label} / {idx} を含む文面を
+一度だけ Template に分解しておく。ギルドごとに選択中のシナリオ（Storage の scenario
+セクション）を解決した結果もキャッシュするため、送信処理では描画だけを行う。
+JSON を置き換えて /reload_scenarios を実行すればデプロイなしで反映される。
+"""
+from __future__ import annotations
+
+import json
+import os
+import string
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from storage import Storage
+
+SCENARIO_DIR = os.getenv(
+    "SCENARIO_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scenarios"),
+)
+DEFAULT_SCENARIO = os.getenv("DEFAULT_SCENARIO", "sushi")
+
+_FORMATTER = string.Formatter()
+
+
+class Template:
+    """str.format 形式の文面を事前分解したもの。未知のプレースホルダは空文字になる"""
+
+    __slots__ = ("source", "_parts", "_static")
+
+    def __init__(self, source: str):
+        self.source = source
+        parts: List[Tuple[str, Optional[str]]] = []
+        for literal, field, _spec, _conv in _FORMATTER.parse(source):
+            if literal:
+                parts.append((literal, None))
+            if field is not None:
+                parts.append(("", field))
+        self._parts = tuple(parts)
+        # プレースホルダのない文面はそのまま返す
+        self._static = "".join(lit for lit, _ in parts) if all(f is None for _, f in parts) else None
+
+    def render(self, ctx: Mapping[str, Any]) -> str:
+        if self._static is not None:
+            return self._static
+        return "".join(lit if field is None else str(ctx.get(field, "")) for lit, field in self._parts)
+
+
+def _ctx(ho: str, name: Optional[str]) -> Dict[str, str]:
+    name = name or ""
+    return {"ho": ho, "name": name, "disp": f"{ho}（{name}）" if name else ho}
+
+
+class Scenario:
+    def __init__(self, sid: str, raw: Mapping[str, Any]):
+        self.id = sid
+        self.title = str(raw.get("title") or sid)
+
+        intro = raw.get("intro") or {}
+        self.intro_default = Template(str(intro.get("default", "")))
+        by_ho: Dict[str, Tuple[str, Template]] = {}
+        wolves = set()
+        fixed = set()
+        for role, spec in (intro.get("roles") or {}).items():
+            tmpl = Template(str(spec.get("text", "")))
+            for ho in spec.get("hos") or []:
+                ho = str(ho).upper()
+                by_ho[ho] = (role, tmpl)
+                if spec.get("team") == "wolf":
+                    wolves.add(ho)
+                # 人狼と "rotates": false の役職（親子など）は役職の回転から外れる
+                if spec.get("team") == "wolf" or spec.get("rotates") is False:
+                    fixed.add(ho)
+        self.intro_by_ho = by_ho
+        self.wolf_hos: FrozenSet[str] = frozenset(wolves)
+        self.fixed_hos: FrozenSet[str] = frozenset(fixed)
+        # 1 日目の回転役職の配置 {HO: 役職}（ギルドごとに /rotation で上書き可）
+        rotation = raw.get("rotation") or {}
+        self.rotation_base: Dict[str, str] = {str(k).upper(): str(v) for k, v in (rotation.get("base") or {}).items()}
+
+        self.hints: Dict[int, Template] = {int(k): Template(str(v)) for k, v in (raw.get("hints") or {}).items()}
+        self.hint_fallback = Template(str(raw.get("hint_fallback", "ヒント{idx}")))
+
+        spirit = raw.get("spirit") or {}
+        self.spirit_labels: Dict[str, str] = {str(k).upper(): str(v) for k, v in (spirit.get("labels") or {}).items()}
+        self.spirit_message = Template(str(spirit.get("message", "")))
+
+        self.role_messages: Dict[str, Dict[str, Template]] = {
+            role: {variant: Template(str(text)) for variant, text in variants.items()}
+            for role, variants in (raw.get("role_messages") or {}).items()
+        }
+        self.role_message_fallback = Template(str(raw.get("role_message_fallback", "{disp} へ連絡")))
+
+    def intro(self, ho: str, name: Optional[str] = None) -> str:
+        ho = ho.upper()
+        entry = self.intro_by_ho.get(ho)
+        tmpl = entry[1] if entry else self.intro_default
+        return tmpl.render(_ctx(ho, name))
+
+    def hint(self, idx: int) -> str:
+        tmpl = self.hints.get(idx)
+        if tmpl is None:
+            return self.hint_fallback.render({"idx": idx})
+        return tmpl.render({"idx": idx})
+
+    def spirit_text(self, ho: str, name: Optional[str] = None) -> str:
+        ho = ho.upper()
+        ctx = _ctx(ho, name)
+        ctx["label"] = self.spirit_labels.get(ho, "")
+        return self.spirit_message.render(ctx)
+
+    def role_message(self, role: str, variant: str, ho: str, name: Optional[str] = None) -> str:
+        variants = self.role_messages.get(role) or {}
+        tmpl = variants.get(variant) or variants.get("A") or self.role_message_fallback
+        return tmpl.render(_ctx(ho, name))
+
+
+class ScenarioRegistry:
+    def __init__(self, directory: str = SCENARIO_DIR, default: str = DEFAULT_SCENARIO):
+        self.directory = directory
+        self.default = default
+        self._packs: Dict[str, Scenario] = {}
+        self._mtimes: Dict[str, float] = {}       # path -> mtime
+        self._ids_by_path: Dict[str, str] = {}
+        self._errors: Dict[str, str] = {}
+        self._loaded = False
+        # {guild_id: (選択中のID, 解決済みシナリオ)}
+        self._guild_cache: Dict[int, Tuple[Optional[str], Scenario]] = {}
+
+    def reload(self) -> Tuple[List[str], Dict[str, str]]:
+        """変更のあったファイルだけ読み直す。壊れたファイルは旧版を使い続ける"""
+        self._loaded = True
+        changed: List[str] = []
+        errors: Dict[str, str] = {}
+        seen = set()
+        try:
+            names = sorted(n for n in os.listdir(self.directory) if n.endswith(".json"))
+        except FileNotFoundError:
+            names = []
+        for fname in names:
+            path = os.path.join(self.directory, fname)
+            seen.add(path)
+            try:
+                mtime = os.path.getmtime(path)
+                if self._mtimes.get(path) == mtime:
+                    continue
+                with open(path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+                sid = str(raw.get("id") or os.path.splitext(fname)[0])
+                self._packs[sid] = Scenario(sid, raw)
+                self._mtimes[path] = mtime
+                self._ids_by_path[path] = sid
+                changed.append(sid)
+            except Exception as e:
+                errors[fname] = str(e)
+                print(f"[Scenario] failed to load {fname}: {e}")
+        for path in [p for p in self._ids_by_path if p not in seen]:
+            self._packs.pop(self._ids_by_path.pop(path), None)
+            self._mtimes.pop(path, None)
+        self._errors = errors
+        self._guild_cache.clear()
+        return changed, errors
+
+    def _ensure(self) -> None:
+        if not self._loaded:
+            self.reload()
+
+    def ids(self) -> List[str]:
+        self._ensure()
+        return sorted(self._packs)
+
+    def get(self, sid: str) -> Optional[Scenario]:
+        self._ensure()
+        return self._packs.get(sid)
+
+    def for_guild(self, guild_id: int) -> Scenario:
+        """ギルドで選択中のシナリオ（未選択/削除済みなら既定）"""
+        selected = Storage.get_scenario(guild_id)
+        cached = self._guild_cache.get(guild_id)
+        if cached is not None and cached[0] == selected:
+            return cached[1]
+        self._ensure()
+        sc = self._packs.get(selected or self.default) or self._packs.get(self.default)
+        if sc is None:
+            sc = next(iter(self._packs.values()), None) or Scenario(self.default, {})
+        self._guild_cache[guild_id] = (selected, sc)
+        return sc
+
+    def select(self, guild_id: int, sid: str) -> Scenario:
+        sc = self.get(sid)
+        if sc is None:
+            raise KeyError(sid)
+        Storage.set_scenario(guild_id, sid)
+        return sc
+
+
+scenarios = ScenarioRegistry()
@@ -0,0 +1,129 @@
+"""1 つのサーバーで複数の卓（ゲーム）を並行して進めるための卓の管理。
+
+卓 1 はサーバーそのもの（ゲーム ID = ギルド ID。従来のデータはそのまま卓 1）、卓 n（2 以上）の
+ゲーム ID は "ギルドID:n"（storage.game_id）。Storage・guild_config・ロック・タイマー・
+タスクの同時実行上限・ゲームログ・描画キャッシュはどれもゲーム ID で分かれるので、卓どうしは
+状態を共有せず、互いの処理を待たない。
+
+Table は discord.Guild の代わりに渡せる薄いラッパーで、id がゲーム ID になる以外
+（roles / get_channel / create_role など）は元のギルドに任せる。
+- コマンド/ボタンの卓は、実行したチャンネルのカテゴリ（その卓の GM/個別/進行カテゴリ）で決める。
+  どの卓のカテゴリでもなければ卓 1
+- 追加した卓の番号は卓 1 の Storage（tables）に記録する
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, List, Optional
+
+import discord
+
+from storage import GameId, Storage, game_id, split_game_id
+from utils.guild_config import guild_config
+
+# 卓の判定に使うカテゴリ（guild_config のキー）
+CATEGORY_KEYS = ("gm_category", "private_category", "progress_category")
+
+
+class Table:
+    """卓。id はゲーム ID、それ以外の属性は元のギルドのもの"""
+
+    __slots__ = ("guild", "number", "id")
+
+    def __init__(self, guild: discord.Guild, number: int = 1) -> None:
+        self.guild = guild
+        self.number = int(number)
+        self.id: GameId = game_id(guild.id, number)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.guild, name)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Table) and other.id == self.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __repr__(self) -> str:
+        return f"<Table {self.id} of {self.guild.name!r}>"
+
+    @property
+    def label(self) -> str:
+        return f"卓{self.number}"
+
+
+class Tables:
+    # ---------- 登録 ----------
+    def numbers(self, guild_id: int) -> List[int]:
+        return [1, *Storage.get_tables(guild_id)]
+
+    def get(self, guild: discord.Guild, number: int) -> Optional[Table]:
+        return Table(guild, number) if int(number) in self.numbers(guild.id) else None
+
+    def all(self, guild: discord.Guild) -> List[Table]:
+        return [Table(guild, n) for n in self.numbers(guild.id)]
+
+    def create(self, guild: discord.Guild) -> Table:
+        """新しい卓を追加する（シナリオは卓 1 の選択を引き継ぐ）"""
+        table = Table(guild, max(self.numbers(guild.id)) + 1)
+        Storage.set_table(guild.id, table.number, True)
+        scenario = Storage.get_scenario(guild.id)
+        if scenario:
+            Storage.set_scenario(table.id, scenario)
+        return table
+
+    def close(self, table: Table) -> None:
+        """卓 n（2 以上）の登録と状態をすべて消す"""
+        if table.number == 1:
+            raise ValueError("卓 1 は終了できません（/reset_game を使ってください）")
+        Storage.reset_guild(table.id, keep=())
+        Storage.set_table(table.guild.id, table.number, False)
+
+    # ---------- 解決 ----------
+    def of(self, interaction: discord.Interaction) -> Optional[Table]:
+        """インタラクションを実行したチャンネルの卓（サーバー外なら None）"""
+        guild = interaction.guild
+        if guild is None:
+            return None
+        numbers = Storage.get_tables(guild.id)
+        channel = interaction.channel
+        if isinstance(channel, discord.Thread):
+            channel = channel.parent
+        category = getattr(channel, "category", None)
+        if not numbers or category is None:
+            return Table(guild, 1)
+        for n in numbers:
+            gid = game_id(guild.id, n)
+            for key in CATEGORY_KEYS:
+                if category.id == guild_config.id(gid, key) or category.name == guild_config.name(gid, key):
+                    return Table(guild, n)
+        return Table(guild, 1)
+
+    def resolve(self, bot: discord.Client, gid: GameId) -> Optional[Table]:
+        """イベント/タイマーのゲーム ID → 卓（ギルドが無い/卓が終了済みなら None）"""
+        guild_id, number = split_game_id(gid)
+        guild = bot.get_guild(guild_id)
+        return self.get(guild, number) if guild is not None else None
+
+    async def fetch(self, bot: discord.Client, gid: GameId) -> Optional[Table]:
+        """resolve の前にギルド（全卓）の状態を読み込む（イベント購読/タイマーなど非同期の入口用）"""
+        await self.load(split_game_id(gid)[0])
+        return self.resolve(bot, gid)
+
+    # ---------- 読み込み ----------
+    async def load(self, guild_id: int) -> None:
+        """ギルド（卓 1）と追加した卓の状態をメモリに読み込む"""
+        await Storage.ensure_guild_loaded(guild_id)
+        extra = Storage.get_tables(guild_id)
+        if extra:
+            await asyncio.gather(*(Storage.ensure_guild_loaded(game_id(guild_id, n)) for n in extra))
+
+    async def load_known(self, bot: discord.Client) -> List[Table]:
+        """保存データのあるギルドの全卓を（並行して）読み込んで返す（起動時の復旧用）"""
+        await Storage.ensure_loaded()
+        known = [g for g in bot.guilds if Storage.is_known(g.id)]
+        await asyncio.gather(*(self.load(g.id) for g in known), return_exceptions=True)
+        return [t for g in known for t in self.all(g)]
+
+
+tables = Tables()
@@ -0,0 +1,114 @@
+"""投げっぱなしのコルーチンの監督（TaskSupervisor）。
+
+asyncio.create_task の結果を捨てると、例外は誰にも報告されず、参照の無いタスクは
+途中で GC されることがある。ここで起動したタスクは
+- 終わるまで強参照を持ち、名前を付ける
+- ギルドごとに同時実行数を TASK_GUILD_LIMIT（既定 4）までに抑える（超えた分は順番待ち）
+- 例外で終わったらトレースバック付きでログに残す
+- 停止時（WerewolfBot.close）に新規の起動を止め、残りをキャンセルして終了を待つ
+件数と経過時間は GET /tasks で確認できる。
+
+Storage のフラッシュやイベント配信のような常駐タスクは、それぞれが自分で管理する。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Coroutine, Dict, Optional
+
+log = logging.getLogger("werewolf.tasks")
+
+TASK_GUILD_LIMIT = int(os.getenv("TASK_GUILD_LIMIT", "4"))
+
+
+@dataclass
+class _Entry:
+    name: str
+    guild_id: Optional[int]
+    started: float
+    running: bool = False
+
+
+class TaskSupervisor:
+    def __init__(self, guild_limit: int = TASK_GUILD_LIMIT) -> None:
+        self.guild_limit = max(1, guild_limit)
+        self._tasks: Dict[asyncio.Task, _Entry] = {}
+        self._slots: Dict[int, asyncio.Semaphore] = {}
+        self._closing = False
+        self.stats = {"spawned": 0, "failed": 0, "cancelled": 0}
+
+    def open(self) -> None:
+        """shutdown 後に再び起動を受け付ける（Bot を作り直して再接続するとき）"""
+        self._closing = False
+
+    def spawn(self, coro: Coroutine[Any, Any, Any], *, name: str, guild_id: Optional[int] = None) -> Optional[asyncio.Task]:
+        """coro をタスクとして起動する（guild_id を渡すとギルドごとの同時実行数の上限に従う）"""
+        if self._closing:
+            coro.close()
+            log.warning(f"🛑 shutting down; dropped task {name}")
+            return None
+        entry = _Entry(name, guild_id, time.monotonic())
+        task = asyncio.get_running_loop().create_task(self._run(coro, entry), name=name)
+        self._tasks[task] = entry
+        task.add_done_callback(self._done)
+        self.stats["spawned"] += 1
+        return task
+
+    async def _run(self, coro: Coroutine[Any, Any, Any], entry: _Entry) -> Any:
+        if entry.guild_id is None:
+            entry.running = True
+            return await coro
+        slot = self._slots.get(entry.guild_id)
+        if slot is None:
+            slot = self._slots[entry.guild_id] = asyncio.Semaphore(self.guild_limit)
+        try:
+            async with slot:
+                entry.running = True
+                return await coro
+        finally:
+            coro.close()  # 順番待ちのままキャンセルされた場合
+
+    def _done(self, task: asyncio.Task) -> None:
+        entry = self._tasks.pop(task, None)
+        if task.cancelled():
+            self.stats["cancelled"] += 1
+            return
+        exc = task.exception()
+        if exc is not None:
+            self.stats["failed"] += 1
+            where = f" (guild {entry.guild_id})" if entry and entry.guild_id is not None else ""
+            log.error(f"🔥 task {task.get_name()}{where} failed", exc_info=exc)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        entries = list(self._tasks.values())
+        oldest = max(entries, key=lambda e: now - e.started, default=None)
+        return {
+            "live": len(entries),
+            "running": sum(1 for e in entries if e.running),
+            "waiting": sum(1 for e in entries if not e.running),
+            "oldest": {"name": oldest.name, "age_s": round(now - oldest.started, 3)} if oldest else None,
+            "by_name": dict(Counter(e.name.split(":", 1)[0] for e in entries)),
+            "guild_limit": self.guild_limit,
+            **self.stats,
+        }
+
+    async def shutdown(self, timeout: float = 10.0) -> int:
+        """新規の起動を止め、残りをキャンセルして終了を待つ。待ちきれなかった件数を返す"""
+        self._closing = True
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if not tasks:
+            return 0
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            log.warning(f"⌛ task {task.get_name()} did not finish within {timeout:.0f}s")
+        return len(pending)
+
+
+supervisor = TaskSupervisor()
@@ -0,0 +1,153 @@
+# utils/timers.py
+"""フェーズ進行タイマーのスケジューラ。
+
+タイマー本体は Storage の timers セクションに保存し（再起動後も残る）、ここでは
+期限順のヒープだけを持つ。1 つのタスクが最も近い期限まで眠り、期限の来た
+エントリをまとめて処理する（タイマーごとの sleep タスクは作らない）。
+
+- 発火: 期限から TIMER_MAX_LATE 秒以内なら実行、それ以上遅れた（停止中に期限切れ）ものは期限切れとして通知
+- カウントダウン: 残り時間に応じた間隔（最短 COUNTDOWN_MIN_INTERVAL 秒）でメッセージを編集
+- キャンセル/リセットはストレージから消すだけで、ヒープ上の古いエントリは取り出し時に捨てる
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from storage import Storage
+from utils.tasks import supervisor
+
+TIMER_MAX_LATE = float(os.getenv("TIMER_MAX_LATE", "600"))
+COUNTDOWN_MIN_INTERVAL = float(os.getenv("COUNTDOWN_MIN_INTERVAL", "30"))
+COUNTDOWN_MAX_INTERVAL = 600.0
+# 期限の差がこの値以内のエントリはまとめて処理する（起床回数を抑える。発火時刻の誤差はこの値以内）
+_COALESCE = 0.25
+
+FireHandler = Callable[[int, str, dict, float], Awaitable[None]]       # (guild_id, timer_id, timer, 遅延秒)
+CountdownHandler = Callable[[int, str, dict, float], Awaitable[None]]  # (guild_id, timer_id, timer, 残り秒)
+ExpireHandler = Callable[[int, str, dict, float], Awaitable[None]]     # (guild_id, timer_id, timer, 遅延秒)
+
+
+def countdown_interval(remaining: float) -> float:
+    """残りが長いほど編集間隔を空ける（レート制限対策）"""
+    return max(COUNTDOWN_MIN_INTERVAL, min(COUNTDOWN_MAX_INTERVAL, remaining / 5))
+
+
+class TimerWheel:
+    def __init__(self) -> None:
+        # (時刻, 連番, 種別 "fire"|"tick", guild_id, timer_id)
+        self._heap: List[Tuple[float, int, str, int, str]] = []
+        self._seq = itertools.count()
+        self._armed: Dict[Tuple[int, str], float] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._on_fire: Optional[FireHandler] = None
+        self._on_countdown: Optional[CountdownHandler] = None
+        self._on_expire: Optional[ExpireHandler] = None
+        self.stats = {"fired": 0, "expired": 0, "countdown_edits": 0, "max_late_ms": 0.0}
+
+    def start(self, on_fire: FireHandler, on_countdown: CountdownHandler, on_expire: ExpireHandler) -> None:
+        self._on_fire, self._on_countdown, self._on_expire = on_fire, on_countdown, on_expire
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="timers:wheel")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _push(self, when: float, kind: str, guild_id: int, timer_id: str) -> None:
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (when, next(self._seq), kind, guild_id, timer_id))
+        if self._wake is not None and (earliest is None or when < earliest):
+            self._wake.set()
+
+    def arm(self, guild_id: int, timer_id: str, timer: dict) -> None:
+        due = float(timer["due"])
+        self._armed[(guild_id, timer_id)] = due
+        self._push(due, "fire", guild_id, timer_id)
+        if timer.get("message_id"):
+            remaining = due - time.time()
+            if remaining > COUNTDOWN_MIN_INTERVAL:
+                self._push(time.time() + countdown_interval(remaining), "tick", guild_id, timer_id)
+
+    def disarm(self, guild_id: int, timer_id: str) -> None:
+        self._armed.pop((guild_id, timer_id), None)
+
+    def rearm_guild(self, guild_id: int) -> int:
+        """ストレージに残っているタイマーを登録し直す（起動時の復旧）"""
+        n = 0
+        for tid, timer in Storage.get_timers(guild_id).items():
+            if (guild_id, tid) not in self._armed:
+                self.arm(guild_id, tid, timer)
+                n += 1
+        return n
+
+    def pending(self) -> int:
+        return len(self._armed)
+
+    async def _run(self) -> None:
+        assert self._wake is not None
+        while True:
+            timeout = None
+            if self._heap:
+                timeout = max(0.0, self._heap[0][0] - time.time())
+            if timeout is None or timeout > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                    continue  # 早い期限が追加された
+                except asyncio.TimeoutError:
+                    pass
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now + _COALESCE:
+                when, _, kind, gid, tid = heapq.heappop(self._heap)
+                due = self._armed.get((gid, tid))
+                if due is None:
+                    continue  # キャンセル済み
+                if kind == "fire":
+                    if due != when:
+                        continue  # 期限が変更された古いエントリ
+                    del self._armed[(gid, tid)]
+                    supervisor.spawn(self._fire(gid, tid, max(0.0, now - due)), name=f"timers:fire:{tid}", guild_id=gid)
+                else:
+                    remaining = due - now
+                    if remaining > COUNTDOWN_MIN_INTERVAL:
+                        self._push(now + countdown_interval(remaining), "tick", gid, tid)
+                    supervisor.spawn(self._countdown(gid, tid, remaining), name=f"timers:tick:{tid}", guild_id=gid)
+
+    async def _fire(self, guild_id: int, timer_id: str, late: float) -> None:
+        await Storage.ensure_guild_loaded(guild_id)
+        timer = Storage.remove_timer(guild_id, timer_id)
+        if timer is None:
+            return
+        try:
+            if late > TIMER_MAX_LATE:
+                self.stats["expired"] += 1
+                await self._on_expire(guild_id, timer_id, timer, late)
+            else:
+                self.stats["fired"] += 1
+                self.stats["max_late_ms"] = max(self.stats["max_late_ms"], late * 1000)
+                await self._on_fire(guild_id, timer_id, timer, late)
+        except Exception as e:
+            print(f"[Timer] {guild_id}/{timer_id} failed: {e}")
+
+    async def _countdown(self, guild_id: int, timer_id: str, remaining: float) -> None:
+        await Storage.ensure_guild_loaded(guild_id)
+        timer = Storage.get_timer(guild_id, timer_id)
+        if timer is None:
+            return
+        try:
+            self.stats["countdown_edits"] += 1
+            await self._on_countdown(guild_id, timer_id, timer, remaining)
+        except Exception as e:
+            print(f"[Timer] countdown {guild_id}/{timer_id} failed: {e}")
+
+
+timer_wheel = TimerWheel()